@@ -0,0 +1,156 @@
+# sk_artifacts.py
+# Single-write artifact store. Each stage writes an output once, atomically (temp file in the target directory,
+# then os.replace, so readers never see a half-written file), and publish() mirrors it into
+# "Python global outputs/<subdir>/" as a hardlink, else a reflink (copy-on-write clone), else a plain copy.
+# Every publish is appended to "Python global outputs/manifest.jsonl" (one JSON object per line, append-only,
+# safe from concurrent dataset workers); load_manifest() returns the latest entry per published file.
+
+import os
+import json
+import time
+import shutil
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Union
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_OUTPUTS_DIR = 'Python global outputs'
+MANIFEST_FILE = 'manifest.jsonl'
+LINK_METHODS = ('hardlink', 'reflink', 'copy')
+FICLONE = 0x40049409  # Linux ioctl: clone file extents (btrfs, XFS, overlay on those)
+
+_manifest_lock = threading.Lock()
+_umask = os.umask(0)
+os.umask(_umask)
+
+
+def global_outputs_dir(root_dir: str) -> str:
+    return os.path.join(root_dir, GLOBAL_OUTPUTS_DIR)
+
+
+@contextmanager
+def atomic_path(path: str) -> Iterator[str]:
+    """Yield a temp path next to path; it replaces path on success and is removed on error."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix='.tmp', dir=directory)
+    os.close(fd)
+    try:
+        yield tmp_path
+        os.chmod(tmp_path, 0o666 & ~_umask)  # mkstemp creates 0600; use the normal file mode
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_text(path: str, content: str) -> str:
+    """Atomically write a UTF-8 text file."""
+    with atomic_path(path) as tmp_path:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+    return path
+
+
+def write_json(path: str, obj) -> str:
+    """Atomically write a JSON file (indent=2, UTF-8 kept as is)."""
+    return write_text(path, json.dumps(obj, indent=2, ensure_ascii=False))
+
+
+def _reflink(src: str, dst: str) -> bool:
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with open(src, 'rb') as s, open(dst, 'wb') as d:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        return True
+    except OSError:
+        if os.path.exists(dst):
+            os.remove(dst)
+        return False
+
+
+def link_or_copy(src: str, dst: str) -> str:
+    """Atomically place src at dst by the first method that works (ARTIFACT_LINK_MODE=auto|hardlink|reflink|copy).
+
+    Returns the method used. A forced method still falls back to the later ones (hardlink -> reflink -> copy).
+    """
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        return 'same'
+    mode = os.getenv('ARTIFACT_LINK_MODE', 'auto').lower()
+    methods = LINK_METHODS[LINK_METHODS.index(mode):] if mode in LINK_METHODS else LINK_METHODS
+    directory = os.path.dirname(dst)
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f".{os.path.basename(dst)}.{os.getpid()}.{threading.get_ident()}.tmp")
+    for method in methods:
+        try:
+            if method == 'hardlink':
+                os.link(src, tmp_path)
+            elif method == 'reflink':
+                if not _reflink(src, tmp_path):
+                    continue
+            else:
+                shutil.copy2(src, tmp_path)
+        except OSError as e:
+            logger.debug(f"{method} {src} -> {dst} failed: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            continue
+        os.replace(tmp_path, dst)
+        return method
+    raise OSError(f"Could not publish {src} to {dst}")
+
+
+def _record(root_dir: str, entry: dict) -> None:
+    """Append one manifest line (O_APPEND: whole-line writes from several processes do not interleave)."""
+    line = (json.dumps(entry, ensure_ascii=False) + '\n').encode('utf-8')
+    manifest_path = os.path.join(global_outputs_dir(root_dir), MANIFEST_FILE)
+    with _manifest_lock:
+        fd = os.open(manifest_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+
+def publish(paths: Union[str, List[str]], root_dir: str, subdir: str = '') -> List[str]:
+    """Mirror already-written artifacts to Python global outputs/<subdir>/ and record them. Returns the global paths."""
+    if isinstance(paths, str):
+        paths = [paths]
+    target_dir = os.path.join(global_outputs_dir(root_dir), subdir)
+    os.makedirs(target_dir, exist_ok=True)
+    published = []
+    for path in paths:
+        dst = os.path.join(target_dir, os.path.basename(path))
+        method = link_or_copy(path, dst)
+        st = os.stat(dst)
+        _record(root_dir, {
+            'published': os.path.relpath(dst, global_outputs_dir(root_dir)),
+            'source': os.path.abspath(path),
+            'method': method,
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'published_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        })
+        logger.debug(f"Published {path} -> {dst} ({method})")
+        published.append(dst)
+    return published
+
+
+def load_manifest(root_dir: str) -> Dict[str, dict]:
+    """Latest manifest entry per published path (relative to Python global outputs)."""
+    manifest_path = os.path.join(global_outputs_dir(root_dir), MANIFEST_FILE)
+    entries: Dict[str, dict] = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    entries[entry['published']] = entry
+    return entries
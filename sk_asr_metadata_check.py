@@ -1,66 +1,220 @@
 #%% Metadata Check Script
 # This section provides a standalone script to verify if metadata is correctly embedded in the segmented .wav files.
-# It uses ffprobe to extract and print all metadata tags from all .wav files in the folder (or a sample).
+# It reads the RIFF INFO tags natively (sk_riff_metadata, ffprobe fallback) and prints all metadata tags from all .wav files in the folder (or a sample).
 # Run this in your Jupyter notebook or as a .py file to diagnose issues.
-# Updates: No changes needed.
+# Audit mode (METADATA_AUDIT=1 or --audit): scans every segment in every Audio_Processed/*process* dir in parallel,
+# validates keys and the artist/comment split formats, cross-checks mapping.csv and the dataset .env
+# (the artist gender against the gender mapping.csv records per segment: segmentation takes 'F' from an '_F_' source
+# WAV name over SK_GENDER, so the .env alone does not tell it; not checked for mapping.csv files without it),
+# and writes metadata_audit.csv (per segment) + metadata_audit.json (per-dataset summaries).
+# Updates: Metadata read via sk_riff_metadata.get_metadata_batch instead of one ffprobe process per file.
 
 import os
-import subprocess
+import sys
 import json
-from dotenv import load_dotenv
-
-load_dotenv()
-
-segments_folder = os.getenv('SEGMENTS_FOLDER')
-if segments_folder is None:
-    raise ValueError("SEGMENTS_FOLDER not set in .env")
-
-# Standardize path
-segments_folder = os.path.normpath(segments_folder)
-
-# Get all .wav files
-wav_files = sorted([os.path.normpath(os.path.join(segments_folder, f)) for f in os.listdir(segments_folder) if f.endswith('.wav')])[:10]  # Limit to 10; remove [:10] for all
-if not wav_files:
-    raise ValueError("No .wav files found in SEGMENTS_FOLDER")
-
-expected_keys = ['title', 'album', 'artist', 'comment', 'date', 'isbj', 'isrc']  # Updated to lowercase four-letter
-
-for sample_wav in wav_files:
-    cmd = [
-        'ffprobe', '-v', 'quiet', '-print_format', 'json',
-        '-show_entries', 'format_tags', sample_wav
-    ]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        print(f"Error extracting metadata from {sample_wav}: {result.stderr}")
-        continue
-    try:
-        data = json.loads(result.stdout)
-        tags = data.get('format', {}).get('tags', {})
-        print(f"Metadata for {sample_wav}:")
-        for key, value in tags.items():
-            print(f"{key}: {value}")
-        # Check for expected keys
-        missing = [k for k in expected_keys if k not in tags]
-        if missing:
-            print(f"Missing expected metadata keys in {sample_wav}: {', '.join(missing)}")
-        # Parse and print derived values
-        print("Derived metadata:")
-        if 'title' in tags:
-            title_parts = tags['title'].rsplit('_', 1)  # Split off last _ for dataset_code
-            print(f"lexeme: {title_parts[0]}, dataset_code: {title_parts[1]}")
-        print(f"variety: {tags.get('album', 'N/A')}")
-        if 'artist' in tags:
-            gender, age = tags['artist'].split('_')
-            print(f"gender: {gender}, age: {age}")
-        if 'comment' in tags:
-            education, city_origin = tags['comment'].split('_')
-            print(f"education: {education}, city_origin: {city_origin}")
-        print(f"record_date: {tags.get('date', 'N/A')}")
-        print(f"subject: {tags.get('isbj', 'N/A')}")
-        print(f"researcher: {tags.get('isrc', 'N/A')}")
-        print("\n")
-    except json.JSONDecodeError:
-        print(f"Error parsing metadata JSON from {sample_wav}")
-    except ValueError as e:
-        print(f"Error parsing concatenated metadata in {sample_wav}: {e}")
\ No newline at end of file
+import time
+import logging
+import pandas as pd
+from collections import Counter
+from dotenv import load_dotenv, dotenv_values
+from typing import Dict, List, Optional
+from sk_riff_metadata import get_metadata_batch
+from sk_table_io import read_table
+
+expected_keys = ['title', 'album', 'artist', 'comment', 'date', 'isbj', 'isrc']  # Compared case-insensitively (ffprobe keeps ISBJ/ISRC uppercase)
+
+# Tag -> dataset .env keys it must match (segmentation SK_* names first, transcription names second)
+ENV_CROSS_CHECKS = {
+    'album': ('SK_VARIETY', 'KURDISH_VARIETY'),
+    'date': ('SK_RECORD_DATE', 'RECORD_DATE'),
+    'isbj': ('SK_SUBJECT', 'SUBJECT'),
+    'isrc': ('SK_RESEARCHER', 'RESEARCHER'),
+}
+
+
+def sample_check(segments_folder: str) -> None:
+    """Print all tags and derived values for the first 10 segments of one folder."""
+    # Standardize path
+    segments_folder = os.path.normpath(segments_folder)
+
+    # Get all .wav files
+    wav_files = sorted([os.path.normpath(os.path.join(segments_folder, f)) for f in os.listdir(segments_folder) if f.endswith('.wav')])[:10]  # Limit to 10; remove [:10] for all
+    if not wav_files:
+        raise ValueError("No .wav files found in SEGMENTS_FOLDER")
+
+    for sample_wav, tags in zip(wav_files, get_metadata_batch(wav_files)):
+        tags = {key.lower(): value for key, value in tags.items()}
+        try:
+            print(f"Metadata for {sample_wav}:")
+            for key, value in tags.items():
+                print(f"{key}: {value}")
+            # Check for expected keys
+            missing = [k for k in expected_keys if k not in tags]
+            if missing:
+                print(f"Missing expected metadata keys in {sample_wav}: {', '.join(missing)}")
+            # Parse and print derived values
+            print("Derived metadata:")
+            if 'title' in tags:
+                title_parts = tags['title'].rsplit('_', 1)  # Split off last _ for dataset_code
+                print(f"lexeme: {title_parts[0]}, dataset_code: {title_parts[1]}")
+            print(f"variety: {tags.get('album', 'N/A')}")
+            if 'artist' in tags:
+                gender, age = tags['artist'].split('_')
+                print(f"gender: {gender}, age: {age}")
+            if 'comment' in tags:
+                education, city_origin = tags['comment'].split('_')
+                print(f"education: {education}, city_origin: {city_origin}")
+            print(f"record_date: {tags.get('date', 'N/A')}")
+            print(f"subject: {tags.get('isbj', 'N/A')}")
+            print(f"researcher: {tags.get('isrc', 'N/A')}")
+            print("\n")
+        except ValueError as e:
+            print(f"Error parsing concatenated metadata in {sample_wav}: {e}")
+
+
+def _env_value(env: Dict[str, Optional[str]], keys: tuple) -> Optional[str]:
+    """First non-empty value among keys in a dataset .env."""
+    for key in keys:
+        if env.get(key):
+            return env[key]
+    return None
+
+
+def validate_tags(file_name: str, tags: Dict[str, str], env: Dict[str, Optional[str]],
+                  mapping: Optional[Dict[str, Optional[str]]]) -> List[str]:
+    """Return the list of issues for one segment (empty list = OK); mapping: segment file -> recorded gender."""
+    tags = {key.lower(): value for key, value in tags.items()}
+    issues = [f"missing:{k}" for k in expected_keys if k not in tags]
+
+    stem = os.path.splitext(file_name)[0]
+    if 'title' in tags:
+        if len(tags['title'].rsplit('_', 1)) != 2:
+            issues.append('bad_format:title')
+        elif tags['title'] != stem:
+            issues.append('mismatch:title!=filename')
+    if 'artist' in tags:
+        artist_parts = tags['artist'].split('_')
+        if len(artist_parts) != 2 or not all(artist_parts) or artist_parts[0] not in ('M', 'F'):
+            issues.append('bad_format:artist')
+        else:
+            gender = mapping.get(file_name) if mapping else None
+            if gender and artist_parts[0] != gender:
+                issues.append('mismatch:artist_gender!=mapping')
+    if 'comment' in tags:
+        # '<education>_<dataset>' (sk_asr_segmentation.py); dataset names may contain underscores
+        comment_parts = tags['comment'].split('_', 1)
+        if len(comment_parts) != 2 or not all(comment_parts):
+            issues.append('bad_format:comment')
+        else:
+            education = _env_value(env, ('SK_EDUCATION', 'EDUCATION'))
+            if education and comment_parts[0] != education:
+                issues.append('mismatch:comment_education!=env')
+
+    for tag, env_keys in ENV_CROSS_CHECKS.items():
+        expected = _env_value(env, env_keys)
+        if tag in tags and expected and tags[tag] != expected:
+            issues.append(f"mismatch:{tag}!=env")
+
+    if mapping is not None and file_name not in mapping:
+        issues.append('not_in_mapping')
+    return issues
+
+
+def load_mapping_genders(mapping_csv: str) -> Dict[str, Optional[str]]:
+    """Segment file -> gender recorded by segmentation (None for mapping.csv files written before it was)."""
+    mapping = read_table(mapping_csv)
+    files = mapping['audio_file'].astype(str)
+    if 'gender' not in mapping.columns:
+        return dict.fromkeys(files)
+    return {f: g if isinstance(g, str) and g else None for f, g in zip(files, mapping['gender'])}
+
+
+def audit_corpus(processed_root: str, output_dir: str) -> int:
+    """Audit every segment of every *process* dataset; write CSV/JSON reports. Returns the number of segments with issues."""
+    start = time.perf_counter()
+    datasets = sorted(
+        d for d in os.listdir(processed_root)
+        if 'process' in d.lower() and os.path.isdir(os.path.join(processed_root, d, 'segments'))
+    )
+    if not datasets:
+        raise ValueError(f"No *process* dirs with segments/ in {processed_root}")
+
+    # Per-dataset context: .env values (not exported to os.environ) and mapping.csv audio files -> gender
+    envs: Dict[str, Dict[str, Optional[str]]] = {}
+    mappings: Dict[str, Optional[Dict[str, Optional[str]]]] = {}
+    files: List[tuple] = []
+    for dataset in datasets:
+        dataset_dir = os.path.join(processed_root, dataset)
+        env_path = os.path.join(dataset_dir, '.env')
+        envs[dataset] = dotenv_values(env_path) if os.path.exists(env_path) else {}
+        mapping_csv = os.path.join(dataset_dir, 'mapping.csv')
+        mappings[dataset] = load_mapping_genders(mapping_csv) if os.path.exists(mapping_csv) else None
+        segments_folder = os.path.join(dataset_dir, 'segments')
+        files.extend((dataset, f, os.path.join(segments_folder, f)) for f in sorted(os.listdir(segments_folder)) if f.endswith('.wav'))
+
+    logging.info(f"Auditing {len(files)} segments in {len(datasets)} datasets")
+    all_tags = get_metadata_batch([path for _, _, path in files])
+
+    rows = []
+    for (dataset, file_name, path), tags in zip(files, all_tags):
+        issues = validate_tags(file_name, tags, envs[dataset], mappings[dataset])
+        rows.append({'dataset': dataset, 'file': file_name, 'audio_path': path,
+                     'status': 'issue' if issues else 'ok', 'issues': ';'.join(issues)})
+    report_df = pd.DataFrame(rows, columns=['dataset', 'file', 'audio_path', 'status', 'issues'])
+
+    summaries = {}
+    for dataset, group in report_df.groupby('dataset', sort=True):
+        issue_counts = Counter(i for issues in group['issues'] if issues for i in issues.split(';'))
+        present = set(group['file'])
+        missing_segments = sorted(mappings[dataset].keys() - present) if mappings[dataset] is not None else []
+        summaries[dataset] = {
+            'segments': int(len(group)),
+            'ok': int((group['status'] == 'ok').sum()),
+            'with_issues': int((group['status'] == 'issue').sum()),
+            'issue_counts': dict(sorted(issue_counts.items())),
+            'has_mapping_csv': mappings[dataset] is not None,
+            'has_env': bool(envs[dataset]),
+            'mapped_but_missing_segments': missing_segments,
+        }
+
+    num_issues = int((report_df['status'] == 'issue').sum())
+    report = {
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'processed_root': processed_root,
+        'totals': {'datasets': len(datasets), 'segments': len(report_df), 'with_issues': num_issues},
+        'datasets': summaries,
+    }
+
+    os.makedirs(output_dir, exist_ok=True)
+    csv_path = os.path.join(output_dir, 'metadata_audit.csv')
+    json_path = os.path.join(output_dir, 'metadata_audit.json')
+    report_df.to_csv(csv_path, index=False)
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    for dataset, summary in summaries.items():
+        logging.info(f"{dataset}: {summary['segments']} segments, {summary['with_issues']} with issues, {len(summary['mapped_but_missing_segments'])} mapped but missing")
+    logging.info(f"Audit done in {time.perf_counter() - start:.1f}s: {num_issues}/{len(report_df)} segments with issues. Reports: {csv_path}, {json_path}")
+    return num_issues
+
+
+def main() -> None:
+    load_dotenv()
+
+    if '--audit' in sys.argv[1:] or os.getenv('METADATA_AUDIT', '').lower() in ('1', 'true', 'yes'):
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        root_dir = os.path.dirname(script_dir)
+        processed_root = os.path.normpath(os.getenv('AUDIO_PROCESSED_DIR', os.path.join(root_dir, 'Audio_Processed')))
+        output_dir = os.getenv('AUDIT_OUTPUT_DIR', root_dir)
+        num_issues = audit_corpus(processed_root, output_dir)
+        sys.exit(1 if num_issues else 0)
+
+    segments_folder = os.getenv('SEGMENTS_FOLDER')
+    if segments_folder is None:
+        raise ValueError("SEGMENTS_FOLDER not set in .env")
+    sample_check(segments_folder)
+
+
+if __name__ == "__main__":
+    main()
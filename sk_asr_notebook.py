@@ -8,6 +8,8 @@ import pandas as pd
 import subprocess
 import re
 from dotenv import load_dotenv
+from sk_table_io import write_table
+from sk_artifacts import publish
 
 load_dotenv()  # Load .env from cwd
 
@@ -136,30 +138,23 @@ for index, row in df.iterrows():
     df.at[index, 'audio_file'] = lexeme_id
     results.append({'lexeme_id': lexeme_id, 'audio_path': output_file})
 
-# Update and save mapping CSV with audio_file
-df.to_csv(mapping_csv, index=False)
-
-# Duplicate mapping and metadata to Python global outputs
-global_outputs_dir = os.path.dirname(os.path.dirname(dataset_folder))
-global_dataset_dir = os.path.join(global_outputs_dir, 'Python global outputs', os.path.basename(dataset_folder))
-os.makedirs(global_dataset_dir, exist_ok=True)
-global_mapping_csv = os.path.join(global_dataset_dir, 'mapping.csv')
-df.to_csv(global_mapping_csv, index=False)
-global_metadata_csv = os.path.join(global_dataset_dir, 'metadata.csv')
-
-# Save metadata CSV
-pd.DataFrame(results).to_csv(metadata_csv, index=False)
-pd.DataFrame(results).to_csv(global_metadata_csv, index=False)
-print(f"Segmentation complete! Files in {dataset_folder}: mapping.csv, metadata.csv. Duplicated to Python global outputs/{os.path.basename(dataset_folder)}/")
+# Update and save mapping CSV with audio_file, and metadata CSV
+written = write_table(df, mapping_csv) + write_table(pd.DataFrame(results), metadata_csv)
+
+# Publish mapping and metadata to Python global outputs (hardlink/reflink, copy only as fallback)
+project_root = os.path.dirname(os.path.dirname(dataset_folder))
+publish(written, project_root, os.path.basename(dataset_folder))
+print(f"Segmentation complete! Files in {dataset_folder}: mapping.csv, metadata.csv. Published to Python global outputs/{os.path.basename(dataset_folder)}/")
 exit()
 from transformers import pipeline
 import torch
 import os
 import pandas as pd
-import subprocess
 import logging
-import json
 from dotenv import load_dotenv
+from sk_riff_metadata import get_metadata
+from sk_table_io import write_table
+from sk_artifacts import publish
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -203,27 +198,6 @@ logging.info(f"Device set to use {'cuda:0' if device == 0 else 'cpu'}")
 asr_model = ck_model if sk_variety == 'CK' else sk_model
 asr_pipe = pipeline("automatic-speech-recognition", model=asr_model, device=device)
 
-def get_metadata(file_path):
-    """Extract metadata tags from an audio file using ffprobe."""
-    file_path = os.path.normpath(file_path)
-    if not os.path.exists(file_path):
-        logging.warning(f"File not found for metadata extraction: {file_path}")
-        return {}
-    cmd = [
-        'ffprobe', '-v', 'quiet', '-print_format', 'json',
-        '-show_entries', 'format_tags', file_path
-    ]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        logging.error(f"Error extracting metadata from {file_path}: {result.stderr}")
-        return {}
-    try:
-        data = json.loads(result.stdout)
-        return data.get('format', {}).get('tags', {})
-    except json.JSONDecodeError:
-        logging.error(f"Error parsing metadata JSON from {file_path}")
-        return {}
-
 # Extract metadata from the original audio file (shared across all segments)
 original_metadata = get_metadata(input_wav_path)
 logging.info(f"Original audio metadata: {original_metadata}")
@@ -253,8 +227,8 @@ for idx, row in df.iterrows():
     name = row.get('Name', '')
     # english_word from Name (remove id prefix) or title
     english_word = re.sub(r'[\[(]?\d+(?:\.\d+)?[\])]?[- ]*', '', name).strip()
+    segment_metadata = get_metadata(audio_path)
     if not english_word:
-        segment_metadata = get_metadata(audio_path)
         english_word = segment_metadata.get('title', 'unknown').title()
 
     logging.info(f"Processing {lexeme_id}: source={source}, survey_item={survey_item}, english={english_word}")
@@ -277,8 +251,6 @@ for idx, row in df.iterrows():
     except Exception as e:
         logging.error(f"IPA error for {audio_path}: {e}")
 
-    segment_metadata = get_metadata(audio_path)
-
     results.append({
         'source': source,
         'survey_item': survey_item,
@@ -302,14 +274,10 @@ df_results = df_results[priority_cols + other_cols]
 script_dir = os.path.dirname(os.path.abspath(__file__))
 root_dir = os.path.dirname(script_dir)
 
-df_results.to_csv(output_csv, index=False)
+written = write_table(df_results, output_csv)
 
-# Duplicate to Python global outputs
-global_outputs_dir = os.path.join(root_dir, 'Python global outputs')
-global_dataset_dir = os.path.join(global_outputs_dir, sk_dataset_name)
-os.makedirs(global_dataset_dir, exist_ok=True)
-global_output_csv = os.path.join(global_dataset_dir, os.path.basename(output_csv))
-df_results.to_csv(global_output_csv, index=False)
+# Publish to Python global outputs (hardlink/reflink, copy only as fallback)
+global_output_csv = publish(written, root_dir, sk_dataset_name)[0]
 
-logging.info(f"ASR complete! Results saved to {output_csv} and duplicated to {global_output_csv}")
-print(f"Output CSV saved: {output_csv} (duplicated to Python global outputs/{sk_dataset_name}/)")
+logging.info(f"ASR complete! Results saved to {output_csv} and published to {global_output_csv}")
+print(f"Output CSV saved: {output_csv} (published to Python global outputs/{sk_dataset_name}/)")
@@ -0,0 +1,287 @@
+# sk_audio_screening.py
+# Pre-inference audio quality screening of the segmented .wav files (run after sk_asr_segmentation.py).
+# Samples are read straight from the WAV data chunk (PCM 8/16/24/32-bit or float, channels averaged; no ffprobe)
+# and a batch of segments is screened at once in NumPy: duration, RMS and peak level (dBFS), clipping ratio
+# (share of samples at full scale) and an SNR estimate (90th minus 10th percentile of 20 ms frame energies, dB:
+# speech frames against the noise floor). Segments failing a threshold are tagged 'low' with the reasons, files
+# that cannot be decoded 'unreadable'. Writes <dataset>/audio_quality.csv and adds quality/quality_reasons to
+# metadata.csv. sk_ipa_transcription.py and sk_multi_ipa.py then skip or defer low-quality segments according to
+# the dataset's QUALITY_POLICY (off | skip | deprioritize).
+
+import os
+import struct
+import logging
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+from sk_catalog import open_catalog
+from sk_dataset_config import DatasetConfig, load_dataset_config, run_datasets
+from sk_table_io import read_table, write_table
+from sk_artifacts import publish
+
+logger = logging.getLogger(__name__)
+
+QUALITY_CSV = 'audio_quality.csv'
+QUALITY_COLUMNS = ['quality', 'quality_reasons']
+
+# Threshold -> default; each can be overridden with SCREEN_<NAME> in the environment
+DEFAULT_THRESHOLDS: Dict[str, float] = {
+    'min_duration': 0.15,  # seconds
+    'max_duration': 30.0,
+    'min_rms_dbfs': -45.0,
+    'max_clipping': 0.01,  # share of samples
+    'min_snr_db': 10.0,
+}
+
+CLIP_LEVEL = 0.999  # |sample| at or above this share of full scale counts as clipped (see clip_level)
+FRAME_SECONDS = 0.02
+MIN_FRAMES = 5  # fewer frames than this: no SNR estimate
+SCREEN_BATCH = 512  # segments per NumPy batch
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+def screening_thresholds() -> Dict[str, float]:
+    return {k: float(os.getenv(f"SCREEN_{k.upper()}", v)) for k, v in DEFAULT_THRESHOLDS.items()}
+
+
+def clip_level(tag: int, bits: int) -> float:
+    """CLIP_LEVEL, capped at the largest positive code of integer PCM (8-bit: 127/128, below CLIP_LEVEL)."""
+    return min(CLIP_LEVEL, 1.0 - 2.0 ** (1 - bits)) if tag == WAVE_FORMAT_PCM else CLIP_LEVEL
+
+
+def read_wav(path: str) -> Tuple[np.ndarray, int, float]:
+    """Mono float32 samples in [-1, 1], sample rate and clip level of a WAV file. Raises ValueError if unsupported."""
+    with open(path, 'rb') as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+            raise ValueError("not a RIFF/WAVE file")
+        file_size = os.fstat(f.fileno()).st_size
+        offset = 12
+        fmt = None
+        while offset + 8 <= file_size:
+            f.seek(offset)
+            chunk_id, size = struct.unpack('<4sI', f.read(8))
+            if chunk_id == b'fmt ':
+                fmt = f.read(min(size, 40))
+            elif chunk_id == b'data':
+                if fmt is None or len(fmt) < 16:
+                    raise ValueError("data chunk before fmt chunk")
+                tag, channels, rate, _, block_align, bits = struct.unpack_from('<HHIIHH', fmt)
+                if tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+                    tag = struct.unpack_from('<H', fmt, 24)[0]  # first two bytes of the sub-format GUID
+                if channels < 1 or block_align < 1:
+                    raise ValueError("invalid fmt chunk")
+                frames = min(size, file_size - offset - 8) // block_align  # streamed files may carry a bogus size
+                raw = np.fromfile(f, dtype=np.uint8, count=frames * block_align)
+                return _decode(raw, tag, bits, channels), rate, clip_level(tag, bits)
+            offset += 8 + size + (size & 1)
+    raise ValueError("no data chunk")
+
+
+def _decode(raw: np.ndarray, tag: int, bits: int, channels: int) -> np.ndarray:
+    if tag == WAVE_FORMAT_PCM and bits == 8:
+        x = (raw.astype(np.float32) - 128.0) / 128.0
+    elif tag == WAVE_FORMAT_PCM and bits == 16:
+        x = raw.view('<i2').astype(np.float32) / 32768.0
+    elif tag == WAVE_FORMAT_PCM and bits == 24:
+        b = raw.reshape(-1, 3).astype(np.int32)
+        x = (((b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)) << 8) >> 8).astype(np.float32) / 8388608.0
+    elif tag == WAVE_FORMAT_PCM and bits == 32:
+        x = (raw.view('<i4') / 2147483648.0).astype(np.float32)
+    elif tag == WAVE_FORMAT_IEEE_FLOAT and bits == 32:
+        x = raw.view('<f4').astype(np.float32)
+    elif tag == WAVE_FORMAT_IEEE_FLOAT and bits == 64:
+        x = raw.view('<f8').astype(np.float32)
+    else:
+        raise ValueError(f"unsupported WAV format tag={tag} bits={bits}")
+    if channels > 1:
+        x = x[:len(x) - len(x) % channels].reshape(-1, channels).mean(axis=1)
+    return x
+
+
+def _read_or_none(path: str) -> Optional[Tuple[np.ndarray, int, float]]:
+    try:
+        return read_wav(path)
+    except (OSError, ValueError, struct.error) as e:
+        logger.warning(f"Cannot decode {path}: {e}")
+        return None
+
+
+def _frame_snr(signals: List[np.ndarray], frame_len: int) -> np.ndarray:
+    """SNR estimate (dB) per signal from its 20 ms frame energies; NaN if it has fewer than MIN_FRAMES frames."""
+    n_frames = np.array([len(s) // frame_len for s in signals])
+    snr = np.full(len(signals), np.nan)
+    if not n_frames.sum():
+        return snr
+    frames = np.concatenate([s[:n * frame_len] for s, n in zip(signals, n_frames)]).reshape(-1, frame_len)
+    energy_db = 10.0 * np.log10(np.einsum('ij,ij->i', frames, frames) / frame_len + 1e-12)
+    seg = np.repeat(np.arange(len(signals)), n_frames)
+    order = np.lexsort((energy_db, seg))  # frames sorted by energy within each signal
+    starts = np.r_[0, np.cumsum(n_frames)[:-1]]
+    ok = n_frames >= MIN_FRAMES
+    sorted_db = energy_db[order]
+    low = sorted_db[starts[ok] + ((n_frames[ok] - 1) * 0.1).astype(int)]
+    high = sorted_db[starts[ok] + ((n_frames[ok] - 1) * 0.9).astype(int)]
+    snr[ok] = high - low
+    return snr
+
+
+def signal_metrics(signals: List[np.ndarray], sample_rates: List[int],
+                   clip_levels: Optional[List[float]] = None) -> pd.DataFrame:
+    """duration, rms_dbfs, peak_dbfs, clipping_ratio and snr_db for a batch of mono signals, in one pass."""
+    lengths = np.array([len(s) for s in signals], dtype=np.int64)
+    levels = np.full(len(signals), CLIP_LEVEL) if clip_levels is None else np.asarray(clip_levels, dtype=np.float64)
+    rates = np.array(sample_rates, dtype=np.float64)
+    sumsq = np.zeros(len(signals))
+    peak = np.zeros(len(signals))
+    clipped = np.zeros(len(signals))
+    nonempty = np.flatnonzero(lengths > 0)
+    if len(nonempty):
+        flat = np.concatenate([signals[i] for i in nonempty])
+        starts = np.r_[0, np.cumsum(lengths[nonempty])[:-1]]
+        mag = np.abs(flat)
+        sumsq[nonempty] = np.add.reduceat(np.square(flat, dtype=np.float64), starts)
+        peak[nonempty] = np.maximum.reduceat(mag, starts)
+        clipped[nonempty] = np.add.reduceat((mag >= np.repeat(levels[nonempty], lengths[nonempty])).astype(np.int64), starts)
+    snr = np.full(len(signals), np.nan)
+    for rate in np.unique(rates):
+        idx = np.flatnonzero(rates == rate)
+        snr[idx] = _frame_snr([signals[i] for i in idx], max(1, int(rate * FRAME_SECONDS)))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return pd.DataFrame({
+            'duration': np.where(rates > 0, lengths / rates, 0.0),
+            'sample_rate': rates.astype(np.int64),
+            'rms_dbfs': 10.0 * np.log10(np.where(lengths > 0, sumsq / np.maximum(lengths, 1), 0.0) + 1e-12),
+            'peak_dbfs': 20.0 * np.log10(peak + 1e-12),
+            'clipping_ratio': np.where(lengths > 0, clipped / np.maximum(lengths, 1), 0.0),
+            'snr_db': snr,
+        })
+
+
+def classify(metrics: pd.DataFrame, thresholds: Dict[str, float]) -> pd.DataFrame:
+    """quality ('ok' | 'low') and the comma-separated reasons for each row of signal_metrics."""
+    checks = {
+        'short': metrics['duration'] < thresholds['min_duration'],
+        'long': metrics['duration'] > thresholds['max_duration'],
+        'quiet': metrics['rms_dbfs'] < thresholds['min_rms_dbfs'],
+        'clipped': metrics['clipping_ratio'] > thresholds['max_clipping'],
+        'noisy': metrics['snr_db'] < thresholds['min_snr_db'],  # NaN (too short to tell) never counts as noisy
+    }
+    reasons = pd.Series('', index=metrics.index, dtype=object)
+    for name, failed in checks.items():
+        reasons = reasons.where(~failed, reasons + name + ',')
+    return pd.DataFrame({'quality': np.where(reasons != '', 'low', 'ok'), 'quality_reasons': reasons.str.rstrip(',')},
+                        index=metrics.index)
+
+
+def screen_files(paths: List[str], thresholds: Dict[str, float], max_workers: Optional[int] = None) -> pd.DataFrame:
+    """Quality table (audio_path, metrics, quality, quality_reasons) for paths, in input order."""
+    max_workers = max_workers or int(os.getenv('METADATA_WORKERS', min(32, (os.cpu_count() or 1) * 4)))
+    parts = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for start in range(0, len(paths), SCREEN_BATCH):
+            batch = paths[start:start + SCREEN_BATCH]
+            decoded = list(executor.map(_read_or_none, batch))
+            readable = [i for i, d in enumerate(decoded) if d is not None]
+            metrics = signal_metrics(*([decoded[i][k] for i in readable] for k in range(3)))
+            metrics.index = readable
+            metrics = pd.concat([metrics, classify(metrics, thresholds)], axis=1).reindex(range(len(batch)))
+            metrics['quality'] = metrics['quality'].fillna('unreadable')
+            metrics['quality_reasons'] = metrics['quality_reasons'].fillna('decode')
+            metrics.insert(0, 'audio_path', batch)
+            parts.append(metrics)
+    return pd.concat(parts, ignore_index=True)
+
+
+def load_quality(dataset_dir: str) -> Dict[str, str]:
+    """audio_path -> quality from the dataset's audio_quality.csv ({} if it was not screened)."""
+    path = os.path.join(dataset_dir, QUALITY_CSV)
+    if not os.path.exists(path):
+        return {}
+    df = read_table(path, columns=['audio_path', 'quality'], schema='audio_quality')
+    return dict(zip(df['audio_path'].map(os.path.normpath), df['quality'].astype(str)))
+
+
+def apply_quality_policy(audio_files: List[str], dataset_dir: str, policy: str) -> List[str]:
+    """Order/filter segments for ASR: 'skip' drops low/unreadable ones, 'deprioritize' moves them last, 'off' keeps all."""
+    policy = (policy or 'off').lower()
+    if policy == 'off':
+        return audio_files
+    quality = load_quality(dataset_dir)
+    if not quality:
+        logger.warning(f"QUALITY_POLICY={policy} but {dataset_dir} has no {QUALITY_CSV}; run sk_audio_screening.py first")
+        return audio_files
+    good = [p for p in audio_files if quality.get(os.path.normpath(p), 'ok') == 'ok']
+    bad = [p for p in audio_files if quality.get(os.path.normpath(p), 'ok') != 'ok']
+    if policy == 'skip':
+        logger.info(f"Quality policy: skipping {len(bad)} low-quality segments of {len(audio_files)}")
+        return good
+    if policy == 'deprioritize':
+        logger.info(f"Quality policy: {len(bad)} low-quality segments of {len(audio_files)} moved to the end")
+        return good + bad
+    raise ValueError(f"Unknown QUALITY_POLICY {policy!r} (off, skip, deprioritize)")
+
+
+def process_dataset_dir(config: DatasetConfig, audio_files: List[str], root_dir: str, thresholds: Dict[str, float]) -> int:
+    """Screen one dataset's segments, write audio_quality.csv and tag metadata.csv. Returns the low-quality count."""
+    dataset_dir = config.dataset_dir
+    if not audio_files:
+        logger.warning(f"No segments in {dataset_dir}, skipping")
+        return 0
+    table = screen_files(audio_files, thresholds)
+    table.insert(0, 'lexeme_id', table['audio_path'].map(lambda p: os.path.basename(p).replace('.wav', '')))
+    written = write_table(table, os.path.join(dataset_dir, QUALITY_CSV), 'audio_quality')
+
+    # Tag metadata.csv rows (replacing tags of an earlier screening)
+    if os.path.exists(config.metadata_csv):
+        metadata = read_table(config.metadata_csv, schema='metadata')
+        metadata = metadata.drop(columns=[c for c in QUALITY_COLUMNS if c in metadata.columns])
+        tags = table.assign(audio_path=table['audio_path'].map(os.path.normpath)).set_index('audio_path')[QUALITY_COLUMNS]
+        tagged = tags.reindex(metadata['audio_path'].astype(str).map(os.path.normpath).to_numpy())
+        for column in QUALITY_COLUMNS:
+            metadata[column] = tagged[column].to_numpy()
+        written += write_table(metadata, config.metadata_csv, 'metadata')
+    publish(written, root_dir, os.path.basename(dataset_dir))
+
+    counts = table['quality'].value_counts()
+    logger.info(f"Screened {len(table)} segments in {dataset_dir}: {counts.get('ok', 0)} ok, {counts.get('low', 0)} low, "
+                f"{counts.get('unreadable', 0)} unreadable")
+    return int(len(table) - counts.get('ok', 0))
+
+
+def _screen_config(config: DatasetConfig, segments: Dict[str, List[str]], root_dir: str, thresholds: Dict[str, float]) -> int:
+    return process_dataset_dir(config, segments[os.path.basename(config.dataset_dir)], root_dir, thresholds)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    load_dotenv()
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    root_dir = os.path.dirname(script_dir)
+    processed_root = os.path.normpath(os.path.join(root_dir, 'Audio_Processed'))
+    if not os.path.exists(processed_root):
+        raise ValueError(f"Audio_Processed not found at {processed_root}")
+
+    catalog = open_catalog(root_dir, processed_root)
+    target_dirs = catalog.datasets(require_segments=True, require_env=False)
+    configs = [load_dataset_config(os.path.join(processed_root, d), catalog.dataset_env(d)) for d in target_dirs]
+    segments = {d: catalog.segment_paths(d) for d in target_dirs}
+    catalog.close()
+
+    thresholds = screening_thresholds()
+    logger.info(f"Screening {sum(len(s) for s in segments.values())} segments in {len(target_dirs)} datasets, thresholds {thresholds}")
+    # Datasets in parallel (DATASET_WORKERS / DATASET_EXECUTOR); file reads within a dataset from a thread pool
+    screen = partial(_screen_config, segments=segments, root_dir=root_dir, thresholds=thresholds)
+    low = run_datasets(screen, configs)
+    logger.info(f"Screening complete: {sum(n or 0 for n in low)} segments below quality thresholds")
+
+
+if __name__ == "__main__":
+    main()
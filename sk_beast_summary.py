@@ -0,0 +1,363 @@
+# sk_beast_summary.py
+# One-pass convergence summary of BEAST 2 output (BEAST_LOG: the .log trace, BEAST_TREES: the .trees file; either or
+# both), next to the cognate / Nexus tools (sk_nexus_export.py). Both files are read as a stream: the log in chunks,
+# the trees line by line. Only compact per-sample data is kept (parameter values; per tree the IDs of its clades,
+# which are hashed as taxon bit masks, and the clade heights), thinned to at most BEAST_MAX_SAMPLES samples by
+# dropping every other one whenever the limit is reached, so memory stays bounded however long the chain ran.
+# BEAST_BURNIN (default 0.1) is a fraction of the samples, or a state number if >= 1.
+# Writes <name>_trace.csv (per parameter: mean, sd, median, 95% HPD, ESS and autocorrelation time as Tracer
+# computes them), <name>_marginal.csv (harmonic mean and AICM of the likelihood, for Bayes factors between runs),
+# <name>_clades.csv (clade frequencies and mean heights) and <name>_mcc.tree (maximum clade credibility tree with
+# posterior and mean height per node). The MCC tree is read back by its byte offset, not by a second pass.
+
+import os
+import re
+import logging
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterator, List, Optional, Tuple
+from dotenv import load_dotenv
+from sk_distance_trees import newick_name
+from sk_table_io import write_table
+from sk_artifacts import atomic_path, publish
+
+LOG_CHUNK_ROWS = 10000
+MAX_LAG = 2000  # Tracer's autocorrelation lag limit
+HPD_MASS = 0.95
+TREE_LINE = re.compile(r'\s*tree\s+(\S+)\s*=\s*(?:\[&[RU]\]\s*)?(.*)', re.IGNORECASE)
+NEWICK_TOKEN = re.compile(r"\(|\)|,|:[^(),;]*|'(?:[^']|'')*'|[^(),:;]+")
+COMMENT = re.compile(r'\[[^\]]*\]')
+
+
+class ThinnedSamples:
+    """Keeps every stride-th sample; when more than capacity are kept, every other one is dropped and stride doubles."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.stride = 1
+        self.seen = 0
+        self.items: list = []
+
+    def due(self) -> bool:
+        """Whether the next sample is kept (lets callers skip parsing the others)."""
+        return self.seen % self.stride == 0
+
+    def skip(self) -> None:
+        self.seen += 1
+
+    def append(self, item) -> None:
+        if self.due():
+            self.items.append(item)
+            if len(self.items) > self.capacity:
+                self.items = self.items[::2]
+                self.stride *= 2
+        self.seen += 1
+
+    def extend_rows(self, rows: np.ndarray) -> None:
+        """Append the due rows of an array as copies, so a kept row does not keep the whole array alive."""
+        for row in rows:
+            if self.due():
+                self.append(row.copy())
+            else:
+                self.skip()
+
+
+def burnin_start(states: np.ndarray, burnin: float) -> int:
+    """Index of the first sample after burn-in (burnin < 1: fraction of the samples, else a state number)."""
+    if burnin < 1:
+        return int(np.ceil(burnin * len(states)))
+    return int(np.searchsorted(states, burnin, side='left'))
+
+
+# --- Trace log ---
+
+def read_log(path: str, capacity: int) -> Tuple[List[str], np.ndarray, np.ndarray, int]:
+    """Columns, states and values of the (thinned) samples of a BEAST log, and the number of samples in the file."""
+    thinned = ThinnedSamples(capacity)
+    columns: List[str] = []
+    for chunk in pd.read_csv(path, sep='\t', comment='#', chunksize=LOG_CHUNK_ROWS):
+        columns = [str(c) for c in chunk.columns]
+        values = chunk.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+        thinned.extend_rows(values)
+    if not thinned.items:
+        raise ValueError(f"No samples in {path}")
+    data = np.vstack(thinned.items)
+    logging.info(f"{path}: {thinned.seen} samples, kept {len(data)} (every {thinned.stride})")
+    return columns[1:], data[:, 0].astype(np.int64), data[:, 1:], thinned.seen
+
+
+def autocorrelation(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """ESS and autocorrelation time (in samples) per column, as Tracer: autocovariance summed in lag pairs while
+    the pair sum is positive (Geyer's initial positive sequence), up to MAX_LAG."""
+    n = len(values)
+    centered = values - values.mean(axis=0)
+    size = 1 << int(2 * n - 1).bit_length()
+    spectrum = np.fft.rfft(centered, n=size, axis=0)
+    max_lag = min(n - 1, MAX_LAG)
+    lags = np.arange(max_lag + 1)
+    gamma = np.fft.irfft(spectrum * np.conj(spectrum), n=size, axis=0)[:max_lag + 1] / (n - lags)[:, None]
+    pairs = gamma[1:max_lag:2][:(max_lag - 1) // 2] + gamma[2:max_lag:2][:(max_lag - 1) // 2]
+    positive = np.cumprod(pairs > 0, axis=0).astype(bool)
+    var_stat = gamma[0] + 2 * np.where(positive, pairs, 0).sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        act = var_stat / gamma[0]
+        return n / act, act
+
+
+def hpd(sorted_values: np.ndarray, mass: float = HPD_MASS) -> Tuple[np.ndarray, np.ndarray]:
+    """Shortest interval holding mass of the samples, per column of column-sorted values."""
+    n = len(sorted_values)
+    k = max(int(np.floor(mass * n)), 1) if n > 1 else 0
+    widths = sorted_values[k:] - sorted_values[:n - k]
+    start = np.argmin(widths, axis=0)
+    columns = np.arange(sorted_values.shape[1])
+    return sorted_values[start, columns], sorted_values[start + k, columns]
+
+
+def trace_summary(columns: List[str], values: np.ndarray) -> pd.DataFrame:
+    ess, act = autocorrelation(values)
+    ordered = np.sort(values, axis=0)
+    lower, upper = hpd(ordered)
+    return pd.DataFrame({
+        'parameter': columns, 'n_samples': len(values), 'mean': values.mean(axis=0),
+        'sd': values.std(axis=0, ddof=1) if len(values) > 1 else np.nan, 'median': np.median(ordered, axis=0),
+        'hpd95_lower': lower, 'hpd95_upper': upper, 'min': ordered[0], 'max': ordered[-1], 'ess': ess, 'act': act,
+    })
+
+
+def marginal_summary(columns: List[str], values: np.ndarray) -> pd.DataFrame:
+    """Harmonic mean and AICM (Raftery et al. 2007: 2 var - 2 mean, lower is better) of the likelihood columns."""
+    rows = []
+    for k, column in enumerate(columns):
+        if 'likelihood' not in column.lower():
+            continue
+        loglik = values[:, k]
+        m = -loglik
+        log_harmonic = -(m.max() + np.log(np.exp(m - m.max()).sum()) - np.log(len(loglik)))
+        rows += [
+            {'column': column, 'estimator': 'harmonic_mean', 'log_value': log_harmonic, 'n_samples': len(loglik)},
+            {'column': column, 'estimator': 'aicm', 'log_value': 2 * loglik.var(ddof=1) - 2 * loglik.mean(),
+             'n_samples': len(loglik)},
+            {'column': column, 'estimator': 'mean', 'log_value': loglik.mean(), 'n_samples': len(loglik)},
+        ]
+    return pd.DataFrame(rows, columns=['column', 'estimator', 'log_value', 'n_samples'])
+
+
+# --- Trees ---
+
+def _tree_lines(path: str) -> Iterator[Tuple[int, str]]:
+    """(byte offset, decoded line) of a text file read in binary, so offsets can be seeked back to."""
+    offset = 0
+    with open(path, 'rb') as f:
+        for raw in f:
+            yield offset, raw.decode('utf-8')
+            offset += len(raw)
+
+
+def _label(token: str) -> str:
+    token = token.strip()
+    return token[1:-1].replace("''", "'") if token.startswith("'") else token
+
+
+def newick_nodes(text: str) -> Tuple[List[int], List[Optional[str]], List[float]]:
+    """Nodes of a Newick tree in preorder: parent (-1 for the root), tip label (None if internal), branch length."""
+    parent: List[int] = []
+    labels: List[Optional[str]] = []
+    lengths: List[float] = []
+    current, last = -1, -1
+    for token in NEWICK_TOKEN.findall(COMMENT.sub('', text)):
+        if token == '(':
+            parent.append(current)
+            labels.append(None)
+            lengths.append(0.0)
+            current, last = len(parent) - 1, -1
+        elif token == ')':
+            last, current = current, parent[current]
+        elif token == ',':
+            last = -1
+        elif token.startswith(':'):
+            lengths[last] = float(token[1:])
+        elif token.strip() and last == -1:  # a label right after ')' names an internal node and is ignored
+            parent.append(current)
+            labels.append(_label(token))
+            lengths.append(0.0)
+            last = len(parent) - 1
+    return parent, labels, lengths
+
+
+def parse_newick(text: str, tip_index: Dict[str, int]) -> Tuple[List[int], List[int], np.ndarray, List[int]]:
+    """Nodes of a Newick tree in preorder: parent, tip taxon (-1 for internal nodes), height, clade bit mask."""
+    parent, labels, lengths = newick_nodes(text)
+    tips = [-1 if label is None else tip_index[label] for label in labels]
+    depth = np.zeros(len(parent))
+    for node in range(1, len(parent)):
+        depth[node] = depth[parent[node]] + lengths[node]
+    heights = depth[np.array(tips) >= 0].max() - depth
+    masks = [1 << t if t >= 0 else 0 for t in tips]
+    for node in range(len(parent) - 1, 0, -1):
+        masks[parent[node]] |= masks[node]
+    return parent, tips, heights, masks
+
+
+def read_trees(path: str, capacity: int) -> Tuple[List[str], Dict[str, int], Dict[int, int], list, int]:
+    """Taxa, tip label -> taxon index, clade ids (bit mask -> id) and the thinned (state, byte offset, clade ids,
+    clade heights) per tree."""
+    thinned = ThinnedSamples(capacity)
+    taxa: List[str] = []
+    translate: Dict[str, str] = {}
+    tip_index: Dict[str, int] = {}
+    clade_ids: Dict[int, int] = {}
+    in_translate = False
+    for offset, line in _tree_lines(path):
+        stripped = line.strip()
+        if in_translate:
+            for entry in stripped.rstrip(';').split(','):
+                parts = entry.split(None, 1)
+                if len(parts) == 2:
+                    translate[parts[0]] = _label(parts[1])
+            in_translate = not stripped.endswith(';')
+            continue
+        if stripped.lower() == 'translate':
+            in_translate = True
+            continue
+        match = TREE_LINE.match(line)
+        if not match:
+            continue
+        if not tip_index:
+            # Taxa in translate-table order, else sorted tip names of the first tree
+            taxa = list(translate.values()) or sorted(l for l in newick_nodes(match.group(2))[1] if l is not None)
+            position = {name: k for k, name in enumerate(taxa)}
+            tip_index = {key: position[name] for key, name in translate.items()} or position
+        if not thinned.due():
+            thinned.skip()
+            continue
+        _, tips, heights, masks = parse_newick(match.group(2), tip_index)
+        internal = [k for k, t in enumerate(tips) if t < 0]
+        ids = np.array([clade_ids.setdefault(masks[k], len(clade_ids)) for k in internal], dtype=np.int32)
+        state = int(re.sub(r'\D', '', match.group(1)) or thinned.seen)
+        thinned.append((state, offset, ids, heights[internal].astype(np.float32)))
+    logging.info(f"{path}: {thinned.seen} trees, kept {len(thinned.items)} (every {thinned.stride}), "
+                 f"{len(taxa)} taxa, {len(clade_ids)} distinct clades")
+    return taxa, tip_index, clade_ids, thinned.items, thinned.seen
+
+
+def tree_summary(taxa: List[str], clade_ids: Dict[int, int], trees: list) -> Tuple[pd.DataFrame, np.ndarray, int]:
+    """Clade table (frequency, mean height), per-clade frequency / mean height arrays and the MCC tree index."""
+    all_ids = np.concatenate([t[2] for t in trees])
+    all_heights = np.concatenate([t[3] for t in trees]).astype(float)
+    counts = np.bincount(all_ids, minlength=len(clade_ids))
+    frequency = counts / len(trees)
+    with np.errstate(invalid='ignore'):
+        mean_height = np.bincount(all_ids, weights=all_heights, minlength=len(clade_ids)) / counts
+    # Clade credibility of each tree: sum of log clade frequencies
+    log_frequency = np.log(np.where(frequency > 0, frequency, 1))
+    best = int(np.argmax([log_frequency[t[2]].sum() for t in trees]))
+    masks = sorted(clade_ids, key=clade_ids.get)
+    n_taxa = [bin(m).count('1') for m in masks]
+    clades = pd.DataFrame({
+        'clade': [' '.join(taxa[k] for k in range(len(taxa)) if m >> k & 1) for m in masks],
+        'n_taxa': n_taxa, 'frequency': frequency, 'mean_height': mean_height,
+        'in_mcc': np.isin(np.arange(len(masks)), trees[best][2]),
+    })
+    clades = clades[counts > 0].sort_values(['frequency', 'n_taxa'], ascending=[False, False], ignore_index=True)
+    return clades, np.stack([frequency, mean_height]), best
+
+
+def mcc_newick(text: str, taxa: List[str], tip_index: Dict[str, int], clade_ids: Dict[int, int],
+               frequency: np.ndarray, mean_height: np.ndarray) -> str:
+    """The MCC tree with mean clade heights (tips keep their own) and posterior/height annotations."""
+    parent, tips, heights, masks = parse_newick(text, tip_index)
+    node_height = np.array([heights[k] if tips[k] >= 0 else mean_height[clade_ids[masks[k]]] for k in range(len(tips))])
+    children: Dict[int, List[int]] = {}
+    for node in range(1, len(parent)):
+        children.setdefault(parent[node], []).append(node)
+
+    def fmt(node: int) -> str:
+        if tips[node] >= 0:
+            out = newick_name(taxa[tips[node]])
+        else:
+            clade = clade_ids[masks[node]]
+            inner = ','.join(fmt(child) for child in children[node])
+            out = f"({inner})[&posterior={frequency[clade]:.4f},height={node_height[node]:.6f}]"
+        if node == 0:
+            return out
+        return f"{out}:{max(node_height[parent[node]] - node_height[node], 0.0):.6f}"
+
+    return fmt(0) + ';'
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    # Project root
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    root_dir = os.path.dirname(script_dir)
+
+    load_dotenv(os.path.join(root_dir, '.env'), override=True)
+
+    log_path = os.getenv('BEAST_LOG')
+    trees_path = os.getenv('BEAST_TREES')
+    burnin = float(os.getenv('BEAST_BURNIN', 0.1))
+    capacity = int(os.getenv('BEAST_MAX_SAMPLES', 100000))
+    output_dir = os.getenv('OUTPUT_DIR', root_dir)
+
+    if not log_path and not trees_path:
+        raise ValueError("Set BEAST_LOG and/or BEAST_TREES")
+    for path in (log_path, trees_path):
+        if path and not os.path.exists(path):
+            raise ValueError(f"BEAST output not found at {path}")
+
+    written = []
+    if log_path:
+        stem = os.path.join(output_dir, os.path.splitext(os.path.basename(log_path))[0])
+        columns, states, values, _ = read_log(log_path, capacity)
+        start = burnin_start(states, burnin)
+        post = values[start:]
+        if len(post) < 2:
+            raise ValueError(f"Only {len(post)} samples after burn-in in {log_path}")
+        logging.info(f"Burn-in: {start} samples (up to state {states[start - 1] if start else states[0]})")
+        trace = trace_summary(columns, post)
+        written += write_table(trace, f"{stem}_trace.csv", 'beast_trace')
+        written += write_table(marginal_summary(columns, post), f"{stem}_marginal.csv", 'beast_marginal')
+        low = trace[trace['ess'] < 200]
+        if low.empty:
+            logging.info(f"All {len(trace)} parameters have ESS >= 200")
+        else:
+            logging.warning(f"ESS < 200: {', '.join(f'{p} ({e:.0f})' for p, e in zip(low['parameter'], low['ess']))}")
+
+    if trees_path:
+        stem = os.path.join(output_dir, os.path.splitext(os.path.basename(trees_path))[0])
+        taxa, tip_index, clade_ids, trees, _ = read_trees(trees_path, capacity)
+        if not trees:
+            raise ValueError(f"No trees in {trees_path}")
+        start = burnin_start(np.array([t[0] for t in trees]), burnin)
+        trees = trees[start:]
+        if not trees:
+            raise ValueError(f"No trees after burn-in in {trees_path}")
+        clades, (frequency, mean_height), best = tree_summary(taxa, clade_ids, trees)
+        written += write_table(clades, f"{stem}_clades.csv", 'beast_clades')
+
+        # Read the MCC tree back from its offset
+        with open(trees_path, 'rb') as f:
+            f.seek(trees[best][1])
+            match = TREE_LINE.match(f.readline().decode('utf-8'))
+        path = f"{stem}_mcc.tree"
+        with atomic_path(path) as tmp_path:
+            with open(tmp_path, 'w', encoding='utf-8', newline='\n') as f:
+                f.write("#NEXUS\n\nBegin taxa;\n")
+                f.write(f"    Dimensions ntax={len(taxa)};\n    Taxlabels\n")
+                f.writelines(f"        {newick_name(t)}\n" for t in taxa)
+                f.write("        ;\nEnd;\n\nBegin trees;\n")
+                newick_text = mcc_newick(match.group(2), taxa, tip_index, clade_ids, frequency, mean_height)
+                f.write(f"tree MCC_{trees[best][0]} = [&R] {newick_text}\nEnd;\n")
+        written.append(path)
+        logging.info(f"{len(trees)} trees after burn-in; MCC tree is state {trees[best][0]} "
+                     f"({(clades['in_mcc'] & (clades['frequency'] >= 0.95)).sum()} of {clades['in_mcc'].sum()} "
+                     f"clades with posterior >= 0.95)")
+
+    publish(written, root_dir)
+    logging.info(f"Saved {', '.join(written)}")
+
+
+if __name__ == "__main__":
+    main()
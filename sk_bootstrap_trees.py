@@ -0,0 +1,195 @@
+# sk_bootstrap_trees.py
+# Bootstrap support for the distance trees of sk_distance_trees.py (same COGNATES_CSV / NEXUS_COGID_COLUMN settings).
+# Each of BOOTSTRAP_REPLICATES replicates resamples the cognate characters with replacement, recomputes the
+# BOOTSTRAP_METRIC distances and the BOOTSTRAP_METHOD tree and returns its splits (bipartitions of the doculects).
+# Replicates run in a process pool (BOOTSTRAP_WORKERS, default all cores); the dense present/observed matrices sit
+# in one shared-memory block that all workers map instead of each getting a copy. Replicate k draws from a
+# generator seeded with (BOOTSTRAP_SEED, k), so the result does not depend on the number of workers.
+# Writes the full-data tree with split support (%) as node labels (<name>_<metric>_<method>_bootstrap.nwk), the
+# majority-rule consensus tree (..._consensus.nwk) and the frequency of every split seen (..._splits.csv).
+
+import os
+import logging
+import multiprocessing
+import numpy as np
+import pandas as pd
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Sequence, Tuple
+from dotenv import load_dotenv
+from sk_distance_trees import (METRICS, TREE_METHODS, Tree, build_tree, dense_bits, distance_matrix, newick,
+                               pack_bits)
+from sk_nexus_export import load_matrix, output_stem
+from sk_table_io import write_table
+from sk_artifacts import atomic_path, publish
+
+_worker_data: Optional[Tuple[shared_memory.SharedMemory, np.ndarray, np.ndarray, np.ndarray]] = None
+
+
+def tree_splits(tree: Tree, n_taxa: int) -> List[int]:
+    """Non-trivial splits of a tree as bit masks of the side without taxon 0 (rooted trees are read as unrooted)."""
+    full = (1 << n_taxa) - 1
+    splits = set()
+
+    def walk(node: Tree) -> int:
+        if not isinstance(node, tuple):
+            return 1 << int(node)
+        mask = 0
+        for child, _ in node:
+            mask |= walk(child)
+        side = mask if not mask & 1 else full ^ mask
+        if 2 <= bin(side).count('1') <= n_taxa - 2:
+            splits.add(side)
+        return mask
+
+    walk(tree)
+    return sorted(splits)
+
+
+def split_members(split: int, n_taxa: int) -> List[int]:
+    return [t for t in range(n_taxa) if split >> t & 1]
+
+
+def consensus_tree(support: Dict[int, float], n_taxa: int, threshold: float = 0.5) -> Tree:
+    """Majority-rule consensus (splits with support > threshold), rooted at taxon 0, without branch lengths."""
+    available: Dict[int, Tree] = {1 << t: t for t in range(1, n_taxa)}
+    for split in sorted((s for s, f in support.items() if f > threshold), key=lambda s: bin(s).count('1')):
+        children = [mask for mask in available if mask & split == mask]
+        available[split] = tuple((available.pop(mask), None) for mask in sorted(children))
+    return ((0, None),) + tuple((node, None) for _, node in sorted(available.items()))
+
+
+def _init_worker(name: str, shape: Tuple[int, int], reference: np.ndarray) -> None:
+    global _worker_data
+    shm = shared_memory.SharedMemory(name=name)
+    bits = np.ndarray((2, *shape), dtype=bool, buffer=shm.buf)
+    _worker_data = (shm, bits[0], bits[1], reference)
+
+
+def _worker_replicates(replicates: Sequence[int], seed: int, metric: str, method: str) -> List[List[int]]:
+    _, present, observed, reference = _worker_data
+    return replicate_splits(present, observed, reference, replicates, seed, metric, method)
+
+
+def replicate_splits(present: np.ndarray, observed: np.ndarray, reference: np.ndarray, replicates: Sequence[int],
+                     seed: int, metric: str, method: str) -> List[List[int]]:
+    """Splits of the tree of each bootstrap replicate (dense bool matrices; reference fills undefined distances)."""
+    n_taxa, n_chars = present.shape
+    results = []
+    for k in replicates:
+        columns = np.random.default_rng([seed, k]).integers(0, n_chars, n_chars)
+        dist = distance_matrix(pack_bits(present[:, columns]), pack_bits(observed[:, columns]), metric)
+        # A pair left without comparable characters keeps its full-data distance
+        dist = np.where(np.isnan(dist), reference, dist)
+        results.append(tree_splits(build_tree(dist, method), n_taxa))
+    return results
+
+
+def bootstrap(present: np.ndarray, observed: np.ndarray, reference: np.ndarray, replicates: int, seed: int,
+              metric: str, method: str, workers: int = 1) -> Counter:
+    """Number of replicates containing each split."""
+    counts: Counter = Counter()
+    if workers > 1 and replicates > 1:
+        shm = shared_memory.SharedMemory(create=True, size=max(2 * present.size, 1))
+        try:
+            bits = np.ndarray((2, *present.shape), dtype=bool, buffer=shm.buf)
+            bits[0], bits[1] = present, observed
+            del bits  # the block can only be closed once no array uses it
+            ctx = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn')
+            size = -(-replicates // (workers * 4))  # a few chunks per worker for balance
+            chunks = [range(s, min(s + size, replicates)) for s in range(0, replicates, size)]
+            with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker,
+                                     initargs=(shm.name, present.shape, reference)) as executor:
+                worker = partial(_worker_replicates, seed=seed, metric=metric, method=method)
+                for chunk in executor.map(worker, chunks):
+                    for splits in chunk:
+                        counts.update(splits)
+        finally:
+            shm.close()
+            shm.unlink()
+    else:
+        for splits in replicate_splits(present, observed, reference, range(replicates), seed, metric, method):
+            counts.update(splits)
+    return counts
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    # Project root
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    root_dir = os.path.dirname(script_dir)
+
+    load_dotenv(os.path.join(root_dir, '.env'), override=True)
+
+    cognates_csv = os.getenv('COGNATES_CSV', os.path.join(root_dir, 'cognates.csv'))
+    cogid_column = os.getenv('NEXUS_COGID_COLUMN', 'COGID')
+    metric = os.getenv('BOOTSTRAP_METRIC', 'jaccard').lower()
+    method = os.getenv('BOOTSTRAP_METHOD', 'nj').lower()
+    replicates = int(os.getenv('BOOTSTRAP_REPLICATES', 1000))
+    seed = int(os.getenv('BOOTSTRAP_SEED', 1))
+    workers = int(os.getenv('BOOTSTRAP_WORKERS', 0))
+    workers = workers if workers > 0 else (os.cpu_count() or 1)
+    output_dir = os.getenv('OUTPUT_DIR', root_dir)
+
+    if metric not in METRICS or method not in TREE_METHODS:
+        raise ValueError(f"BOOTSTRAP_METRIC/BOOTSTRAP_METHOD must be one of {list(METRICS)} / {list(TREE_METHODS)}")
+
+    matrix = load_matrix(cognates_csv, cogid_column)
+    n_taxa = len(matrix.taxa)
+    present, observed = dense_bits(matrix)
+    reference = distance_matrix(pack_bits(present), pack_bits(observed), metric)
+    if np.isnan(reference).any():
+        t1, t2 = np.argwhere(np.isnan(reference))[0]
+        raise ValueError(f"No comparable characters between {matrix.taxa[t1]} and {matrix.taxa[t2]} ({metric})")
+    tree = build_tree(reference, method)
+
+    logging.info(f"Bootstrapping {method} trees ({metric}) of {n_taxa} doculects x {matrix.shape[1]} characters: "
+                 f"{replicates} replicates, {workers} worker(s)...")
+    counts = bootstrap(present, observed, reference, replicates, seed, metric, method, workers)
+    support = {split: n / replicates for split, n in counts.items()}
+
+    stem = f"{output_stem(cognates_csv, cogid_column)}_{metric}_{method}"
+    reference_splits = tree_splits(tree, n_taxa)
+    full = (1 << n_taxa) - 1
+
+    def labels(splits: Sequence[int]) -> Dict[frozenset, str]:
+        # Node label by clade; a clade containing taxon 0 is the complement of its split
+        out = {}
+        for split in splits:
+            label = f"{100 * support.get(split, 0):.0f}"
+            out[frozenset(split_members(split, n_taxa))] = label
+            out[frozenset(split_members(full ^ split, n_taxa))] = label
+        return out
+
+    written = []
+    consensus = consensus_tree(support, n_taxa)
+    for suffix, t, splits in (('bootstrap', tree, reference_splits),
+                              ('consensus', consensus, tree_splits(consensus, n_taxa))):
+        path = os.path.join(output_dir, f"{stem}_{suffix}.nwk")
+        with atomic_path(path) as tmp_path:
+            with open(tmp_path, 'w', encoding='utf-8', newline='\n') as f:
+                f.write(newick(t, matrix.taxa, labels(splits)) + '\n')
+        written.append(path)
+
+    in_reference = set(reference_splits)
+    splits = pd.DataFrame({
+        'split': [' '.join(matrix.taxa[t] for t in split_members(s, n_taxa)) for s in counts],
+        'n_taxa': [bin(s).count('1') for s in counts],
+        'support': [support[s] for s in counts],
+        'in_reference': [s in in_reference for s in counts],
+    }).sort_values(['support', 'n_taxa'], ascending=[False, True], ignore_index=True)
+    written += write_table(splits, os.path.join(output_dir, f"{stem}_splits.csv"), 'bootstrap_splits')
+    publish(written, root_dir)
+
+    reference_support = [support.get(s, 0) for s in reference_splits]
+    logging.info(f"{len(counts)} distinct splits; {sum(f > 0.5 for f in support.values())} in the consensus tree; "
+                 f"full-data tree splits: median support {100 * np.median(reference_support or [0]):.0f}%, "
+                 f"{sum(f >= 0.7 for f in reference_support)} of {len(reference_splits)} at >= 70%")
+    logging.info(f"Saved {', '.join(written)}")
+
+
+if __name__ == "__main__":
+    main()
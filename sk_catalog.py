@@ -0,0 +1,287 @@
+# sk_catalog.py
+# Persistent project catalog (SQLite, <root>/sk_catalog.sqlite) indexing Audio_Processed/*process* datasets:
+# their .env values, segments (with cached RIFF tags), metadata.csv audio paths and the artifacts each stage wrote
+# (mtime, size, sha256). refresh() is incremental: directories are only re-listed when their mtime changes,
+# segments are only re-statted when segments/ or metadata.csv changed, and files are only re-hashed when their
+# size/mtime changed. Scripts query the catalog instead of rescanning the filesystem.
+
+import os
+import json
+import sqlite3
+import hashlib
+import logging
+import threading
+from dotenv import dotenv_values
+from typing import Dict, List, Optional
+from sk_riff_metadata import get_metadata_batch
+from sk_table_io import read_table
+
+logger = logging.getLogger(__name__)
+
+CATALOG_FILE = 'sk_catalog.sqlite'
+QUERY_CHUNK = 500  # bound parameters per IN (...) query (SQLite's limit is 999 on older builds)
+
+# Artifact file name suffix -> pipeline stage that produces it
+ARTIFACT_STAGES = {
+    'mapping.csv': 'segmentation',
+    'metadata.csv': 'segmentation',
+    'audio_quality.csv': 'screening',
+    '_ipa_transcriptions.csv': 'ipa_transcription',
+    '_multi_ipa.csv': 'multi_ipa',
+    '_ipa_variations.csv': 'variation_analysis',
+    '_ipa_consensus.csv': 'consensus',
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (path TEXT PRIMARY KEY, mtime_ns INTEGER);
+CREATE TABLE IF NOT EXISTS datasets (
+    name TEXT PRIMARY KEY, path TEXT, has_segments INTEGER, has_env INTEGER,
+    env_json TEXT, env_mtime_ns INTEGER, audio_paths_json TEXT
+);
+CREATE TABLE IF NOT EXISTS segments (
+    dataset TEXT, file TEXT, path TEXT, size INTEGER, mtime_ns INTEGER, tags_json TEXT,
+    PRIMARY KEY (dataset, file)
+);
+CREATE TABLE IF NOT EXISTS artifacts (
+    dataset TEXT, name TEXT, path TEXT, stage TEXT, size INTEGER, mtime_ns INTEGER, sha256 TEXT,
+    PRIMARY KEY (dataset, name)
+);
+"""
+
+
+def file_sha256(path: str) -> str:
+    """sha256 of a file's content, read in 1 MiB blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def artifact_stage(file_name: str) -> Optional[str]:
+    """Stage that produced file_name, or None if it is not a pipeline artifact."""
+    for suffix, stage in ARTIFACT_STAGES.items():
+        if file_name.endswith(suffix):
+            return stage
+    return None
+
+
+def _mtime_ns(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class Catalog:
+    """SQLite index of datasets, segments and stage artifacts under processed_root."""
+
+    def __init__(self, root_dir: str, processed_root: Optional[str] = None, path: Optional[str] = None):
+        self.root_dir = root_dir
+        self.processed_root = os.path.normpath(processed_root or os.path.join(root_dir, 'Audio_Processed'))
+        self.path = path or os.getenv('CATALOG_PATH', os.path.join(root_dir, CATALOG_FILE))
+        # Shared by run_datasets() worker threads; the lock serializes access to the one connection
+        self.conn = sqlite3.connect(self.path, timeout=60, check_same_thread=False)
+        self._lock = threading.RLock()
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
+
+    def _fetchall(self, query: str, params: tuple = ()) -> list:
+        with self._lock:
+            return self.conn.execute(query, params).fetchall()
+
+    # --- incremental refresh ---
+
+    def _dir_changed(self, path: str) -> bool:
+        """True (and records the new mtime) if a directory's mtime differs from the stored one."""
+        mtime = _mtime_ns(path)
+        row = self.conn.execute("SELECT mtime_ns FROM dirs WHERE path = ?", (path,)).fetchone()
+        if row is not None and row[0] == mtime:
+            return False
+        self.conn.execute("INSERT OR REPLACE INTO dirs (path, mtime_ns) VALUES (?, ?)", (path, mtime))
+        return True
+
+    def refresh(self) -> None:
+        """Bring the catalog in line with the filesystem, touching only what changed."""
+        if not os.path.exists(self.processed_root):
+            raise ValueError(f"Audio_Processed not found at {self.processed_root}")
+        with self._lock, self.conn:
+            if self._dir_changed(self.processed_root):
+                on_disk = {
+                    d for d in os.listdir(self.processed_root)
+                    if 'process' in d.lower() and os.path.isdir(os.path.join(self.processed_root, d))
+                }
+                known = {r[0] for r in self.conn.execute("SELECT name FROM datasets")}
+                for name in known - on_disk:
+                    self._forget_dataset(name)
+                for name in on_disk - known:
+                    self.conn.execute("INSERT INTO datasets (name, path) VALUES (?, ?)", (name, os.path.join(self.processed_root, name)))
+            for (name,) in self.conn.execute("SELECT name FROM datasets ORDER BY name").fetchall():
+                self._refresh_dataset(name)
+
+    def _forget_dataset(self, name: str) -> None:
+        dataset_dir = os.path.join(self.processed_root, name)
+        for table in ('datasets', 'segments', 'artifacts'):
+            column = 'name' if table == 'datasets' else 'dataset'
+            self.conn.execute(f"DELETE FROM {table} WHERE {column} = ?", (name,))
+        self.conn.execute("DELETE FROM dirs WHERE path IN (?, ?)", (dataset_dir, os.path.join(dataset_dir, 'segments')))
+
+    def _refresh_dataset(self, name: str) -> None:
+        dataset_dir = os.path.join(self.processed_root, name)
+        segments_dir = os.path.join(dataset_dir, 'segments')
+        env_path = os.path.join(dataset_dir, '.env')
+
+        if self._dir_changed(dataset_dir):
+            self.conn.execute(
+                "UPDATE datasets SET has_segments = ?, has_env = ? WHERE name = ?",
+                (int(os.path.isdir(segments_dir)), int(os.path.exists(env_path)), name)
+            )
+            for file_name in os.listdir(dataset_dir):
+                stage = artifact_stage(file_name)
+                if stage:
+                    self.conn.execute(
+                        "INSERT OR IGNORE INTO artifacts (dataset, name, path, stage) VALUES (?, ?, ?, ?)",
+                        (name, file_name, os.path.join(dataset_dir, file_name), stage)
+                    )
+
+        env_mtime = _mtime_ns(env_path)
+        row = self.conn.execute("SELECT env_mtime_ns FROM datasets WHERE name = ?", (name,)).fetchone()
+        if row[0] != env_mtime:
+            env = dotenv_values(env_path) if env_mtime is not None else {}
+            self.conn.execute("UPDATE datasets SET env_json = ?, env_mtime_ns = ? WHERE name = ?", (json.dumps(env), env_mtime, name))
+
+        changed_artifacts = self._refresh_artifacts(name)
+        if 'metadata.csv' in changed_artifacts:
+            metadata_csv = os.path.join(dataset_dir, 'metadata.csv')
+            audio_paths = None
+            if os.path.exists(metadata_csv):
+                metadata_df = read_table(metadata_csv)
+                if 'audio_path' in metadata_df.columns:
+                    audio_paths = [os.path.normpath(p) for p in metadata_df['audio_path'].tolist()]
+            self.conn.execute("UPDATE datasets SET audio_paths_json = ? WHERE name = ?", (json.dumps(audio_paths), name))
+
+        if self._dir_changed(segments_dir) or 'metadata.csv' in changed_artifacts:
+            self._refresh_segments(name, segments_dir)
+
+    def _refresh_artifacts(self, name: str) -> List[str]:
+        """Re-stat known artifacts, re-hash the changed ones, drop deleted ones. Returns names that changed."""
+        changed = []
+        rows = self.conn.execute("SELECT name, path, size, mtime_ns FROM artifacts WHERE dataset = ?", (name,)).fetchall()
+        for file_name, path, size, mtime in rows:
+            try:
+                st = os.stat(path)
+            except OSError:
+                self.conn.execute("DELETE FROM artifacts WHERE dataset = ? AND name = ?", (name, file_name))
+                changed.append(file_name)
+                continue
+            if (st.st_size, st.st_mtime_ns) != (size, mtime):
+                self.conn.execute(
+                    "UPDATE artifacts SET size = ?, mtime_ns = ?, sha256 = ? WHERE dataset = ? AND name = ?",
+                    (st.st_size, st.st_mtime_ns, file_sha256(path), name, file_name)
+                )
+                changed.append(file_name)
+        return changed
+
+    def _refresh_segments(self, name: str, segments_dir: str) -> None:
+        """Sync the segments table with segments/; re-read RIFF tags only for new or modified files."""
+        on_disk = {}
+        if os.path.isdir(segments_dir):
+            for entry in os.scandir(segments_dir):
+                if entry.name.endswith('.wav'):
+                    st = entry.stat()
+                    on_disk[entry.name] = (entry.path, st.st_size, st.st_mtime_ns)
+        known = {r[0]: (r[1], r[2]) for r in self.conn.execute("SELECT file, size, mtime_ns FROM segments WHERE dataset = ?", (name,))}
+        removed = set(known) - set(on_disk)
+        self.conn.executemany("DELETE FROM segments WHERE dataset = ? AND file = ?", [(name, f) for f in removed])
+        stale = [f for f, (_, size, mtime) in on_disk.items() if known.get(f) != (size, mtime)]
+        if stale:
+            logger.info(f"Catalog: indexing {len(stale)} new/changed segments in {name}")
+            tags = get_metadata_batch([on_disk[f][0] for f in stale])
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO segments (dataset, file, path, size, mtime_ns, tags_json) VALUES (?, ?, ?, ?, ?, ?)",
+                [(name, f, on_disk[f][0], on_disk[f][1], on_disk[f][2], json.dumps(t)) for f, t in zip(stale, tags)]
+            )
+
+    # --- queries ---
+
+    def datasets(self, require_segments: bool = False, require_env: bool = True) -> List[str]:
+        """Dataset dir names ('process' in name), optionally requiring segments/ and/or .env."""
+        query = "SELECT name FROM datasets WHERE 1 = 1"
+        if require_segments:
+            query += " AND has_segments = 1"
+        if require_env:
+            query += " AND has_env = 1"
+        return [r[0] for r in self._fetchall(query + " ORDER BY name")]
+
+    def dataset_env(self, name: str) -> Dict[str, Optional[str]]:
+        """Parsed .env values of a dataset (not exported to os.environ)."""
+        rows = self._fetchall("SELECT env_json FROM datasets WHERE name = ?", (name,))
+        return json.loads(rows[0][0]) if rows and rows[0][0] else {}
+
+    def segment_paths(self, name: str) -> List[str]:
+        """Audio paths from metadata.csv if present, else the sorted segments/ listing."""
+        rows = self._fetchall("SELECT audio_paths_json FROM datasets WHERE name = ?", (name,))
+        audio_paths = json.loads(rows[0][0]) if rows and rows[0][0] else None
+        if audio_paths:
+            return audio_paths
+        return [os.path.normpath(r[0]) for r in self._fetchall("SELECT path FROM segments WHERE dataset = ? ORDER BY file", (name,))]
+
+    def segment_tags(self, name: str, files: Optional[List[str]] = None) -> Dict[str, dict]:
+        """Cached RIFF tags per segment file name (all segments of the dataset, or only files)."""
+        if files is None:
+            rows = self._fetchall("SELECT file, tags_json FROM segments WHERE dataset = ?", (name,))
+        else:
+            files = sorted(set(files))
+            rows = []
+            for start in range(0, len(files), QUERY_CHUNK):
+                chunk = files[start:start + QUERY_CHUNK]
+                rows += self._fetchall(f"SELECT file, tags_json FROM segments WHERE dataset = ? AND file IN "
+                                       f"({', '.join('?' * len(chunk))})", (name, *chunk))
+        return {r[0]: json.loads(r[1]) for r in rows}
+
+    def tags_for(self, name: str, paths: List[str]) -> List[dict]:
+        """RIFF tags for paths (input order): cached ones from the catalog, the rest read in one batch."""
+        # Only this batch's rows, so per-batch calls stay proportional to the batch, not to the dataset
+        cached = self.segment_tags(name, [os.path.basename(p) for p in paths])
+        misses = [p for p in paths if os.path.basename(p) not in cached]
+        read = dict(zip(misses, get_metadata_batch(misses)))
+        return [cached[os.path.basename(p)] if p not in read else read[p] for p in paths]
+
+    def artifacts(self, suffix: str = '', dataset: Optional[str] = None) -> List[str]:
+        """Paths of indexed artifacts whose name ends with suffix, optionally for one dataset."""
+        query = "SELECT name, path FROM artifacts"
+        params: list = []
+        if dataset is not None:
+            query += " WHERE dataset = ?"
+            params.append(dataset)
+        return [r[1] for r in self._fetchall(query + " ORDER BY dataset, name", tuple(params)) if r[0].endswith(suffix)]
+
+    def artifact_hash(self, path: str) -> Optional[str]:
+        """Stored sha256 of an indexed artifact."""
+        rows = self._fetchall("SELECT sha256 FROM artifacts WHERE path = ?", (path,))
+        return rows[0][0] if rows else None
+
+
+def open_catalog(root_dir: str, processed_root: Optional[str] = None) -> Catalog:
+    """Open the project catalog and refresh it incrementally."""
+    catalog = Catalog(root_dir, processed_root)
+    catalog.refresh()
+    return catalog
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    root_dir = os.path.dirname(script_dir)
+    catalog = open_catalog(root_dir)
+    for name in catalog.datasets(require_env=False):
+        logging.info(f"{name}: {len(catalog.segment_paths(name))} segments, {len(catalog.artifacts(dataset=name))} artifacts")
+    logging.info(f"Catalog up to date: {catalog.path}")
+    catalog.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# sk_checkpoint.py
+# Streaming, resumable result writing for the long ASR stages (sk_ipa_transcription.py, sk_multi_ipa.py).
+# Inputs are processed in batches of CHECKPOINT_BATCH_SIZE segments; each finished batch is written at once as a
+# part file in a hidden .<output>.parts/ directory next to the output, and checkpoint.json records the finished
+# batches together with a fingerprint of the run (models, settings, input list). A rerun with the same fingerprint
+# skips finished batches, a different one starts over. finish() streams the parts into the final CSV (and Parquet
+# copy) one at a time, so memory is bounded by one batch whatever the dataset size.
+
+import os
+import json
+import shutil
+import hashlib
+import logging
+import pandas as pd
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from sk_artifacts import atomic_path, write_json
+from sk_table_io import write_table_chunks
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_FILE = 'checkpoint.json'
+
+
+def checkpoint_batch_size() -> int:
+    return max(1, int(os.getenv('CHECKPOINT_BATCH_SIZE', 256)))
+
+
+def parts_dir(output_path: str) -> str:
+    """khan01_multi_ipa.csv -> .khan01_multi_ipa.csv.parts/ (hidden, same directory)"""
+    return os.path.join(os.path.dirname(output_path), f".{os.path.basename(output_path)}.parts")
+
+
+class BatchCheckpoint:
+    """Batches of items, written as parts as they finish, resumable after a crash."""
+
+    def __init__(self, output_path: str, items: Sequence[str], params: Dict[str, Any], batch_size: Optional[int] = None):
+        self.output_path = output_path
+        self.items = list(items)
+        self.batch_size = batch_size or checkpoint_batch_size()
+        self.dir = parts_dir(output_path)
+        digest = hashlib.sha256(json.dumps({'params': params, 'batch_size': self.batch_size, 'items': self.items},
+                                           sort_keys=True, default=str).encode('utf-8'))
+        self.fingerprint = digest.hexdigest()
+        self.num_batches = -(-len(self.items) // self.batch_size)
+        self.rows: Dict[int, int] = {}
+        self._load()
+
+    def _checkpoint_path(self) -> str:
+        return os.path.join(self.dir, CHECKPOINT_FILE)
+
+    def _part_path(self, index: int) -> str:
+        return os.path.join(self.dir, f"part-{index:05d}.csv")
+
+    def _load(self) -> None:
+        path = self._checkpoint_path()
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Unreadable checkpoint {path}, starting over: {e}")
+            state = {}
+        if state.get('fingerprint') != self.fingerprint:
+            logger.info(f"Checkpoint {path} is from a different run (inputs or settings changed), starting over")
+            self.discard()
+            return
+        self.rows = {int(i): n for i, n in state.get('rows', {}).items() if os.path.exists(self._part_path(int(i)))}
+        if self.rows:
+            logger.info(f"Resuming {self.output_path}: {len(self.rows)}/{self.num_batches} batches already done")
+
+    def _save(self) -> None:
+        write_json(self._checkpoint_path(), {
+            'output': os.path.basename(self.output_path),
+            'fingerprint': self.fingerprint,
+            'batch_size': self.batch_size,
+            'num_batches': self.num_batches,
+            'rows': {str(i): n for i, n in sorted(self.rows.items())},
+        })
+
+    def pending(self) -> Iterator[Tuple[int, List[str]]]:
+        """(batch index, items) of every batch not finished yet, in order."""
+        for index in range(self.num_batches):
+            if index not in self.rows:
+                yield index, self.items[index * self.batch_size:(index + 1) * self.batch_size]
+
+    def write_batch(self, index: int, df: pd.DataFrame) -> None:
+        """Write one finished batch (part file first, then the checkpoint that marks it done)."""
+        os.makedirs(self.dir, exist_ok=True)
+        with atomic_path(self._part_path(index)) as tmp_path:
+            df.to_csv(tmp_path, index=False)
+        self.rows[index] = len(df)
+        self._save()
+        logger.info(f"{os.path.basename(self.output_path)}: batch {index + 1}/{self.num_batches} done ({len(df)} rows)")
+
+    @property
+    def num_rows(self) -> int:
+        return sum(self.rows.values())
+
+    def _parts(self) -> Iterator[pd.DataFrame]:
+        for index in range(self.num_batches):
+            # Only empty fields are missing (a transcription may well read 'NA' or 'nan')
+            yield pd.read_csv(self._part_path(index), dtype=str, keep_default_na=False, na_values=[''])
+
+    def finish(self, schema: Optional[str] = None) -> List[str]:
+        """Stream all parts into the output (needs every batch done), remove the parts. Returns the written paths."""
+        missing = [i for i in range(self.num_batches) if i not in self.rows]
+        if missing:
+            raise RuntimeError(f"{self.output_path}: batches {missing} not finished")
+        written = write_table_chunks(self._parts(), self.output_path, schema)
+        self.discard()
+        return written
+
+    def discard(self) -> None:
+        self.rows = {}
+        shutil.rmtree(self.dir, ignore_errors=True)
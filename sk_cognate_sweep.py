@@ -0,0 +1,124 @@
+# sk_cognate_sweep.py
+# Threshold sweep for LingPy cognate detection on wordlist.tsv (the README plans LexStat thresholds of 0.55-0.65).
+# The per-concept pairwise distance matrices are computed once per method (COG_SWEEP_METHODS: sca, lexstat,
+# edit-dist, turchin) on the cached LexStat of sk_lingpy_cognate_detect.py and clustered (UPGMA, as LexStat.cluster)
+# at every threshold in COG_SWEEP_THRESHOLDS right away; with COG_WORKERS > 1 concepts run in parallel. Writes
+# cognate_sweep.csv with one COGID_<method>_<t> column per setting and cognate_sweep_scores.csv with the number of
+# cognate sets per setting, plus B-cubed
+# precision/recall/F against expert judgements when COG_GOLD_PATH (ID, COGID; default expert_cognates.csv) exists.
+
+import os
+import logging
+import tempfile
+import numpy as np
+import pandas as pd
+from typing import Tuple
+from dotenv import load_dotenv
+from sk_lingpy_cognate_detect import (cache_path, cluster_concepts, cog_align_engine, cog_workers, lexstat_cache_dir,
+                                      load_lexstat, scorer_params)
+from sk_table_io import read_table, write_table
+from sk_artifacts import publish
+
+METHODS = ('sca', 'lexstat', 'edit-dist', 'turchin')
+
+
+def bcubed(predicted: pd.Series, gold: pd.Series, concepts: pd.Series) -> Tuple[float, float, float]:
+    """B-cubed precision, recall and F of predicted against gold cognate sets (items with a gold COGID only)."""
+    judged = gold.notna()
+    df = pd.DataFrame({'pred': predicted[judged].to_numpy(),
+                       'gold': concepts[judged].astype(str).to_numpy() + '\t' + gold[judged].astype(str).to_numpy()})
+    if df.empty:
+        return np.nan, np.nan, np.nan
+    # Per item: |pred set & gold set| / |pred set| (precision) and / |gold set| (recall), restricted to judged items
+    both = df.groupby(['pred', 'gold'])['pred'].transform('size')
+    precision = (both / df.groupby('pred')['pred'].transform('size')).mean()
+    recall = (both / df.groupby('gold')['gold'].transform('size')).mean()
+    return precision, recall, 2 * precision * recall / (precision + recall)
+
+
+def load_gold(path: str) -> pd.Series:
+    """Expert COGID per wordlist ID (CSV or TSV with ID and COGID; blank COGID = not judged)."""
+    gold = read_table(path, columns=['ID', 'COGID'], sep='\t' if path.endswith('.tsv') else ',')
+    gold = gold.dropna(subset=['COGID'])
+    return gold.astype({'ID': 'int64'}).set_index('ID')['COGID'].astype(str)
+
+
+def threshold_label(threshold: float) -> str:
+    """Threshold as written in the COGID_<method>_<t> column names (0.5, 0.55, 0.625)."""
+    return f"{threshold:g}"
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    # Project root
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    root_dir = os.path.dirname(script_dir)
+
+    load_dotenv(os.path.join(root_dir, '.env'), override=True)
+
+    wordlist_path = os.getenv('WORDLIST_PATH', os.path.join(root_dir, 'wordlist.tsv'))
+    methods = [m.strip() for m in os.getenv('COG_SWEEP_METHODS', 'sca,lexstat,edit-dist').split(',') if m.strip()]
+    thresholds = sorted({float(t) for t in os.getenv('COG_SWEEP_THRESHOLDS', '0.45,0.5,0.55,0.6,0.65,0.7').split(',')})
+    gold_path = os.getenv('COG_GOLD_PATH', os.path.join(root_dir, 'expert_cognates.csv'))
+    output_dir = os.getenv('OUTPUT_DIR', root_dir)
+    workers = cog_workers()
+    engine = cog_align_engine()
+
+    if not os.path.exists(wordlist_path):
+        raise ValueError(f"Wordlist not found at {wordlist_path}")
+    unknown = [m for m in methods if m not in METHODS]
+    if unknown:
+        raise ValueError(f"Unknown COG_SWEEP_METHODS {unknown}; choose from {list(METHODS)}")
+    labels = [threshold_label(t) for t in thresholds]
+    if len(set(labels)) < len(labels):
+        raise ValueError(f"COG_SWEEP_THRESHOLDS {thresholds} do not all have distinct column names {labels}")
+
+    # One LexStat for all methods; it only needs the (cached) scorer if lexstat is swept
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache_dir = lexstat_cache_dir(root_dir) or (tmp_dir if workers > 1 else None)
+        params = scorer_params() if 'lexstat' in methods else None
+        lex = load_lexstat(wordlist_path, params, cache_dir)
+        lexstat_path = cache_path(cache_dir, wordlist_path, params) if cache_dir else None
+        ids = sorted(lex)
+        out = pd.DataFrame({
+            'ID': ids,
+            'DOCULECT': [lex[i, 'doculect'] for i in ids],
+            'CONCEPT': [lex[i, 'concept'] for i in ids],
+            'IPA': [lex[i, 'ipa'] for i in ids],
+        })
+
+        if os.path.exists(gold_path):
+            out['EXPERT_COGID'] = out['ID'].map(load_gold(gold_path))
+            logging.info(f"{out['EXPERT_COGID'].notna().sum()} of {len(out)} entries have an expert COGID ({gold_path})")
+        else:
+            out['EXPERT_COGID'] = None
+            logging.info(f"No expert judgements at {gold_path}; B-cubed scores left empty")
+        n_judged = out['EXPERT_COGID'].notna().sum()
+
+        scores = []
+        for method in methods:
+            logging.info(f"Clustering {len(lex.rows)} concepts with {method} at {len(thresholds)} thresholds ({workers} worker(s))...")
+            clusters = cluster_concepts(lex, lexstat_path, method, thresholds, workers, engine)
+            for threshold, cogids in zip(thresholds, clusters):
+                column = f"COGID_{method}_{threshold_label(threshold)}"
+                out[column] = out['ID'].map(cogids)
+                precision, recall, f_score = bcubed(out[column], out['EXPERT_COGID'], out['CONCEPT'])
+                scores.append({'method': method, 'threshold': threshold, 'n_cognate_sets': out[column].nunique(),
+                               'n_judged': n_judged, 'bcubed_precision': precision, 'bcubed_recall': recall, 'bcubed_f': f_score})
+                logging.info(f"{column}: {scores[-1]['n_cognate_sets']} cognate sets"
+                             + (f", B-cubed F {f_score:.3f}" if n_judged else ''))
+
+    scores = pd.DataFrame(scores)
+    written = write_table(out, os.path.join(output_dir, 'cognate_sweep.csv'), 'cognate_sweep')
+    written += write_table(scores, os.path.join(output_dir, 'cognate_sweep_scores.csv'), 'cognate_sweep_scores')
+    publish(written, root_dir)
+
+    if scores['bcubed_f'].notna().any():
+        best = scores.loc[scores['bcubed_f'].idxmax()]
+        logging.info(f"Best setting: {best['method']} at {threshold_label(best['threshold'])} (B-cubed F {best['bcubed_f']:.3f})")
+    logging.info(f"Saved {len(methods)} x {len(thresholds)} settings to {output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# sk_concept_instability.py
+# Corpus-wide per-concept ASR instability index. Loads every *_ipa_variations.csv indexed by the project catalog in
+# one pass, maps lexeme_ids to concept IDs (parse_concept_ids from sk_consolidate_wordlist.py, restricted to the
+# concept list in "consolidated list.csv"), and aggregates the per-segment run metrics (sk_variation_metrics.py)
+# with grouped statistics: per concept across all speakers, and per concept x Kurdish variety.
+# instability_index = 1 - mean stability_score. A group is flagged unstable when at least CONCEPT_UNSTABLE_SHARE
+# (default 0.5) of its segments are below their dataset's STABILITY_THRESHOLD; those concepts are candidates for
+# human-primary transcription. Writes concept_instability.csv and concept_instability_by_variety.csv.
+
+import os
+import logging
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from typing import Dict, List
+from sk_catalog import open_catalog
+from sk_consolidate_wordlist import concept_table, load_mapping, parse_concept_ids
+from sk_dataset_config import load_dataset_config
+from sk_table_io import read_table, write_table
+from sk_artifacts import publish
+
+VARIATION_COLUMNS = ['lexeme_id', 'n_hypotheses', 'agreement_rate', 'entropy', 'mean_distance', 'stability_score', 'unstable']
+
+# Named aggregations shared by both reports
+AGGREGATIONS = {
+    'n_doculects': ('DOCULECT', 'nunique'),
+    'n_segments': ('stability_score', 'size'),
+    'mean_stability': ('stability_score', 'mean'),
+    'median_stability': ('stability_score', 'median'),
+    'min_stability': ('stability_score', 'min'),
+    'unstable_share': ('unstable', 'mean'),
+    'mean_agreement': ('agreement_rate', 'mean'),
+    'mean_entropy': ('entropy', 'mean'),
+    'mean_distance': ('mean_distance', 'mean'),
+    'max_hypotheses': ('n_hypotheses', 'max'),
+}
+
+
+def load_variations(paths: List[str], doculects: Dict[str, str], varieties: Dict[str, str]) -> pd.DataFrame:
+    """All variation reports in one frame with DOCULECT and VARIETY (keyed by the dataset directory name)."""
+    max_workers = int(os.getenv('CONSOLIDATE_WORKERS', min(16, (os.cpu_count() or 1) * 2)))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        frames = list(executor.map(lambda p: read_table(p, columns=VARIATION_COLUMNS, schema='ipa_variations'), paths))
+    parts = []
+    for path, df in zip(paths, frames):
+        dataset = os.path.basename(os.path.dirname(path))
+        parts.append(df.assign(DOCULECT=doculects[dataset], VARIETY=varieties[dataset]))
+    if not parts:
+        return pd.DataFrame(columns=VARIATION_COLUMNS + ['DOCULECT', 'VARIETY'])
+    df = pd.concat(parts, ignore_index=True)
+    # Categoricals would otherwise make groupby emit every (concept, variety) combination
+    return df.astype({'DOCULECT': str, 'VARIETY': str, 'unstable': bool})
+
+
+def instability_report(df: pd.DataFrame, concepts: pd.DataFrame, keys: List[str], unstable_share: float) -> pd.DataFrame:
+    """Grouped statistics per keys (CONCEPT first), with instability_index and the unstable flag."""
+    report = df.groupby(keys, sort=False).agg(**AGGREGATIONS).reset_index()
+    report['instability_index'] = 1.0 - report['mean_stability']
+    report['unstable'] = report['unstable_share'] >= unstable_share
+    report = report.merge(concepts, on='CONCEPT', how='left')
+    report['_order'] = pd.to_numeric(report['CONCEPT'], errors='coerce')
+    report = report.sort_values(['instability_index', '_order'] + keys[1:], ascending=[False, True] + [True] * (len(keys) - 1))
+    return report[keys[:1] + ['LEXICAL_ITEM'] + keys[1:] + ['instability_index'] + list(AGGREGATIONS) + ['unstable']]
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    load_dotenv()
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    root_dir = os.path.dirname(script_dir)
+    processed_root = os.path.normpath(os.path.join(root_dir, 'Audio_Processed'))
+    if not os.path.exists(processed_root):
+        raise ValueError(f"Audio_Processed not found at {processed_root}")
+    _, reverse_mapping, valid_ids = load_mapping(os.path.join(root_dir, 'consolidated list.csv'))
+    unstable_share = float(os.getenv('CONCEPT_UNSTABLE_SHARE', 0.5))
+
+    # Variation reports and each dataset's doculect/variety from the project catalog
+    catalog = open_catalog(root_dir, processed_root)
+    paths = catalog.artifacts('_ipa_variations.csv')
+    doculects, varieties = {}, {}
+    for path in paths:
+        dataset = os.path.basename(os.path.dirname(path))
+        config = load_dataset_config(os.path.join(processed_root, dataset), catalog.dataset_env(dataset))
+        doculects[dataset] = config.doculect
+        varieties[dataset] = config.kurdish_variety
+    catalog.close()
+    logging.info(f"Loading {len(paths)} variation reports")
+
+    df = load_variations(paths, doculects, varieties)
+    df['CONCEPT'] = parse_concept_ids(df['lexeme_id'])
+    matched = df['CONCEPT'].isin(valid_ids)
+    if (~matched).any():
+        logging.info(f"{(~matched).sum()} of {len(df)} segments have no concept in the concept list, ignored")
+    df = df[matched]
+    if df.empty:
+        logging.warning("No segments with a known concept")
+        return
+
+    concepts = concept_table(reverse_mapping)
+    by_concept = instability_report(df, concepts, ['CONCEPT'], unstable_share)
+    by_variety = instability_report(df, concepts, ['CONCEPT', 'VARIETY'], unstable_share)
+
+    # Varieties in which each concept is unstable, next to the corpus-wide figures
+    flagged = by_variety[by_variety['unstable']].sort_values('VARIETY').groupby('CONCEPT')['VARIETY'].agg(', '.join)
+    by_concept['unstable_varieties'] = by_concept['CONCEPT'].map(flagged).fillna('')
+
+    output_dir = os.getenv('OUTPUT_DIR', root_dir)
+    written = write_table(by_concept, os.path.join(output_dir, 'concept_instability.csv'), 'concept_instability')
+    written += write_table(by_variety, os.path.join(output_dir, 'concept_instability_by_variety.csv'), 'concept_instability_by_variety')
+    publish(written, root_dir)
+    logging.info(f"{by_concept['unstable'].sum()} of {len(by_concept)} concepts unstable across all speakers, "
+                 f"{(by_concept['unstable_varieties'] != '').sum()} unstable in at least one variety; saved to {output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,41 @@
 import os
-import re
 import logging
+import numpy as np
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from typing import Dict, List, Tuple, Set
+from typing import Dict, List, Optional, Tuple, Set
+from sk_catalog import file_sha256, open_catalog
+from sk_table_io import read_table, write_table
+from sk_artifacts import atomic_path, publish, write_json, write_text
+from sk_incremental_wordlist import (SOURCE_COLUMN, incremental_enabled, load_wordlist_state, record_sources,
+                                     save_wordlist_state, update_wordlist)
 
 load_dotenv()
 
+# Only these columns of *_ipa_transcriptions.csv are needed for the wordlist
+IPA_CSV_COLUMNS = ['lexeme_id', 'ipa_transcription', 'dataset_code', 'kurdish_variety']
+WORDLIST_COLUMNS = ['DOCULECT', 'CONCEPT', 'LEXICAL_ITEM', 'IPA']
+CHECK_FILES = ['wordlist_check.txt', 'wordlist_check.json', 'wordlist_check.csv']
+
 def load_mapping(csv_path: str) -> Tuple[Dict[str, str], Dict[str, str], Set[str]]:
     """Load JBIL mapping from consolidated list.csv: mapping (lexical->ids_str), reverse (id->lexical), valid_ids set."""
-    mapping: Dict[str, str] = {}
-    reverse_mapping: Dict[str, str] = {}
-    valid_ids: Set[str] = set()
     df = pd.read_csv(csv_path, sep=r'[\t|]', engine='python', header=None, skiprows=lambda x: x < 10)
-    for _, row in df.iterrows():
-        if len(row) >= 2:
-            lexical = str(row[0]).strip().lower()
-            ids_str = str(row[1]).strip()
-            if lexical.isalpha() and ids_str:
-                mapping[lexical] = ids_str
-                for id_str_raw in ids_str.split(','):
-                    id_str = id_str_raw.strip()
-                    if id_str.isdigit():
-                        valid_ids.add(id_str)
-                        if id_str not in reverse_mapping:
-                            reverse_mapping[id_str] = lexical
+    if df.shape[1] < 2:
+        logging.info("Parsed 0 lexical items -> 0 unique IDs")
+        return {}, {}, set()
+
+    lexical = df[0].map(str).str.strip().str.lower()
+    ids_str = df[1].map(str).str.strip()
+    keep = lexical.str.isalpha() & (ids_str != '')
+    mapping: Dict[str, str] = dict(zip(lexical[keep], ids_str[keep]))  # Last row wins for a repeated lexical item
+
+    # One row per (lexical, id); the first lexical item listing an ID owns it
+    ids = ids_str[keep].str.split(',').explode().str.strip()
+    pairs = pd.DataFrame({'CONCEPT': ids, 'LEXICAL_ITEM': lexical[keep].reindex(ids.index)})
+    pairs = pairs[pairs['CONCEPT'].str.isdigit()].drop_duplicates('CONCEPT', keep='first')
+    reverse_mapping: Dict[str, str] = dict(zip(pairs['CONCEPT'], pairs['LEXICAL_ITEM']))
+    valid_ids: Set[str] = set(reverse_mapping)
     logging.info(f"Parsed {len(mapping)} lexical items -> {len(valid_ids)} unique IDs")
     return mapping, reverse_mapping, valid_ids
 
@@ -39,108 +50,195 @@ def parse_concept_id(lexeme_id: str) -> str:
         return f"{base}.{sub}"
     return base
 
+def parse_concept_ids(lexeme_ids: pd.Series) -> pd.Series:
+    """Vectorized parse_concept_id; IDs whose number part is not numeric become ''."""
+    parts = lexeme_ids.map(str).str.extract(r'^[^_]*_([^_]*)(?:_([^_]*))?')
+    base = parts[0].str.lstrip('0').where(lambda s: s != '', '0')
+    base = base.where(parts[0].str.fullmatch(r'[0-9]+').fillna(False).astype(bool), '')
+    sub = parts[1].fillna('')
+    has_sub = sub.str.isdigit() & (sub.str.len() <= 2) & (base != '')
+    return base.where(~has_sub, base + '.' + (sub.str.lstrip('0').where(lambda s: s != '', '0')))
+
 # get_valid_ids integrated into load_mapping
 
-def process_csv(csv_path: str, valid_ids: Set[str], reverse_mapping: Dict[str, str]) -> List[Tuple[str, str, str, str]]:
-    df = pd.read_csv(csv_path)
+def concept_table(reverse_mapping: Dict[str, str]) -> pd.DataFrame:
+    """Valid concept IDs with their lexical item, for merging against parsed transcriptions."""
+    return pd.DataFrame(list(reverse_mapping.items()), columns=['CONCEPT', 'LEXICAL_ITEM'])
+
+def read_ipa_csv(csv_path: str) -> pd.DataFrame:
+    """Read only the wordlist columns of a *_ipa_transcriptions.csv (or its Parquet copy)."""
+    return read_table(csv_path, columns=IPA_CSV_COLUMNS, schema='ipa_transcriptions')
+
+def process_csv(csv_path: str, concepts: pd.DataFrame, df: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """Wordlist rows (DOCULECT, CONCEPT, LEXICAL_ITEM, IPA) of one transcription CSV, in file order."""
+    if df is None:
+        df = read_ipa_csv(csv_path)
     if df.empty:
-        return []
+        return pd.DataFrame(columns=WORDLIST_COLUMNS)
 
     dataset_code = df['dataset_code'].iloc[0].title()
     kurdish_variety = df['kurdish_variety'].iloc[0]
     doculect = f"{dataset_code}_{kurdish_variety}"
 
-    valid_rows = []
-    total = len(df)
-    matched = 0
-    unmatched_ids = set()
-
-    for _, row in df.iterrows():
-        lexeme_id = row.get('lexeme_id', '')
-        ipa_raw = row.get('ipa_transcription', '')
-        if pd.isna(ipa_raw) or not ipa_raw.strip():
-            continue
-        ipa = re.sub(r'\s+', '', ipa_raw.strip())
-
-        concept_id = parse_concept_id(lexeme_id)
-        if concept_id in valid_ids:
-            lexical_item = reverse_mapping.get(concept_id, 'UNKNOWN')
-            valid_rows.append((doculect, concept_id, lexical_item, ipa))
-            matched += 1
-        else:
-            unmatched_ids.add(concept_id)
-
-    logging.info(f"CSV {os.path.basename(csv_path)}: {total} rows, {matched} matched")
-    if unmatched_ids:
-        logging.debug(f"Unmatched IDs sample: {list(unmatched_ids)[:5]}")
-    return valid_rows
+    ipa = df['ipa_transcription'].dropna().map(str).str.replace(r'\s+', '', regex=True)
+    ipa = ipa[ipa != '']
+    lexeme_ids = df['lexeme_id'].reindex(ipa.index) if 'lexeme_id' in df else pd.Series('', index=ipa.index)
+    parsed = pd.DataFrame({'CONCEPT': parse_concept_ids(lexeme_ids), 'IPA': ipa})
 
+    # Inner merge keeps the left (file) order and drops concept IDs not in the valid-ID table
+    matched = parsed.merge(concepts, on='CONCEPT', how='inner')
+    matched.insert(0, 'DOCULECT', doculect)
 
-def run_checks(df: pd.DataFrame, valid_ids: Set[str]) -> None:
-    """Post-generation checks: global + per-DOCULECT duplicates, coverage, extras. Save to wordlist_check.txt"""
-    logging.info("Running consolidation checks...")
-
-    # Global summary
-    global_present = set(df['CONCEPT'].dropna().unique())
-    global_dups = df.groupby('CONCEPT')['IPA'].apply(list).to_dict()
-    global_dups_detail = {cid: ips for cid, ips in global_dups.items() if len(ips) > 1}
-    global_dups_str = '\n'.join([f"  {cid}: {ips}" for cid, ips in global_dups_detail.items()]) if global_dups_detail else "  None"
-    global_missing = sorted(valid_ids - global_present)
-    global_extras = sorted(global_present - valid_ids)
-    global_missing_str = ', '.join(global_missing) if global_missing else "None"
-    global_extras_str = ', '.join(global_extras) if global_extras else "None"
-
+    logging.info(f"CSV {os.path.basename(csv_path)}: {len(df)} rows, {len(matched)} matched")
+    unmatched_ids = set(parsed['CONCEPT']) - set(concepts['CONCEPT'])
+    if unmatched_ids:
+        logging.debug(f"Unmatched IDs sample: {list(unmatched_ids)[:5]}")
+    return matched[WORDLIST_COLUMNS]
+
+
+def _dups_str(dups: Dict[str, List[str]]) -> str:
+    return '\n'.join([f"  {cid}: {ips}" for cid, ips in dups.items()]) if dups else "  None"
+
+def _ids_str(ids: List[str]) -> str:
+    return ', '.join(ids) if ids else "None"
+
+def _split_sorted(keys: pd.Index, values: pd.Index) -> Dict[str, List[str]]:
+    """{key: [values...]} for parallel key/value indexes sorted by key, without per-group Python calls."""
+    if not len(keys):
+        return {}
+    keys_arr = np.asarray(keys, dtype=object)
+    starts = np.flatnonzero(np.r_[True, keys_arr[1:] != keys_arr[:-1]])
+    chunks = np.split(np.asarray(values, dtype=object), starts[1:])
+    return dict(zip(keys_arr[starts].tolist(), (chunk.tolist() for chunk in chunks)))
+
+def check_report(df: pd.DataFrame, valid_ids: Set[str]) -> Tuple[dict, pd.DataFrame]:
+    """One grouped pass over (DOCULECT, CONCEPT): duplicates, missing/extra IDs and coverage.
+
+    Returns the summary report (global + per DOCULECT) and a per-(DOCULECT, CONCEPT) status table
+    that also lists every missing valid ID.
+    """
+    df = df.dropna(subset=['CONCEPT'])
+    grouped = df.groupby(['DOCULECT', 'CONCEPT'], sort=True)['IPA']
+    pairs = pd.DataFrame({'n_rows': grouped.size(), 'ipa_variants': grouped.first()})
+    pairs['status'] = 'ok'
+    pairs.loc[pairs['n_rows'] > 1, 'status'] = 'duplicate'
+    pairs.loc[~pairs.index.get_level_values('CONCEPT').isin(valid_ids), 'status'] = 'extra'
+
+    # IPA variant lists only for duplicated pairs (usually few), in row order
+    dup_rows = df[grouped.transform('size') > 1]
+    dup_variants: Dict[Tuple[str, str], List[str]] = {}
+    for doculect, concept, ipa in zip(dup_rows['DOCULECT'].tolist(), dup_rows['CONCEPT'].tolist(), dup_rows['IPA'].tolist()):
+        dup_variants.setdefault((doculect, concept), []).append(ipa)
+    dup_index = pairs.index[pairs['n_rows'] > 1]
+    pairs.loc[dup_index, 'ipa_variants'] = [' | '.join(map(str, dup_variants[key])) for key in dup_index]
+
+    doculects = pairs.index.get_level_values('DOCULECT').unique()
+    missing = pd.MultiIndex.from_product([doculects, sorted(valid_ids)], names=['DOCULECT', 'CONCEPT']).difference(pairs.index)
+    missing_by_doculect = _split_sorted(missing.get_level_values('DOCULECT'), missing.get_level_values('CONCEPT'))
+    extras = pairs.index[pairs['status'] == 'extra']
+    extras_by_doculect = _split_sorted(extras.get_level_values('DOCULECT'), extras.get_level_values('CONCEPT'))
+    dups_by_doculect: Dict[str, Dict[str, List[str]]] = {}
+    for doculect, concept in dup_index:
+        dups_by_doculect.setdefault(doculect, {})[concept] = dup_variants[(doculect, concept)]
+
+    by_doculect = pairs.groupby(level='DOCULECT', sort=True)
+    rows = by_doculect['n_rows'].sum()
+    unique_concepts = by_doculect.size()
+    present = (pairs['status'] != 'extra').groupby(level='DOCULECT', sort=True).sum()
+
+    # Global duplicates: every IPA variant of a CONCEPT across all DOCULECTs, in row order
+    by_concept = df[['CONCEPT', 'IPA']].sort_values('CONCEPT', kind='stable')
+    global_variants = _split_sorted(by_concept['CONCEPT'], by_concept['IPA'])
+    global_present = set(global_variants)
+    num_valid = len(valid_ids)
+
+    def coverage(num_present: int) -> float:
+        return round(100 * num_present / num_valid, 2) if num_valid else 0.0
+
+    report = {
+        'valid_ids': num_valid,
+        'global': {
+            'rows': int(len(df)),
+            'unique_concepts': len(global_present),
+            'coverage_pct': coverage(len(global_present & valid_ids)),
+            'duplicates': {cid: ips for cid, ips in global_variants.items() if len(ips) > 1},
+            'missing': sorted(valid_ids - global_present),
+            'extras': sorted(global_present - valid_ids),
+        },
+        'doculects': {
+            doculect: {
+                'rows': int(rows[doculect]),
+                'unique_concepts': int(unique_concepts[doculect]),
+                'coverage_pct': coverage(int(present[doculect])),
+                'duplicates': dups_by_doculect.get(doculect, {}),
+                'missing': missing_by_doculect.get(doculect, []),
+                'extras': extras_by_doculect.get(doculect, []),
+            }
+            for doculect in doculects
+        },
+    }
+
+    missing_df = pd.DataFrame({'n_rows': 0, 'ipa_variants': '', 'status': 'missing'}, index=missing)
+    table = pd.concat([pairs, missing_df]).sort_index().reset_index()
+    return report, table[['DOCULECT', 'CONCEPT', 'status', 'n_rows', 'ipa_variants']]
+
+def render_check_text(report: dict) -> str:
+    """wordlist_check.txt from a check_report() summary."""
+    glob = report['global']
     check_content = f"""Wordlist Check Summary (by sk_consolidate_wordlist.py):
 
 Global:
-- Total rows: {len(df)}
-- Unique CONCEPTs: {len(global_present)}
+- Total rows: {glob['rows']}
+- Unique CONCEPTs: {glob['unique_concepts']}
+- Coverage of valid IDs: {glob['coverage_pct']}%
 
 Duplicates (CONCEPT -> IPA variants):
-{global_dups_str}
+{_dups_str(glob['duplicates'])}
 
 Missing essential IDs:
-{global_missing_str}
+{_ids_str(glob['missing'])}
 
 Unwanted extra IDs:
-{global_extras_str}
+{_ids_str(glob['extras'])}
 
 """
-
-    # Per-DOCULECT
-    for doculect in sorted(df['DOCULECT'].unique()):
-        sub_df = df[df['DOCULECT'] == doculect]
-        sub_rows = len(sub_df)
-        sub_concepts = set(sub_df['CONCEPT'].dropna().unique())
-        sub_dups = sub_df.groupby('CONCEPT')['IPA'].apply(list).to_dict()
-        sub_dups_detail = {cid: ips for cid, ips in sub_dups.items() if len(ips) > 1}
-        sub_dups_str = '\n'.join([f"  {cid}: {ips}" for cid, ips in sub_dups_detail.items()]) if sub_dups_detail else "  None"
-        sub_missing = sorted(valid_ids - sub_concepts)
-        sub_extras = sorted(sub_concepts - valid_ids)
-        sub_missing_str = ', '.join(sub_missing) if sub_missing else "None"
-        sub_extras_str = ', '.join(sub_extras) if sub_extras else "None"
-
-        check_content += f"""## {doculect}
-Total rows: {sub_rows}
-Unique CONCEPTs: {len(sub_concepts)}
+    sections = [check_content]
+    for doculect, sub in report['doculects'].items():
+        sections.append(f"""## {doculect}
+Total rows: {sub['rows']}
+Unique CONCEPTs: {sub['unique_concepts']}
+Coverage: {sub['coverage_pct']}%
 
 Duplicates:
-{sub_dups_str}
+{_dups_str(sub['duplicates'])}
 
 Missing:
-{sub_missing_str}
+{_ids_str(sub['missing'])}
 
 Extras:
-{sub_extras_str}
+{_ids_str(sub['extras'])}
 
-"""
+""")
+    return ''.join(sections)
+
+def run_checks(df: pd.DataFrame, valid_ids: Set[str]) -> dict:
+    """Post-generation checks: global + per-DOCULECT duplicates, coverage, extras.
 
-        logging.info(f"{doculect}: {sub_rows} rows, {len(sub_dups_detail)} dups, {len(sub_missing)} missing, {len(sub_extras)} extras")
+    Saves wordlist_check.json (summary), wordlist_check.csv (per DOCULECT/CONCEPT) and wordlist_check.txt (rendered summary).
+    """
+    logging.info("Running consolidation checks...")
+    report, table = check_report(df, valid_ids)
+
+    for doculect, sub in report['doculects'].items():
+        logging.info(f"{doculect}: {sub['rows']} rows, {len(sub['duplicates'])} dups, {len(sub['missing'])} missing, {len(sub['extras'])} extras, {sub['coverage_pct']}% coverage")
 
-    check_path = 'wordlist_check.txt'
-    with open(check_path, 'w', encoding='utf-8') as f:
-        f.write(check_content)
-    logging.info(f"Checks saved to {check_path}")
+    check_path, json_path, csv_path = CHECK_FILES
+    write_json(json_path, report)
+    with atomic_path(csv_path) as tmp_path:
+        table.to_csv(tmp_path, index=False)
+    write_text(check_path, render_check_text(report))
+    logging.info(f"Checks saved to {check_path}, wordlist_check.json and wordlist_check.csv")
+    return report
 
 
 def main():
@@ -154,42 +252,51 @@ def main():
     logging.info(f"Using audio_root: {audio_root}")
     logging.info(f"Valid IDs count: {len(valid_ids)} from {len(mapping)} concepts")
 
-    all_rows = []
-    for subdir, _, files in os.walk(audio_root):
-        for file in files:
-            if file.endswith('_ipa_transcriptions.csv'):
-                ipa_csv_path = os.path.join(subdir, file)
-                logging.info(f"Processing: {ipa_csv_path}")
-                rows = process_csv(ipa_csv_path, valid_ids, reverse_mapping)
-                all_rows.extend(rows)
+    # Transcription CSVs indexed by the project catalog (no full os.walk of Audio_Processed)
+    catalog = open_catalog(root_dir, audio_root)
+    ipa_csv_paths = catalog.artifacts('_ipa_transcriptions.csv')
+    source_hashes = {p: catalog.artifact_hash(p) for p in ipa_csv_paths}
+    catalog.close()
 
-    if not all_rows:
+    concepts = concept_table(reverse_mapping)
+    output = 'wordlist.tsv'
+    builder = 'sk_consolidate_wordlist'
+    inputs_hash = file_sha256(csv_path)
+    existing, state = load_wordlist_state(output, builder, inputs_hash) if incremental_enabled() else (None, {})
+
+    if existing is not None:
+        # Incremental: only changed transcription CSVs are re-read; other rows keep their IDs
+        df, state, touched = update_wordlist(existing, state, source_hashes, lambda p: process_csv(p, concepts))
+        if not touched:
+            logging.info("Incremental: no transcription CSV changed")
+        df = df.sort_values('CONCEPT', kind='stable').reset_index(drop=True)
+    else:
+        # Load CSVs in parallel (I/O + C parser), then process in catalog order so row order is deterministic
+        max_workers = int(os.getenv('CONSOLIDATE_WORKERS', min(16, (os.cpu_count() or 1) * 2)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            frames = list(executor.map(read_ipa_csv, ipa_csv_paths))
+        parts = []
+        for ipa_csv_path, ipa_df in zip(ipa_csv_paths, frames):
+            logging.info(f"Processing: {ipa_csv_path}")
+            parts.append(process_csv(ipa_csv_path, concepts, ipa_df).assign(**{SOURCE_COLUMN: ipa_csv_path}))
+        parts = [p for p in parts if not p.empty]
+        df = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=WORDLIST_COLUMNS + [SOURCE_COLUMN])
+        df = df.sort_values('CONCEPT').reset_index(drop=True)
+        df.insert(0, 'ID', range(1, len(df) + 1))
+        df, state = record_sources(df, builder, inputs_hash, source_hashes)
+
+    if df.empty:
         logging.warning("No valid rows!")
         return
 
-    df = pd.DataFrame(all_rows, columns=['DOCULECT', 'CONCEPT', 'LEXICAL_ITEM', 'IPA'])
-    df = df.sort_values('CONCEPT').reset_index(drop=True)
-    df.insert(0, 'ID', range(1, len(df) + 1))
-
-    output = 'wordlist.tsv'
-    df.to_csv(output, sep='\t', index=False)
-
-    # Duplicate to Python global outputs
-    global_outputs_dir = os.path.join(root_dir, 'Python global outputs')
-    os.makedirs(global_outputs_dir, exist_ok=True)
-    global_output = os.path.join(global_outputs_dir, output)
-    df.to_csv(global_output, sep='\t', index=False)
-    logging.info(f"Saved {len(df)} rows to {output} and duplicated to {global_output}")
+    written = write_table(df, output, 'wordlist', sep='\t')
+    save_wordlist_state(output, state)
 
     run_checks(df, valid_ids)
 
-    # Duplicate wordlist_check.txt
-    check_path = 'wordlist_check.txt'
-    global_check_path = os.path.join(global_outputs_dir, 'wordlist_check.txt')
-    with open(global_check_path, 'r', encoding='utf-8') as src, open(check_path, 'r', encoding='utf-8') as dst:
-        content = src.read()
-        dst.write(content)
-    logging.info(f"Duplicated {check_path} to {global_check_path}")
+    # Publish wordlist + check reports to Python global outputs (hardlink/reflink, copy only as fallback)
+    global_paths = publish(written + CHECK_FILES, root_dir)
+    logging.info(f"Saved {len(df)} rows to {output} and published it with {', '.join(CHECK_FILES)} to {os.path.dirname(global_paths[0])}")
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,190 @@
+# sk_cpu_autotune.py
+# CPU inference autotuner for the ASR stages (sk_ipa_transcription.py, sk_multi_ipa.py).
+# Times a short calibration set of real segments across batch sizes, intra-op/inter-op thread counts
+# and the number of parallel model replicas, then saves the best configuration per host and model
+# to autotune/<hostname>.json under the project root. The transcription scripts load it automatically.
+
+import os
+import json
+import time
+import socket
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from dotenv import load_dotenv
+from sk_catalog import open_catalog
+
+logger = logging.getLogger(__name__)
+
+# Used when no tuned configuration exists for this host/model (matches the previous hardcoded batch_size=16)
+DEFAULT_SETTINGS: Dict[str, Any] = {
+    'batch_size': 16,
+    'intra_op_threads': None,
+    'inter_op_threads': None,
+    'replicas': 1,
+}
+
+DEFAULT_IPA_MODEL = 'facebook/wav2vec2-xlsr-53-espeak-cv-ft'
+
+
+def autotune_path(root_dir: str, host: Optional[str] = None) -> str:
+    """Path of the per-host autotune file: <root>/autotune/<hostname>.json"""
+    host = host or socket.gethostname()
+    return os.path.join(root_dir, 'autotune', f"{host}.json")
+
+
+def load_tuned_settings(model: str, root_dir: str, device: int = -1) -> Dict[str, Any]:
+    """Return tuned settings for model on this host, falling back to DEFAULT_SETTINGS. GPU runs only keep batch_size."""
+    settings = dict(DEFAULT_SETTINGS)
+    path = autotune_path(root_dir)
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                tuned = json.load(f).get(model, {})
+            settings.update({k: tuned[k] for k in DEFAULT_SETTINGS if k in tuned})
+            if tuned:
+                logger.info(f"Loaded autotuned settings for {model} from {path}: {settings}")
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Could not read autotune file {path}: {e}")
+    if device != -1:
+        settings.update({'intra_op_threads': None, 'inter_op_threads': None, 'replicas': 1})
+    return settings
+
+
+def set_interop_threads(settings_list: List[Dict[str, Any]]) -> None:
+    """Set torch inter-op threads once per process, before any model loads (torch fixes them on first use).
+    Models tuned differently share the process, so the largest tuned value is used."""
+    values = sorted({int(s['inter_op_threads']) for s in settings_list if s.get('inter_op_threads')})
+    if not values:
+        return
+    if len(values) > 1:
+        logger.warning(f"Models tuned for different inter-op thread counts {values}; one process has one, using {values[-1]}")
+    import torch
+    try:
+        torch.set_num_interop_threads(values[-1])
+    except RuntimeError as e:
+        logger.warning(f"Tuned inter-op threads ({values[-1]}) not applied, already fixed for this process: {e}")
+
+
+def apply_thread_settings(settings: Dict[str, Any]) -> None:
+    """Set torch intra-op threads for a model (inter-op threads are set once per process by set_interop_threads)."""
+    import torch
+    if settings.get('intra_op_threads'):
+        torch.set_num_threads(int(settings['intra_op_threads']))
+
+
+def build_replicas(factory: Callable[[], Any], settings: Dict[str, Any]) -> List[Any]:
+    """Create settings['replicas'] independent pipeline instances."""
+    return [factory() for _ in range(max(1, int(settings.get('replicas') or 1)))]
+
+
+def run_replicas(pipes: List[Any], inputs: List[str], batch_size: int) -> List[Any]:
+    """Run inputs through the pipeline replicas (contiguous shards, one thread each), preserving input order."""
+    if len(pipes) <= 1 or len(inputs) <= 1:
+        return list(pipes[0](inputs, batch_size=batch_size))
+    shard_size = -(-len(inputs) // len(pipes))
+    shards = [inputs[i:i + shard_size] for i in range(0, len(inputs), shard_size)]
+    with ThreadPoolExecutor(max_workers=len(shards)) as executor:
+        shard_results = list(executor.map(lambda args: list(args[0](args[1], batch_size=batch_size)), zip(pipes, shards)))
+    return [r for shard in shard_results for r in shard]
+
+
+def _candidate_configs(cpu_count: int) -> List[Dict[str, int]]:
+    """Thread/replica grid: powers of two with replicas * intra_op_threads <= cpu_count."""
+    powers = [p for p in (1, 2, 4, 8, 16, 32, 64) if p <= cpu_count]
+    configs = []
+    for replicas in powers:
+        for intra in powers:
+            if replicas * intra > cpu_count:
+                continue
+            for inter in sorted({1, 2} & set(powers)):
+                configs.append({'replicas': replicas, 'intra_op_threads': intra, 'inter_op_threads': inter})
+    return configs
+
+
+def _time_config(model: str, samples: List[str], config: Dict[str, int], batch_sizes: List[int]) -> Dict[int, float]:
+    """Child-process trial: set threads first, load replicas once, time each batch size. Returns files/sec per batch size."""
+    import torch
+    torch.set_num_interop_threads(config['inter_op_threads'])
+    torch.set_num_threads(config['intra_op_threads'])
+    from transformers import pipeline
+    pipes = build_replicas(lambda: pipeline("automatic-speech-recognition", model=model, device=-1), config)
+    run_replicas(pipes, samples[:len(pipes)], 1)  # Warm-up
+    throughput = {}
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        run_replicas(pipes, samples, batch_size)
+        throughput[batch_size] = len(samples) / (time.perf_counter() - start)
+    return throughput
+
+
+def calibration_samples(root_dir: str, processed_root: str, num_samples: int) -> List[str]:
+    """Pick num_samples real segments spread evenly across all *process* datasets."""
+    catalog = open_catalog(root_dir, processed_root)
+    audio_files = [p for d in catalog.datasets(require_segments=True, require_env=False) for p in catalog.segment_paths(d)]
+    catalog.close()
+    if len(audio_files) <= num_samples:
+        return audio_files
+    step = len(audio_files) / num_samples
+    return [audio_files[int(i * step)] for i in range(num_samples)]
+
+
+def autotune_model(model: str, samples: List[str], batch_sizes: List[int], cpu_count: int) -> Dict[str, Any]:
+    """Time every candidate config in a fresh process and return the fastest one."""
+    ctx = multiprocessing.get_context('spawn')
+    best: Dict[str, Any] = {}
+    for config in _candidate_configs(cpu_count):
+        try:
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as executor:
+                throughput = executor.submit(_time_config, model, samples, config, batch_sizes).result()
+        except Exception as e:
+            logger.error(f"Trial {config} failed for {model}: {e}")
+            continue
+        for batch_size, files_per_sec in throughput.items():
+            logger.info(f"{model} {config} batch_size={batch_size}: {files_per_sec:.2f} files/s")
+            if files_per_sec > best.get('files_per_sec', 0.0):
+                best = {**config, 'batch_size': batch_size, 'files_per_sec': round(files_per_sec, 3)}
+    return best
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    root_dir = os.path.dirname(script_dir)
+    load_dotenv(os.path.join(root_dir, '.env'))
+    processed_root = os.path.normpath(os.path.join(root_dir, 'Audio_Processed'))
+    if not os.path.exists(processed_root):
+        raise ValueError(f"Audio_Processed not found at {processed_root}")
+
+    models = [m.strip() for m in os.getenv('AUTOTUNE_MODELS', DEFAULT_IPA_MODEL).split(',') if m.strip()]
+    batch_sizes = [int(b) for b in os.getenv('AUTOTUNE_BATCH_SIZES', '1,4,8,16,32').split(',')]
+    cpu_count = int(os.getenv('AUTOTUNE_CPUS', os.cpu_count() or 1))
+    samples = calibration_samples(root_dir, processed_root, int(os.getenv('AUTOTUNE_SAMPLES', 32)))
+    if not samples:
+        raise ValueError(f"No calibration segments found under {processed_root}")
+    logging.info(f"Autotuning {models} on {len(samples)} segments, {cpu_count} CPUs, batch sizes {batch_sizes}")
+
+    path = autotune_path(root_dir)
+    tuned: Dict[str, Any] = {}
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            tuned = json.load(f)
+
+    for model in models:
+        best = autotune_model(model, samples, batch_sizes, cpu_count)
+        if not best:
+            logging.warning(f"No successful trials for {model}, keeping previous settings")
+            continue
+        tuned[model] = {**best, 'cpu_count': cpu_count, 'num_samples': len(samples), 'tuned_at': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        logging.info(f"Best for {model}: {tuned[model]}")
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(tuned, f, indent=2)
+    logging.info(f"Saved autotune settings to {path}")
+
+
+if __name__ == "__main__":
+    main()
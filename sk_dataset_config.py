@@ -0,0 +1,155 @@
+# sk_dataset_config.py
+# Immutable per-dataset configuration parsed from a dataset's .env (dotenv_values, never written to os.environ).
+# Values are layered: process environment (incl. the root .env loaded by the calling script) < dataset .env,
+# so settings from one dataset can no longer leak into the next. DatasetConfig objects are frozen, hashable
+# and picklable, and run_datasets() runs a per-dataset function over them on a thread or process pool.
+
+import os
+import logging
+from dataclasses import dataclass, field
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dotenv import dotenv_values
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_dataset_name(name: str) -> str:
+    """'Khan01 process' -> 'khan01' (naming used for per-dataset output files)."""
+    return name.lower().replace(' ', '').replace('process', '').strip()
+
+
+@dataclass(frozen=True)
+class DatasetConfig:
+    """Typed, read-only settings of one dataset directory."""
+    dataset_dir: str
+    dataset_name: str
+    segments_folder: str
+    metadata_csv: str
+    originals_dir: str
+    audio_file_name: Optional[str] = None
+    dataset_code: Optional[str] = None
+    kurdish_variety: str = 'CK'
+    gender: Optional[str] = None
+    age: Optional[str] = None
+    education: Optional[str] = None
+    city_origin: Optional[str] = None
+    subject: Optional[str] = None
+    researcher: Optional[str] = None
+    record_date: Optional[str] = None
+    ck_model: str = 'razhan/whisper-base-ckb'
+    sk_model: str = 'razhan/whisper-base-sdh'
+    num_ipa_runs: int = 10
+    variation_threshold: int = 1
+    stability_threshold: float = 0.9
+    quality_policy: str = 'off'  # off | skip | deprioritize (sk_audio_screening.py)
+    # Segmentation metadata (Audio_Original/<dir>/.env, SK_* keys)
+    sk_variety: str = 'SK'
+    sk_gender: str = 'M'
+    sk_age: str = '30'
+    sk_record_date: str = '1990-01-01'
+    sk_education: str = 'MA'
+    sk_city_origin: str = 'Toronto'
+    sk_subject: str = 'Spoken word'
+    sk_researcher: str = 'Researcher Name'
+    # Full merged key/value view, as sorted (key, value) pairs
+    env: Tuple[Tuple[str, str], ...] = field(default=(), repr=False)
+
+    @property
+    def ortho_model(self) -> str:
+        return self.ck_model if self.kurdish_variety.upper() == 'CK' else self.sk_model
+
+    @property
+    def input_wav_path(self) -> Optional[str]:
+        return os.path.join(self.originals_dir, self.audio_file_name) if self.audio_file_name else None
+
+    @property
+    def doculect(self) -> str:
+        return f"{self.dataset_code or self.dataset_name}_{self.kurdish_variety}"
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        """Raw merged value for keys without a typed field."""
+        return dict(self.env).get(key, default)
+
+
+def load_dataset_config(dataset_dir: str, dataset_env: Optional[Mapping[str, Optional[str]]] = None,
+                        base_env: Optional[Mapping[str, str]] = None) -> DatasetConfig:
+    """Build a DatasetConfig for dataset_dir.
+
+    dataset_env: already-parsed .env values (e.g. from the catalog); read from <dataset_dir>/.env if None.
+    base_env: lower-priority values; defaults to a snapshot of os.environ.
+    """
+    if dataset_env is None:
+        env_path = os.path.join(dataset_dir, '.env')
+        dataset_env = dotenv_values(env_path) if os.path.exists(env_path) else {}
+    values: Dict[str, str] = dict(os.environ if base_env is None else base_env)
+    values.update({k: v for k, v in dataset_env.items() if v is not None})
+
+    def get(key: str, default: Optional[str] = None) -> Optional[str]:
+        value = values.get(key)
+        return value if value else default
+
+    return DatasetConfig(
+        dataset_dir=dataset_dir,
+        dataset_name=normalize_dataset_name(get('DATASET_NAME', os.path.basename(dataset_dir))),
+        segments_folder=os.path.normpath(os.path.join(dataset_dir, get('SEGMENTS_FOLDER', 'segments'))),
+        metadata_csv=os.path.join(dataset_dir, get('METADATA_CSV', 'metadata.csv')),
+        originals_dir=os.path.join(dataset_dir, get('AUDIO_DIR', 'originals')),
+        audio_file_name=get('AUDIO_FILE_NAME'),
+        dataset_code=get('DATASET_CODE'),
+        kurdish_variety=get('KURDISH_VARIETY', 'CK'),
+        gender=get('GENDER'),
+        age=get('AGE'),
+        education=get('EDUCATION'),
+        city_origin=get('CITY_ORIGIN'),
+        subject=get('SUBJECT'),
+        researcher=get('RESEARCHER'),
+        record_date=get('RECORD_DATE'),
+        ck_model=get('CK_MODEL', 'razhan/whisper-base-ckb'),
+        sk_model=get('SK_MODEL', 'razhan/whisper-base-sdh'),
+        num_ipa_runs=int(get('NUM_IPA_RUNS', '10')),
+        variation_threshold=int(get('VARIATION_THRESHOLD', '1')),
+        stability_threshold=float(get('STABILITY_THRESHOLD', '0.9')),
+        quality_policy=get('QUALITY_POLICY', 'off').lower(),
+        sk_variety=get('SK_VARIETY', 'SK'),
+        sk_gender=get('SK_GENDER', 'M'),
+        sk_age=get('SK_AGE', '30'),
+        sk_record_date=get('SK_RECORD_DATE', '1990-01-01'),
+        sk_education=get('SK_EDUCATION', 'MA'),
+        sk_city_origin=get('SK_CITY_ORIGIN', 'Toronto'),
+        sk_subject=get('SK_SUBJECT', 'Spoken word'),
+        sk_researcher=get('SK_RESEARCHER', 'Researcher Name'),
+        env=tuple(sorted(values.items())),
+    )
+
+
+def _guarded(config: DatasetConfig, call: Callable[[], Any]) -> Any:
+    """call(), or None (logged) if it raises."""
+    try:
+        return call()
+    except Exception as e:
+        logger.error(f"Dataset {config.dataset_dir} failed: {e}")
+        return None
+
+
+def run_datasets(fn: Callable[[DatasetConfig], Any], configs: List[DatasetConfig],
+                 max_workers: Optional[int] = None, executor: Optional[str] = None,
+                 allow_process: bool = True) -> List[Any]:
+    """Run fn over configs, sequentially or concurrently (DATASET_WORKERS, DATASET_EXECUTOR=thread|process).
+
+    A failing dataset is logged and yields None instead of aborting the others, sequentially or on a pool.
+    Process pools need fn to be importable (module-level function of a module without import-time side effects);
+    scripts whose datasets share module-level state (open catalog, loaded models) pass allow_process=False.
+    """
+    max_workers = max_workers or int(os.getenv('DATASET_WORKERS', 1))
+    executor = executor or os.getenv('DATASET_EXECUTOR', 'thread')
+    if executor == 'process' and not allow_process:
+        logger.warning("DATASET_EXECUTOR=process is not supported by this stage, using threads")
+        executor = 'thread'
+    if max_workers <= 1 or len(configs) <= 1:
+        return [_guarded(config, partial(fn, config)) for config in configs]
+    pool_cls = ProcessPoolExecutor if executor == 'process' else ThreadPoolExecutor
+    with pool_cls(max_workers=max_workers) as pool:
+        futures = [pool.submit(fn, config) for config in configs]
+        return [_guarded(config, future.result) for config, future in zip(configs, futures)]
@@ -0,0 +1,202 @@
+# sk_distance_trees.py
+# Quick exploratory trees from the cognate character matrix of sk_nexus_export.py (same COGNATES_CSV /
+# NEXUS_COGID_COLUMN settings), before long BEAST runs. Each doculect's '1' cells and its observed cells (concepts it
+# has a judged word for) are packed into uint64 bit rows; pairwise distances are popcounts of ANDed rows, counted
+# only over characters observed in both doculects, so missing data ('?') neither adds nor removes similarity:
+#   jaccard = 1 - shared / (present in either), hamming = differing / comparable characters.
+# Neighbor-joining (unrooted) and UPGMA (rooted, ultrametric) trees are written as Newick.
+# TREE_METRICS (jaccard, hamming; default jaccard) x TREE_METHODS (nj, upgma; default both) give
+# <name>_<metric>.dist (PHYLIP square distance matrix) and <name>_<metric>_<method>.nwk.
+
+import os
+import re
+import time
+import logging
+import numpy as np
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple, Union
+from dotenv import load_dotenv
+from sk_nexus_export import CharacterMatrix, load_matrix, output_stem
+from sk_artifacts import atomic_path, publish
+
+METRICS = ('jaccard', 'hamming')
+TREE_METHODS = ('nj', 'upgma')
+ROW_BLOCK = 64  # doculects per block of the pairwise popcount (bounds the temporary arrays)
+
+# A tree is a leaf (taxon index) or a tuple of (subtree, branch length) children; None = no branch length
+Tree = Union[int, Tuple[Tuple['Tree', Optional[float]], ...]]
+
+if hasattr(np, 'bitwise_count'):
+    _popcount = np.bitwise_count
+else:
+    _BYTE_COUNTS = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def _popcount(words: np.ndarray) -> np.ndarray:
+        counts = _BYTE_COUNTS[words.view(np.uint8)]
+        return counts.reshape(*words.shape, words.itemsize).sum(axis=-1)
+
+
+def dense_bits(matrix: CharacterMatrix) -> Tuple[np.ndarray, np.ndarray]:
+    """Bool taxa x characters arrays: present ('1') and observed ('0' or '1')."""
+    present = np.zeros(matrix.shape, dtype=bool)
+    for t in range(len(matrix.taxa)):
+        present[t, matrix.present(t)] = True
+    observed = matrix.observed[:, matrix.char_concept]
+    return present, observed
+
+
+def pack_bits(bits: np.ndarray) -> np.ndarray:
+    """Rows of a bool array packed into uint64 words (zero padded)."""
+    packed = np.packbits(bits, axis=1)
+    pad = -packed.shape[1] % 8
+    if pad:
+        packed = np.pad(packed, ((0, 0), (0, pad)))
+    return np.ascontiguousarray(packed).view(np.uint64)
+
+
+def distance_matrix(present: np.ndarray, observed: np.ndarray, metric: str = 'jaccard') -> np.ndarray:
+    """Pairwise distances of packed present/observed rows over the characters observed in both doculects."""
+    if metric not in METRICS:
+        raise ValueError(f"Unknown distance metric {metric!r}; choose from {list(METRICS)}")
+    n = len(present)
+    dist = np.zeros((n, n))
+    for start in range(0, n, ROW_BLOCK):
+        p, o = present[start:start + ROW_BLOCK, None], observed[start:start + ROW_BLOCK, None]
+        # Present in a (resp. b) among the characters observed in both; shared presences
+        in_a = _popcount(p & observed[None]).sum(axis=-1, dtype=np.int64)
+        in_b = _popcount(present[None] & o).sum(axis=-1, dtype=np.int64)
+        shared = _popcount(p & present[None]).sum(axis=-1, dtype=np.int64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if metric == 'jaccard':
+                block = 1 - shared / (in_a + in_b - shared)
+            else:
+                comparable = _popcount(o & observed[None]).sum(axis=-1, dtype=np.int64)
+                block = (in_a + in_b - 2 * shared) / comparable
+        dist[start:start + ROW_BLOCK] = block
+    np.fill_diagonal(dist, 0)
+    return dist
+
+
+def neighbor_joining(dist: np.ndarray) -> Tree:
+    """Saitou & Nei neighbor-joining; negative branch lengths are set to 0. Unrooted (basal trifurcation)."""
+    d = np.array(dist, dtype=float)
+    nodes: List[Tree] = list(range(len(d)))
+    if len(nodes) < 3:
+        return tuple((node, d[0, -1] / 2) for node in nodes)
+    while len(nodes) > 3:
+        n = len(nodes)
+        r = d.sum(axis=1)
+        q = (n - 2) * d - r[:, None] - r[None, :]
+        np.fill_diagonal(q, np.inf)
+        i, j = divmod(int(np.argmin(q)), n)
+        length_i = d[i, j] / 2 + (r[i] - r[j]) / (2 * (n - 2))
+        length_j = d[i, j] - length_i
+        joined = (d[i] + d[j] - d[i, j]) / 2
+        keep = [k for k in range(n) if k not in (i, j)]
+        d = np.vstack([np.append(d[np.ix_(keep, keep)], joined[keep][:, None], axis=1),
+                       np.append(joined[keep], 0)])
+        nodes = [nodes[k] for k in keep] + [((nodes[i], max(length_i, 0.0)), (nodes[j], max(length_j, 0.0)))]
+    lengths = [(d[0, 1] + d[0, 2] - d[1, 2]) / 2, (d[0, 1] + d[1, 2] - d[0, 2]) / 2, (d[0, 2] + d[1, 2] - d[0, 1]) / 2]
+    return tuple((node, max(length, 0.0)) for node, length in zip(nodes, lengths))
+
+
+def upgma(dist: np.ndarray) -> Tree:
+    """UPGMA (average linkage) tree, rooted, branch lengths from cluster heights."""
+    d = np.array(dist, dtype=float)
+    nodes: List[Tree] = list(range(len(d)))
+    sizes = [1] * len(d)
+    heights = [0.0] * len(d)
+    np.fill_diagonal(d, np.inf)
+    while len(nodes) > 1:
+        i, j = sorted(divmod(int(np.argmin(d)), len(nodes)))
+        height = d[i, j] / 2
+        joined = (d[i] * sizes[i] + d[j] * sizes[j]) / (sizes[i] + sizes[j])
+        node = ((nodes[i], max(height - heights[i], 0.0)), (nodes[j], max(height - heights[j], 0.0)))
+        keep = [k for k in range(len(nodes)) if k not in (i, j)]
+        d = np.vstack([np.append(d[np.ix_(keep, keep)], joined[keep][:, None], axis=1),
+                       np.append(joined[keep], np.inf)])
+        nodes = [nodes[k] for k in keep] + [node]
+        sizes = [sizes[k] for k in keep] + [sizes[i] + sizes[j]]
+        heights = [heights[k] for k in keep] + [height]
+    return nodes[0]
+
+
+def build_tree(dist: np.ndarray, method: str) -> Tree:
+    if method not in TREE_METHODS:
+        raise ValueError(f"Unknown tree method {method!r}; choose from {list(TREE_METHODS)}")
+    return neighbor_joining(dist) if method == 'nj' else upgma(dist)
+
+
+def newick_name(name: str) -> str:
+    return name if re.fullmatch(r"[^\s()\[\]':;,]+", name) else "'" + name.replace("'", "''") + "'"
+
+
+def newick(tree: Tree, names: Sequence[str], labels: Optional[Dict[FrozenSet[int], str]] = None) -> str:
+    """Newick string of tree; labels optionally names internal nodes by their clade (set of leaf indices)."""
+    def fmt(node: Tree) -> Tuple[str, FrozenSet[int]]:
+        if isinstance(node, (int, np.integer)):
+            return newick_name(names[node]), frozenset([int(node)])
+        parts = [(fmt(child), length) for child, length in node]
+        clade = frozenset().union(*(leaves for (_, leaves), _ in parts))
+        inner = ','.join(text if length is None else f"{text}:{length:.6f}" for (text, _), length in parts)
+        return f"({inner}){labels.get(clade, '') if labels else ''}", clade
+    return fmt(tree)[0] + ';'
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    # Project root
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    root_dir = os.path.dirname(script_dir)
+
+    load_dotenv(os.path.join(root_dir, '.env'), override=True)
+
+    cognates_csv = os.getenv('COGNATES_CSV', os.path.join(root_dir, 'cognates.csv'))
+    cogid_column = os.getenv('NEXUS_COGID_COLUMN', 'COGID')
+    metrics = [m.strip().lower() for m in os.getenv('TREE_METRICS', 'jaccard').split(',') if m.strip()]
+    methods = [m.strip().lower() for m in os.getenv('TREE_METHODS', 'nj,upgma').split(',') if m.strip()]
+    output_dir = os.getenv('OUTPUT_DIR', root_dir)
+
+    unknown = [m for m in metrics if m not in METRICS] + [m for m in methods if m not in TREE_METHODS]
+    if unknown:
+        raise ValueError(f"Unknown TREE_METRICS/TREE_METHODS {unknown}; choose from {list(METRICS)} / {list(TREE_METHODS)}")
+
+    matrix = load_matrix(cognates_csv, cogid_column)
+    start = time.perf_counter()
+    present, observed = (pack_bits(b) for b in dense_bits(matrix))
+    logging.info(f"Packed {matrix.shape[0]} doculects x {matrix.shape[1]} characters into "
+                 f"{present.shape[1]} words per row ({time.perf_counter() - start:.3f}s)")
+
+    stem = output_stem(cognates_csv, cogid_column)
+    written = []
+    for metric in metrics:
+        start = time.perf_counter()
+        dist = distance_matrix(present, observed, metric)
+        logging.info(f"{metric} distances in {time.perf_counter() - start:.3f}s")
+        if np.isnan(dist).any():
+            t1, t2 = np.argwhere(np.isnan(dist))[0]
+            raise ValueError(f"No comparable characters between {matrix.taxa[t1]} and {matrix.taxa[t2]} ({metric})")
+
+        path = os.path.join(output_dir, f"{stem}_{metric}.dist")
+        width = max(len(t) for t in matrix.taxa) + 2
+        with atomic_path(path) as tmp_path:
+            with open(tmp_path, 'w', encoding='utf-8', newline='\n') as f:
+                f.write(f"{len(matrix.taxa)}\n")
+                for taxon, row in zip(matrix.taxa, dist):
+                    f.write(re.sub(r'\s+', '_', taxon).ljust(width) + ' '.join(f"{x:.6f}" for x in row) + '\n')
+        written.append(path)
+
+        for method in methods:
+            start = time.perf_counter()
+            tree = build_tree(dist, method)
+            path = os.path.join(output_dir, f"{stem}_{metric}_{method}.nwk")
+            with atomic_path(path) as tmp_path:
+                with open(tmp_path, 'w', encoding='utf-8', newline='\n') as f:
+                    f.write(newick(tree, matrix.taxa) + '\n')
+            written.append(path)
+            logging.info(f"{method} tree ({metric}) in {time.perf_counter() - start:.3f}s: {path}")
+    publish(written, root_dir)
+
+
+if __name__ == "__main__":
+    main()
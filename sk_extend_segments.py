@@ -1,6 +1,8 @@
 import pandas as pd
 import os
 import logging
+from sk_table_io import write_table
+from sk_artifacts import publish
 
 logger = logging.getLogger(__name__)
 
@@ -104,14 +106,10 @@ if __name__ == "__main__":
             updated_df = update_segments(path)
             if updated_df is not None:
                 updated_path = path.replace('.csv', '_updated.csv')
-                updated_df.to_csv(updated_path, sep='\t', index=False)
-
-                # Duplicate to Python global outputs
-                global_outputs_dir = os.path.join(root_dir, 'Python global outputs')
-                global_dataset_dir = os.path.join(global_outputs_dir, folder)
-                os.makedirs(global_dataset_dir, exist_ok=True)
-                global_updated_path = os.path.join(global_dataset_dir, os.path.basename(updated_path))
-                updated_df.to_csv(global_updated_path, sep='\t', index=False)
+                written = write_table(updated_df, updated_path, sep='\t')
+
+                # Publish to Python global outputs (hardlink/reflink, copy only as fallback)
+                publish(written, root_dir, folder)
 
                 success_count += 1
                 logger.info(f"Updated {f} -> {updated_path} (local + Python global outputs/{folder}/{os.path.basename(updated_path)})")
@@ -0,0 +1,110 @@
+# sk_incremental_cognates.py
+# Online cognate assignment for entries added to wordlist.tsv since the last cognates.csv (used by
+# sk_lingpy_cognate_detect.py with COG_INCREMENTAL=1). Existing rows and their COGIDs are kept as they are; each new
+# entry (wordlist ID not in cognates.csv, e.g. a new doculect) is only aligned against the entries of its own concept
+# (sk_sca_align.py distances) and joins the cognate set with the smallest average distance to its members (average
+# linkage, as the UPGMA clustering that built the sets) if that distance is within COG_THRESHOLD, else it opens a
+# new set with a fresh COGID. New entries are placed in ID order, so later ones can join sets opened by earlier ones.
+# Assignments within COG_REVIEW_MARGIN of the threshold, or with a second set also within it, are flagged for review.
+# Rows are matched by wordlist ID, so the wordlist must be built with WORDLIST_INCREMENTAL=1 (sk_incremental_wordlist.py,
+# stable IDs); a full build renumbers the IDs. A kept row whose DOCULECT/CONCEPT/IPA differs from the wordlist entry
+# with its ID means the IDs moved, and the cognate detection falls back to a full run.
+
+import os
+import logging
+import numpy as np
+import pandas as pd
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence
+from lingpy import LexStat
+from sk_sca_align import METHODS as ENGINE_METHODS, distances, lingpy_distances
+
+logger = logging.getLogger(__name__)
+
+KEY_COLUMNS = ['DOCULECT', 'CONCEPT', 'IPA']  # what an existing row must still match in the wordlist
+ASSIGNMENT_COLUMNS = ['ID', 'DOCULECT', 'CONCEPT', 'IPA', 'COGID', 'ASSIGNMENT', 'DISTANCE', 'RUNNER_UP_COGID',
+                      'RUNNER_UP_DISTANCE', 'REVIEW', 'REVIEW_REASON']
+
+
+def incremental_enabled() -> bool:
+    return os.getenv('COG_INCREMENTAL', '').lower() in ('1', 'true', 'yes')
+
+
+def load_cognates(output_csv: str) -> Optional[pd.DataFrame]:
+    """Existing cognates.csv as written (strings, so kept rows are written back unchanged), or None if unusable."""
+    if not os.path.exists(output_csv):
+        return None
+    existing = pd.read_csv(output_csv, dtype=str, keep_default_na=False)
+    if not set(KEY_COLUMNS + ['ID', 'COGID']) <= set(existing.columns):
+        logger.warning(f"{output_csv} has no ID/{'/'.join(KEY_COLUMNS)}/COGID columns, doing a full run")
+        return None
+    return existing
+
+
+def moved_entries(lex: LexStat, existing: pd.DataFrame) -> List[int]:
+    """IDs of existing rows still in the wordlist whose DOCULECT/CONCEPT/IPA differ from the entry with that ID."""
+    moved = []
+    for row in existing[['ID'] + KEY_COLUMNS].itertuples(index=False):
+        i = int(row[0])
+        if i in lex and any(str(lex[i, c.lower()]) != value for c, value in zip(KEY_COLUMNS, row[1:])):
+            moved.append(i)
+    return moved
+
+
+def assign_entries(lex: LexStat, existing: pd.DataFrame, new_ids: Sequence[int], method: str, threshold: float,
+                   margin: float, engine: str = 'numpy') -> pd.DataFrame:
+    """Cognate set per new entry (ASSIGNMENT_COLUMNS); existing sets are only ever extended, COGIDs never change."""
+    cogid_of: Dict[int, int] = dict(zip(existing['ID'].astype(int), existing['COGID'].astype(int)))
+    concept_of = {i: lex[i, 'concept'] for i in new_ids}
+    members = defaultdict(list)  # concept -> existing IDs still in the wordlist
+    for i in lex:
+        if i in cogid_of:
+            members[lex[i, 'concept']].append(i)
+
+    # Every distance that can be needed in one batch: new x existing and new x earlier new, per concept
+    new_by_concept = defaultdict(list)
+    for i in sorted(new_ids):
+        new_by_concept[concept_of[i]].append(i)
+    ids_a, ids_b = [], []
+    for concept, new in new_by_concept.items():
+        for k, i in enumerate(new):
+            others = members[concept] + new[:k]
+            ids_a += [i] * len(others)
+            ids_b += others
+    if engine == 'numpy' and method in ENGINE_METHODS:
+        d = distances(lex, ids_a, ids_b, method)
+    else:
+        d = lingpy_distances(lex, ids_a, ids_b, method)
+    dist = dict(zip(zip(ids_a, ids_b), d))
+
+    next_cogid = max(cogid_of.values(), default=0) + 1
+    rows: List[dict] = []
+    for concept, new in new_by_concept.items():
+        sets: Dict[int, List[int]] = defaultdict(list)
+        for i in members[concept]:
+            sets[cogid_of[i]].append(i)
+        for i in new:
+            # Average distance to each set of the concept, closest first (ties: lower COGID)
+            ranked = sorted((float(np.mean([dist[i, m] for m in ids])), cogid) for cogid, ids in sets.items())
+            best_distance, best = ranked[0] if ranked else (np.nan, None)
+            runner_distance, runner = ranked[1] if len(ranked) > 1 else (np.nan, None)
+            if best is not None and best_distance <= threshold:
+                cogid, assignment = best, 'joined'
+            else:
+                cogid, assignment = next_cogid, 'new'
+                next_cogid += 1
+            sets[cogid].append(i)
+
+            reasons = []
+            if best is not None and abs(best_distance - threshold) <= margin:
+                reasons.append('near threshold')
+            if runner is not None and runner_distance <= threshold:
+                reasons.append('several sets within threshold')
+            rows.append({
+                'ID': i, 'DOCULECT': lex[i, 'doculect'], 'CONCEPT': concept, 'IPA': lex[i, 'ipa'],
+                'COGID': cogid, 'ASSIGNMENT': assignment, 'DISTANCE': best_distance,
+                'RUNNER_UP_COGID': runner, 'RUNNER_UP_DISTANCE': runner_distance,
+                'REVIEW': bool(reasons), 'REVIEW_REASON': '; '.join(reasons),
+            })
+    df = pd.DataFrame(rows, columns=ASSIGNMENT_COLUMNS)
+    return df.astype({'RUNNER_UP_COGID': 'Int64'}).sort_values('ID', ignore_index=True)
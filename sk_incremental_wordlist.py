@@ -0,0 +1,115 @@
+# sk_incremental_wordlist.py
+# Incremental wordlist.tsv builds with stable IDs, shared by sk_consolidate_wordlist.py and sk_lingpy_wordlist_prep.py.
+# A state file next to the wordlist (wordlist_state.json) records, per source (a dataset's transcription CSVs),
+# the content hash the rows were built from and the IDs those rows got. On an incremental run only sources whose
+# hash changed are rebuilt; their new rows keep the ID of an identical old row and new rows get fresh IDs
+# (never reused). Enable with WORDLIST_INCREMENTAL=1; a full rebuild still renumbers from 1 and resets the state.
+
+import os
+import json
+import logging
+import pandas as pd
+from typing import Callable, Dict, List, Optional, Tuple
+from sk_artifacts import write_json
+
+logger = logging.getLogger(__name__)
+
+SOURCE_COLUMN = '_SOURCE'
+
+
+def incremental_enabled() -> bool:
+    return os.getenv('WORDLIST_INCREMENTAL', '').lower() in ('1', 'true', 'yes')
+
+
+def state_path(wordlist_path: str) -> str:
+    """wordlist.tsv -> wordlist_state.json"""
+    return f"{os.path.splitext(wordlist_path)[0]}_state.json"
+
+
+def load_wordlist_state(wordlist_path: str, builder: str, inputs_hash: str) -> Tuple[Optional[pd.DataFrame], dict]:
+    """Existing wordlist + state if they were written by builder from the same shared inputs, else (None, {})."""
+    path = state_path(wordlist_path)
+    if not os.path.exists(wordlist_path) or not os.path.exists(path):
+        return None, {}
+    with open(path, 'r', encoding='utf-8') as f:
+        state = json.load(f)
+    if state.get('builder') != builder:
+        logger.info(f"{path} was written by {state.get('builder')}, doing a full rebuild")
+        return None, {}
+    existing = pd.read_csv(wordlist_path, sep='\t', dtype=str, keep_default_na=False)
+    existing['ID'] = existing['ID'].astype(int)
+    if state.get('inputs_hash') != inputs_hash:
+        # Shared inputs changed (e.g. the concept list): rebuild every source, still matching IDs
+        state = {**state, 'inputs_hash': inputs_hash,
+                 'sources': {p: {**s, 'sha256': None} for p, s in state.get('sources', {}).items()}}
+    return existing, state
+
+
+def save_wordlist_state(wordlist_path: str, state: dict) -> None:
+    path = write_json(state_path(wordlist_path), state)
+    logger.info(f"Saved wordlist state to {path}")
+
+
+def record_sources(df: pd.DataFrame, builder: str, inputs_hash: str, source_hashes: Dict[str, str]) -> Tuple[pd.DataFrame, dict]:
+    """State for a fully rebuilt wordlist whose rows carry SOURCE_COLUMN; returns the frame without it."""
+    sources = {p: {'sha256': h, 'ids': []} for p, h in source_hashes.items()}
+    for source, ids in df.groupby(SOURCE_COLUMN, sort=False)['ID']:
+        sources[source]['ids'] = [int(i) for i in ids]
+    state = {
+        'builder': builder,
+        'inputs_hash': inputs_hash,
+        'next_id': int(df['ID'].max()) + 1 if len(df) else 1,
+        'sources': sources,
+    }
+    return df.drop(columns=SOURCE_COLUMN), state
+
+
+def _match_ids(new_rows: pd.DataFrame, old_rows: pd.DataFrame, next_id: int) -> Tuple[List[int], int]:
+    """IDs for new_rows: reuse the ID of an identical old row (n-th duplicate to n-th duplicate), else allocate."""
+    key = [c for c in new_rows.columns if c != 'ID']
+    new_keyed = new_rows[key].astype(str).assign(_occ=lambda d: d.groupby(key, sort=False).cumcount())
+    old_keyed = old_rows[key + ['ID']].astype({c: str for c in key})
+    old_keyed = old_keyed.assign(_occ=old_keyed.groupby(key, sort=False).cumcount())
+    matched = new_keyed.merge(old_keyed, on=key + ['_occ'], how='left')['ID']
+    ids = []
+    for old_id in matched:
+        if pd.isna(old_id):
+            ids.append(next_id)
+            next_id += 1
+        else:
+            ids.append(int(old_id))
+    return ids, next_id
+
+
+def update_wordlist(existing: pd.DataFrame, state: dict, source_hashes: Dict[str, str],
+                    build_rows: Callable[[str], pd.DataFrame]) -> Tuple[pd.DataFrame, dict, List[str]]:
+    """Rebuild only changed/new sources, drop removed ones, keep every other row (and ID) untouched.
+
+    build_rows(source) returns the source's rows without ID. Returns (wordlist, new state, touched sources).
+    """
+    old_sources = state.get('sources', {})
+    changed = [p for p, h in source_hashes.items() if old_sources.get(p, {}).get('sha256') != h]
+    removed = [p for p in old_sources if p not in source_hashes]
+    if not changed and not removed:
+        return existing, state, []
+
+    touched_ids = {i for p in changed + removed for i in old_sources.get(p, {}).get('ids', [])}
+    kept = existing[~existing['ID'].isin(touched_ids)]
+    next_id = max(int(state.get('next_id', 1)), int(existing['ID'].max()) + 1 if len(existing) else 1)
+
+    sources = {p: s for p, s in old_sources.items() if p not in removed}
+    parts = [kept]
+    for source in changed:
+        new_rows = build_rows(source)
+        old_rows = existing[existing['ID'].isin(set(old_sources.get(source, {}).get('ids', [])))]
+        ids, next_id = _match_ids(new_rows, old_rows, next_id)
+        new_rows = new_rows.copy()
+        new_rows.insert(0, 'ID', ids)
+        parts.append(new_rows[existing.columns])
+        sources[source] = {'sha256': source_hashes[source], 'ids': ids}
+        logger.info(f"Wordlist: rebuilt {len(new_rows)} rows from {source} ({len(set(ids) - touched_ids)} new IDs)")
+    for source in removed:
+        logger.info(f"Wordlist: dropped rows of removed source {source}")
+
+    wordlist = pd.concat(parts, ignore_index=True)
+    return wordlist, {**state, 'next_id': next_id, 'sources': sources}, changed + removed
@@ -0,0 +1,175 @@
+# sk_ipa_consensus.py
+# Consensus transcription per segment from the ipa_run1..N columns of *_multi_ipa.csv (ROVER-style).
+# The distinct non-empty hypotheses of a segment are aligned progressively into a confusion network: the medoid
+# hypothesis (sk_variation_metrics.py) is the backbone, the others follow by descending run count. Each is aligned
+# to the network by dynamic programming over phone segments, where matching a phone to a slot costs 1 minus the
+# share of votes the slot already gives that phone, and a gap costs 1 minus the slot's gap share. Every slot then
+# votes (runs weighted by count): the winning phone is kept with confidence = its vote share, a winning gap drops
+# the slot. Writes <dataset>_ipa_consensus.csv next to the multi-run CSV.
+
+import os
+import logging
+from functools import partial
+from operator import itemgetter
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Tuple
+from sk_catalog import open_catalog
+from sk_dataset_config import DatasetConfig, load_dataset_config, run_datasets
+from sk_table_io import read_table, write_table
+from sk_artifacts import publish
+from sk_variation_metrics import hypothesis_counts, split_phones, variation_metrics
+
+GAP = ''  # slot entry for "no phone here"
+
+Slot = Dict[str, float]
+
+
+def align_to_network(slots: List[Slot], total: float, phones: List[str], weight: float) -> List[Slot]:
+    """Align phones (seen weight times) to the network slots (total votes so far); returns the updated slots."""
+    n, m = len(slots), len(phones)
+    gap_cost = [1.0 - s.get(GAP, 0.0) / total for s in slots]
+    # D[i][j]: cost of aligning slots[:i] with phones[:j]
+    D = [[0.0] * (m + 1) for _ in range(n + 1)]
+    for j in range(1, m + 1):
+        D[0][j] = float(j)
+    for i in range(1, n + 1):
+        slot = slots[i - 1]
+        row, prev = D[i], D[i - 1]
+        row[0] = prev[0] + gap_cost[i - 1]
+        for j in range(1, m + 1):
+            row[j] = min(prev[j - 1] + 1.0 - slot.get(phones[j - 1], 0.0) / total,
+                         prev[j] + gap_cost[i - 1],
+                         row[j - 1] + 1.0)
+
+    # Traceback (prefer match, then gap in the hypothesis, then a new slot)
+    aligned: List[Slot] = []
+    i, j = n, m
+    while i > 0 or j > 0:
+        if i > 0 and j > 0 and D[i][j] == D[i - 1][j - 1] + 1.0 - slots[i - 1].get(phones[j - 1], 0.0) / total:
+            slot = dict(slots[i - 1])
+            slot[phones[j - 1]] = slot.get(phones[j - 1], 0.0) + weight
+            i, j = i - 1, j - 1
+        elif i > 0 and D[i][j] == D[i - 1][j] + gap_cost[i - 1]:
+            slot = dict(slots[i - 1])
+            slot[GAP] = slot.get(GAP, 0.0) + weight
+            i -= 1
+        else:
+            slot = {GAP: total, phones[j - 1]: weight}  # earlier hypotheses had nothing here
+            j -= 1
+        aligned.append(slot)
+    aligned.reverse()
+    return aligned
+
+
+def consensus(hypotheses: List[Tuple[str, float]]) -> Tuple[List[str], List[float]]:
+    """Consensus phones and their confidences for (hypothesis, run count) pairs, backbone first."""
+    slots: List[Slot] = []
+    total = 0.0
+    for text, weight in hypotheses:
+        phones = split_phones(text)
+        if not slots:
+            slots = [{p: weight} for p in phones]
+        else:
+            slots = align_to_network(slots, total, phones, weight)
+        total += weight
+    phones, confidences = [], []
+    for slot in slots:
+        phone, votes = max(slot.items(), key=itemgetter(1))  # ties: entry added first (backbone side) wins
+        if phone != GAP:
+            phones.append(phone)
+            confidences.append(votes / total)
+    return phones, confidences
+
+
+def consensus_table(runs: pd.DataFrame) -> pd.DataFrame:
+    """Per-segment consensus_ipa, phone_confidence, mean/min confidence and the run metrics; index preserved."""
+    counts, uniques = hypothesis_counts(runs)
+    metrics = variation_metrics(runs, (counts, uniques))
+    hyps = counts.assign(ipa=uniques[counts['code'].to_numpy()])
+    hyps['backbone'] = hyps['ipa'].to_numpy() == metrics['medoid'].to_numpy()[hyps['row'].to_numpy()]
+    hyps = hyps.sort_values(['row', 'backbone', 'count', 'code'], ascending=[True, False, False, True])
+
+    consensus_ipa = [''] * len(runs)
+    phone_confidence = [''] * len(runs)
+    mean_confidence = [0.0] * len(runs)
+    min_confidence = [0.0] * len(runs)
+    # Hypotheses of a segment are contiguous; walk them as plain lists (much cheaper than a pandas groupby loop)
+    rows = hyps['row'].to_numpy()
+    ipas = hyps['ipa'].tolist()
+    weights = hyps['count'].astype(float).tolist()
+    bounds = np.flatnonzero(np.diff(rows)) + 1
+    starts = np.r_[0, bounds] if len(rows) else []
+    for start, end in zip(starts, np.r_[bounds, len(rows)]):
+        row = rows[start]
+        if end - start == 1:
+            # One distinct hypothesis: it is the consensus, every phone fully confident
+            phones = split_phones(ipas[start])
+            confidences = [1.0] * len(phones)
+        else:
+            phones, confidences = consensus(list(zip(ipas[start:end], weights[start:end])))
+        consensus_ipa[row] = ''.join(phones)
+        phone_confidence[row] = ' '.join(f"{c:.2f}" for c in confidences)
+        if confidences:
+            mean_confidence[row] = sum(confidences) / len(confidences)
+            min_confidence[row] = min(confidences)
+
+    return pd.DataFrame({
+        'consensus_ipa': consensus_ipa,
+        'phone_confidence': phone_confidence,
+        'mean_confidence': mean_confidence,
+        'min_confidence': min_confidence,
+        'n_runs': metrics['n_runs'].to_numpy(),
+        'n_hypotheses': metrics['n_hypotheses'].to_numpy(),
+        'stability_score': metrics['stability_score'].to_numpy(),
+    }, index=runs.index)
+
+
+def process_dataset_dir(config: DatasetConfig, root_dir: str) -> None:
+    """Write <dataset>_ipa_consensus.csv from the dataset's multi-run CSV."""
+    dataset_dir = config.dataset_dir
+    dataset_name = config.dataset_name
+    multi_ipa_csv = os.path.join(dataset_dir, f"{dataset_name}_multi_ipa.csv")
+    if not os.path.exists(multi_ipa_csv):
+        logging.warning(f"No _multi_ipa.csv in {dataset_dir}, skipping")
+        return
+
+    df = read_table(multi_ipa_csv, schema='multi_ipa')
+    ipa_cols = [col for col in df.columns if col.startswith('ipa_run')]
+    if not ipa_cols:
+        logging.warning(f"No ipa_run columns in {multi_ipa_csv}, skipping")
+        return
+    logging.info(f"Building consensus for {len(df)} segments x {len(ipa_cols)} runs from {multi_ipa_csv}")
+
+    table = consensus_table(df[ipa_cols].reset_index(drop=True))
+    out = pd.concat([df[['lexeme_id', '#', 'english_word']].reset_index(drop=True), table], axis=1)
+    output_csv = os.path.join(dataset_dir, f"{dataset_name}_ipa_consensus.csv")
+    written = write_table(out, output_csv, 'ipa_consensus')
+
+    # Publish to Python global outputs (hardlink/reflink, copy only as fallback)
+    global_output_csv = publish(written, root_dir, os.path.basename(dataset_dir))[0]
+    low = (out['min_confidence'] < 0.5).sum()
+    logging.info(f"Saved consensus to {output_csv} ({len(out)} rows, {low} with a phone below 0.5 confidence) and published to {global_output_csv}")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    root_dir = os.path.dirname(script_dir)
+    processed_root = os.path.normpath(os.path.join(root_dir, 'Audio_Processed'))
+    if not os.path.exists(processed_root):
+        raise ValueError(f"Audio_Processed not found at {processed_root}")
+
+    catalog = open_catalog(root_dir, processed_root)
+    target_dirs = catalog.datasets(require_env=True)
+    configs = [load_dataset_config(os.path.join(processed_root, d), catalog.dataset_env(d)) for d in target_dirs]
+    catalog.close()
+    logging.info(f"Found target directories: {target_dirs}")
+
+    run_datasets(partial(process_dataset_dir, root_dir=root_dir), configs)
+    logging.info("Consensus complete.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# sk_ipa_tokenize.py
+# IPA segmentation and sound-class conversion for LingPy (used by sk_lingpy_cognate_detect.py).
+# espeak-style IPA is split into phones with a longest-match trie over an inventory of multi-character units
+# (affricates, diphthongs; extended by IPA_INVENTORY, a text file with one unit per line). Combining diacritics and
+# modifier letters (length ː, aspiration ʰ, palatalization ʲ, ...) stay with their phone, a tie bar joins the next
+# symbol, runs of tone letters form one token, stress marks and syllable dots are dropped. Whitespace is a hard
+# boundary but not required, so both the spaced IPA of sk_lingpy_wordlist_prep.py and the whitespace-stripped IPA of
+# sk_consolidate_wordlist.py segment the same. Each distinct form is segmented once (memoized) and its LingPy
+# sound classes (sonority, prosodic string, SCA classes) are computed in the same pass, so LexStat reuses them.
+
+import os
+import json
+import hashlib
+import unicodedata
+import pandas as pd
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+from lingpy import rc
+from lingpy.sequence.sound_classes import prosodic_string, token2class
+
+VERSION = 1  # bump when the segmentation rules change (part of the LexStat cache key)
+DEFAULT_INVENTORY = (
+    'tʃ', 'dʒ', 'ts', 'dz', 'tɕ', 'dʑ', 'tʂ', 'dʐ',  # affricates
+    'aɪ', 'aʊ', 'eɪ', 'oʊ', 'ɔɪ', 'əʊ', 'ɪə', 'eə', 'ʊə',  # diphthongs
+)
+TIE_BARS = '͜͡'
+TONES = '⁰¹²³⁴⁵⁶⁷⁸⁹˥˦˧˨˩'
+DROPPED = 'ˈˌ.'
+SEGMENT_COLUMNS = ['TOKENS', 'SONARS', 'PROSTRINGS', 'CLASSES']  # in the order LexStat adds them
+
+
+def load_inventory(path: Optional[str] = None) -> Tuple[str, ...]:
+    """DEFAULT_INVENTORY plus the units listed in path (one per line, # comments), sorted."""
+    units = set(DEFAULT_INVENTORY)
+    if path:
+        with open(path, encoding='utf-8') as f:
+            units.update(line.split('#', 1)[0].strip() for line in f)
+    return tuple(sorted(u for u in units if len(u) > 1))
+
+
+def _is_mark(ch: str) -> bool:
+    return ch not in TONES and (unicodedata.combining(ch) > 0 or unicodedata.category(ch) in ('Mn', 'Lm', 'Sk'))
+
+
+class IPATokenizer:
+    """Longest-match IPA segmenter with memoized forms and sound classes."""
+
+    def __init__(self, inventory: Iterable[str] = DEFAULT_INVENTORY):
+        self.inventory = tuple(sorted(set(inventory)))
+        self.signature = 'ipa-trie-{}-{}'.format(VERSION, hashlib.sha256(
+            json.dumps(self.inventory, ensure_ascii=False).encode('utf-8')).hexdigest()[:16])
+        self._trie: Dict[str, dict] = {}
+        for unit in self.inventory:
+            node = self._trie
+            for ch in unit:
+                node = node.setdefault(ch, {})
+            node[''] = {}  # end of a unit
+        self._forms: Dict[str, List[str]] = {}
+        self._classes: Dict[str, Tuple[str, int]] = {}
+        self._sca = rc('sca')
+        self._art = rc('art')
+
+    def _match(self, form: str, start: int) -> int:
+        """End of the longest inventory unit at start (start + 1 if none)."""
+        end, node = start + 1, self._trie
+        for pos in range(start, len(form)):
+            node = node.get(form[pos])
+            if node is None:
+                break
+            if '' in node:
+                end = pos + 1
+        return end
+
+    def segment(self, form: str) -> List[str]:
+        """Phones of one IPA form (memoized; the returned list is shared, copy it before changing it)."""
+        tokens = self._forms.get(form)
+        if tokens is not None:
+            return tokens
+        tokens = []
+        text = ''.join(ch for ch in str(form) if ch not in DROPPED)
+        pos = 0
+        while pos < len(text):
+            ch = text[pos]
+            if ch.isspace():
+                pos += 1
+                continue
+            if ch in TONES:
+                end = pos + 1
+                while end < len(text) and text[end] in TONES:
+                    end += 1
+            else:
+                end = self._match(text, pos)
+            # Diacritics and modifier letters after the phone; a tie bar also takes the next symbol
+            while end < len(text) and _is_mark(text[end]):
+                end += 2 if text[end] in TIE_BARS and end + 1 < len(text) else 1
+            tokens.append(text[pos:end])
+            pos = end
+        self._forms[form] = tokens
+        return tokens
+
+    def token_classes(self, token: str) -> Tuple[str, int]:
+        """SCA sound class and sonority of one phone, as LexStat computes them (tokens2class, cldf=True)."""
+        classes = self._classes.get(token)
+        if classes is None:
+            classes = self._classes[token] = (token2class(token, self._sca, cldf=True),
+                                              int(token2class(token, self._art, cldf=True)))
+        return classes
+
+    def tokenize(self, forms: pd.Series) -> pd.DataFrame:
+        """SEGMENT_COLUMNS per form, indexed like forms; each distinct form is done once."""
+        codes, uniques = pd.factorize(forms.fillna(''))
+        rows = []
+        for form in uniques:
+            tokens = self.segment(form)
+            classes = [self.token_classes(t) for t in tokens]
+            if tokens and all(c == '0' for c, _ in classes):
+                raise ValueError(f"IPA form {form!r} contains only unknown sounds")
+            sonars = [s for _, s in classes]
+            rows.append((tokens, sonars, prosodic_string(sonars) if sonars else '', ''.join(c for c, _ in classes)))
+        per_form = [rows[c] for c in codes]
+        return pd.DataFrame({
+            'TOKENS': [list(r[0]) for r in per_form],
+            'SONARS': [list(r[1]) for r in per_form],
+            'PROSTRINGS': [r[2] for r in per_form],
+            'CLASSES': [r[3] for r in per_form],
+        }, index=forms.index, columns=SEGMENT_COLUMNS)
+
+
+@lru_cache(maxsize=None)
+def default_tokenizer() -> IPATokenizer:
+    """Tokenizer over DEFAULT_INVENTORY plus IPA_INVENTORY (if set)."""
+    return IPATokenizer(load_inventory(os.getenv('IPA_INVENTORY') or None))
@@ -8,8 +8,6 @@ import torch
 import os
 import pandas as pd
 import logging
-import json
-import subprocess
 from dotenv import load_dotenv
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -19,6 +17,13 @@ warnings.filterwarnings("ignore", category=FutureWarning)
 
 import glob
 from pathlib import Path
+from sk_cpu_autotune import load_tuned_settings, apply_thread_settings, build_replicas, run_replicas, set_interop_threads
+from sk_catalog import open_catalog
+from sk_dataset_config import DatasetConfig, load_dataset_config, run_datasets
+from sk_table_io import read_table
+from sk_artifacts import publish
+from sk_checkpoint import BatchCheckpoint
+from sk_audio_screening import apply_quality_policy
 
 # Optional root .env
 load_dotenv()
@@ -31,14 +36,9 @@ processed_root = os.path.normpath(os.path.join(root_dir, 'Audio_Processed'))
 if not os.path.exists(processed_root):
     raise ValueError(f"Audio_Processed directory not found at: {processed_root}")
 
-# Discover target directories: 'process' in name, has segments/ and .env
-target_dirs = [
-    d for d in os.listdir(processed_root)
-    if os.path.isdir(os.path.join(processed_root, d))
-    and 'process' in d.lower()
-    and os.path.exists(os.path.join(processed_root, d, 'segments'))
-    and os.path.exists(os.path.join(processed_root, d, '.env'))
-]
+# Discover target directories from the project catalog: 'process' in name, has segments/ and .env
+catalog = open_catalog(root_dir, processed_root)
+target_dirs = catalog.datasets(require_segments=True, require_env=True)
 
 if not target_dirs:
     raise ValueError("No target directories found in Audio_Processed/ with 'process' in name, segments/, and .env")
@@ -50,41 +50,58 @@ ipa_model = 'facebook/wav2vec2-xlsr-53-espeak-cv-ft'
 device = 0 if torch.cuda.is_available() else -1
 logging.info(f"Device set to use {'cuda:0' if device == 0 else 'cpu'}")
 
+packages = 'ASR: transformers, torch, torchaudio, accelerate, phonemizer; Segmentation: ffmpeg-python, pandas, python-dotenv (sk_asr_segmentation.py)'
 
-def process_dataset_dir(dataset_dir: str) -> None:
+# Output columns: audio_path last, then citations (subject (L), artist-P to ISRC-X removed)
+col_order = ['lexical_item_survey', '#', 'orthographic_transcription', 'ipa_transcription', 'lexeme_id',
+             'kurdish_variety', 'gender', 'age', 'education', 'city_origin',
+             'researcher', 'record_date', 'dataset_code', 'audio_path', 'ortho_model', 'ipa_model', 'packages']
+
+
+def transcribe(pipes, settings, audio_files, label):
+    """Texts for audio_files, in order; '' for every file if the batch fails."""
+    try:
+        apply_thread_settings(settings)
+        results = run_replicas(pipes, audio_files, settings['batch_size'])
+        return [r['text'].strip() if isinstance(r, dict) and 'text' in r and isinstance(r['text'], str) else '' for r in results]
+    except Exception as e:
+        logging.error(f"Batch {label} ASR error: {e}")
+        return [''] * len(audio_files)
+
+
+def process_dataset_dir(config: DatasetConfig) -> None:
     """Process a single dataset directory: generate ortho + IPA transcriptions and save combined CSV."""
-    # Load per-dir .env
-    load_dotenv(os.path.join(dataset_dir, '.env'))
-    
-    dataset_name_raw = os.getenv('DATASET_NAME', os.path.basename(dataset_dir))
-    dataset_name = dataset_name_raw.lower().replace(' ', '').replace('process', '').strip()
-    
-    segments_folder = os.path.normpath(os.getenv('SEGMENTS_FOLDER', os.path.join(dataset_dir, 'segments')))
-    metadata_csv_path = os.path.join(dataset_dir, os.getenv('METADATA_CSV', 'metadata.csv'))
-    kurdish_variety = os.getenv('KURDISH_VARIETY', 'CK')
-    originals_dir = os.path.join(dataset_dir, os.getenv('AUDIO_DIR', 'originals'))
-    audio_file_name = os.getenv('AUDIO_FILE_NAME')
-    input_wav_path = os.path.join(originals_dir, audio_file_name) if audio_file_name else None
+    # Per-dataset settings come from the immutable config (dataset .env), never from os.environ
+    dataset_dir = config.dataset_dir
+    dataset_name = config.dataset_name
+    segments_folder = config.segments_folder
+    metadata_csv_path = config.metadata_csv
+    kurdish_variety = config.kurdish_variety
     
     logging.info(f"Processing {dataset_dir}: dataset_name={dataset_name}, variety={kurdish_variety}, segments={segments_folder}")
     
     # Select ortho model
-    ck_model = os.getenv('CK_MODEL', 'razhan/whisper-base-ckb')
-    sk_model = os.getenv('SK_MODEL', 'razhan/whisper-base-sdh')
-    ortho_model = ck_model if kurdish_variety.upper() == 'CK' else sk_model
+    ortho_model = config.ortho_model
     
-    # Load pipelines
-    ortho_pipe = pipeline("automatic-speech-recognition", model=ortho_model, device=device)
-    ipa_pipe = pipeline("automatic-speech-recognition", model=ipa_model, device=device)
+    # Load pipelines (batch size, threads and replica count from sk_cpu_autotune.py, if tuned for this host)
+    ortho_settings = load_tuned_settings(ortho_model, root_dir, device)
+    ipa_settings = load_tuned_settings(ipa_model, root_dir, device)
+    ortho_pipes = build_replicas(lambda: pipeline("automatic-speech-recognition", model=ortho_model, device=device), ortho_settings)
+    ipa_pipes = build_replicas(lambda: pipeline("automatic-speech-recognition", model=ipa_model, device=device), ipa_settings)
     
-    # Load audio files (full, no limit)
+    # Load audio files (full, no limit): metadata.csv paths, else segments/ listing (from the catalog for the standard layout)
     audio_files = []
-    if os.path.exists(metadata_csv_path):
-        metadata_df = pd.read_csv(metadata_csv_path)
+    standard_layout = (metadata_csv_path == os.path.join(dataset_dir, 'metadata.csv')
+                       and segments_folder == os.path.normpath(os.path.join(dataset_dir, 'segments')))
+    if standard_layout:
+        audio_files = catalog.segment_paths(os.path.basename(dataset_dir))
+        logging.info(f"Loaded {len(audio_files)} audio paths from catalog")
+    elif os.path.exists(metadata_csv_path):
+        metadata_df = read_table(metadata_csv_path)
         if 'audio_path' in metadata_df.columns:
             audio_files = [os.path.normpath(p) for p in metadata_df['audio_path'].tolist()]
         logging.info(f"Loaded {len(audio_files)} audio paths from {metadata_csv_path}")
-    if not audio_files and os.path.exists(segments_folder):
+    if not audio_files and not standard_layout and os.path.exists(segments_folder):
         audio_files = sorted([
             os.path.normpath(os.path.join(segments_folder, f))
             for f in os.listdir(segments_folder)
@@ -99,120 +116,74 @@ def process_dataset_dir(dataset_dir: str) -> None:
     # Env metadata (constant across files)
     env_metadata = {
         'kurdish_variety': kurdish_variety,
-        'gender': os.getenv('GENDER'),
-        'age': os.getenv('AGE'),
-        'education': os.getenv('EDUCATION'),
-        'city_origin': os.getenv('CITY_ORIGIN'),
-        'subject': os.getenv('SUBJECT'),
-        'researcher': os.getenv('RESEARCHER'),
-        'record_date': os.getenv('RECORD_DATE'),
-        'dataset_code': os.getenv('DATASET_CODE'),
+        'gender': config.gender,
+        'age': config.age,
+        'education': config.education,
+        'city_origin': config.city_origin,
+        'subject': config.subject,
+        'researcher': config.researcher,
+        'record_date': config.record_date,
+        'dataset_code': config.dataset_code,
     }
     
-    # Original metadata
-    original_metadata = get_metadata(input_wav_path) if input_wav_path and os.path.exists(input_wav_path) else {}
+    # Missing files would fail their whole ASR batch; drop them up front
+    missing = [p for p in audio_files if not os.path.exists(p)]
+    for audio_path in missing:
+        logging.warning(f"Audio file missing: {audio_path}")
+    audio_files = [p for p in audio_files if os.path.exists(p)]
     
-    # Batch process orthographic and IPA
-    try:
-        ortho_results = ortho_pipe(audio_files, batch_size=16)
-        ortho_transcriptions = [r['text'].strip() if isinstance(r, dict) and 'text' in r and isinstance(r['text'], str) else '' for r in ortho_results]
-    except Exception as e:
-        logging.error(f"Batch ortho ASR error: {e}")
-        ortho_transcriptions = [''] * len(audio_files)
-
-    try:
-        ipa_results = ipa_pipe(audio_files, batch_size=16)
-        ipa_transcriptions = [r['text'].strip() if isinstance(r, dict) and 'text' in r and isinstance(r['text'], str) else '' for r in ipa_results]
-    except Exception as e:
-        logging.error(f"Batch IPA ASR error: {e}")
-        ipa_transcriptions = [''] * len(audio_files)
-
-    # Build results
-    results = []
-    for audio_path, ortho_trans, ipa_trans in zip(audio_files, ortho_transcriptions, ipa_transcriptions):
-        if not os.path.exists(audio_path):
-            logging.warning(f"Audio file missing: {audio_path}")
-            continue
-        
-        lexeme_id = os.path.basename(audio_path).replace('.wav', '')
-        segment_metadata = get_metadata(audio_path)
-        
-        row = {
-            'lexeme_id': lexeme_id,
-            'audio_path': audio_path,
-            'orthographic_transcription': ortho_trans,
-            'ipa_transcription': ipa_trans,
-            **env_metadata,
-            **segment_metadata,
-            'original_metadata_json': json.dumps(original_metadata),
-        }
-        results.append(row)
+    # Low-quality segments (sk_audio_screening.py) are skipped or run last, per the dataset's QUALITY_POLICY
+    audio_files = apply_quality_policy(audio_files, dataset_dir, config.quality_policy)
     
-    if not results:
+    # Results are streamed to disk batch by batch; a rerun resumes after the last finished batch
+    output_csv = os.path.join(dataset_dir, f"{dataset_name}_ipa_transcriptions.csv")
+    checkpoint = BatchCheckpoint(output_csv, audio_files, {
+        'ortho_model': ortho_model, 'ipa_model': ipa_model, 'metadata': env_metadata,
+    })
+    for index, batch_files in checkpoint.pending():
+        ortho_transcriptions = transcribe(ortho_pipes, ortho_settings, batch_files, 'ortho')
+        ipa_transcriptions = transcribe(ipa_pipes, ipa_settings, batch_files, 'IPA')
+        
+        # Segment tags cached in the catalog, misses read natively from the RIFF headers
+        segment_metadatas = catalog.tags_for(os.path.basename(dataset_dir), batch_files)
+        rows = []
+        for audio_path, ortho_trans, ipa_trans, segment_metadata in zip(batch_files, ortho_transcriptions, ipa_transcriptions, segment_metadatas):
+            lexeme_id = os.path.basename(audio_path).replace('.wav', '')
+            rows.append({
+                **env_metadata,
+                **segment_metadata,
+                'lexical_item_survey': lexeme_id.split('_')[0],
+                '#': lexeme_id.split('_')[-1],
+                'orthographic_transcription': ortho_trans,
+                'ipa_transcription': ipa_trans,
+                'lexeme_id': lexeme_id,
+                'audio_path': audio_path,
+                'ortho_model': ortho_model,
+                'ipa_model': ipa_model,
+                'packages': packages,
+            })
+        checkpoint.write_batch(index, pd.DataFrame(rows, columns=col_order))
+    
+    if not checkpoint.num_rows:
         logging.warning(f"No results for {dataset_dir}")
+        checkpoint.discard()
         return
     
-    df = pd.DataFrame(results)
-    
-    # Additional derived columns
-    df['#'] = df['lexeme_id'].str.split('_').str[-1] if 'lexeme_id' in df else ''
-    df['lexical_item_survey'] = df['lexeme_id'].str.split('_').str[0]
-    
-    # Select specific columns (remove subject (L), artist-P to ISRC-X)
-    keep_cols = ['lexical_item_survey', '#', 'orthographic_transcription', 'ipa_transcription', 'lexeme_id', 
-                 'kurdish_variety', 'gender', 'age', 'education', 'city_origin', 
-                 'researcher', 'record_date', 'dataset_code', 'audio_path']
-    df = df[keep_cols]
-    
-    # Add citation columns
-    df['ortho_model'] = ortho_model
-    df['ipa_model'] = ipa_model
-    df['packages'] = 'ASR: transformers, torch, torchaudio, accelerate, phonemizer; Segmentation: ffmpeg-python, pandas, python-dotenv (sk_asr_segmentation.py)'
-    
-    # Reorder: audio_path last, then citations
-    col_order = ['lexical_item_survey', '#', 'orthographic_transcription', 'ipa_transcription', 'lexeme_id', 
-                 'kurdish_variety', 'gender', 'age', 'education', 'city_origin', 
-                 'researcher', 'record_date', 'dataset_code', 'audio_path', 'ortho_model', 'ipa_model', 'packages']
-    df = df[col_order]
-    
-    # Save
-    output_csv = os.path.join(dataset_dir, f"{dataset_name}_ipa_transcriptions.csv")
-    df.to_csv(output_csv, index=False)
-
-    # Duplicate to Python global outputs
-    global_outputs_dir = os.path.join(root_dir, 'Python global outputs')
-    global_dataset_dir = os.path.join(global_outputs_dir, os.path.basename(dataset_dir))
-    os.makedirs(global_dataset_dir, exist_ok=True)
-    global_output_csv = os.path.join(global_dataset_dir, f"{dataset_name}_ipa_transcriptions.csv")
-    df.to_csv(global_output_csv, index=False)
-    logging.info(f"Saved consolidated transcriptions to {output_csv} ({len(df)} rows) and duplicated to {global_output_csv}")
-
-
-def get_metadata(file_path: str) -> dict:
-    """Extract metadata tags from an audio file using ffprobe."""
-    file_path = os.path.normpath(file_path)
-    if not os.path.exists(file_path):
-        logging.warning(f"File not found for metadata extraction: {file_path}")
-        return {}
-    cmd = [
-        'ffprobe', '-v', 'quiet', '-print_format', 'json',
-        '-show_entries', 'format_tags', file_path
-    ]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        logging.error(f"Error extracting metadata from {file_path}: {result.stderr}")
-        return {}
-    try:
-        data = json.loads(result.stdout)
-        return data.get('format', {}).get('tags', {})
-    except json.JSONDecodeError:
-        logging.error(f"Error parsing metadata JSON from {file_path}")
-        return {}
+    # Save (parts streamed into the final CSV/Parquet one at a time)
+    num_rows = checkpoint.num_rows
+    written = checkpoint.finish('ipa_transcriptions')
+
+    # Publish to Python global outputs (hardlink/reflink, copy only as fallback)
+    global_output_csv = publish(written, root_dir, os.path.basename(dataset_dir))[0]
+    logging.info(f"Saved consolidated transcriptions to {output_csv} ({num_rows} rows) and published to {global_output_csv}")
 
 
-# Process all target directories
-for target_dir in target_dirs:
-    dataset_dir = os.path.join(processed_root, target_dir)
-    process_dataset_dir(dataset_dir)
+# Process all target directories (DATASET_WORKERS > 1 runs datasets concurrently)
+configs = [load_dataset_config(os.path.join(processed_root, d), catalog.dataset_env(d)) for d in target_dirs]
+# Inter-op threads are fixed per process: set once for every model the datasets use, before any pipeline loads
+models = sorted({ipa_model} | {config.ortho_model for config in configs})
+set_interop_threads([load_tuned_settings(model, root_dir, device) for model in models])
+# Threads only: the datasets share this module's catalog connection and globals (no __main__ entry point to spawn)
+run_datasets(process_dataset_dir, configs, allow_process=False)
 
 logging.info("All datasets processed.")
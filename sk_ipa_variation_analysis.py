@@ -1,46 +1,28 @@
 # sk_ipa_variation_analysis.py
 # Standalone script to analyze variations in multi-run IPA CSV.
-# Discovers *process dirs, loads _multi_ipa.csv, identifies/computes variations per row, saves report CSV.
+# Discovers *process dirs, loads _multi_ipa.csv, computes run-variation metrics per segment (sk_variation_metrics.py)
+# over the whole ipa_run* matrix at once, saves report CSV.
 
 import os
 import pandas as pd
 import logging
-from collections import Counter
-from dotenv import load_dotenv
-import json
+from functools import partial
+from sk_variation_metrics import hypothesis_counts, variation_metrics
+from sk_catalog import open_catalog
+from sk_dataset_config import DatasetConfig, load_dataset_config, run_datasets
+from sk_table_io import read_table, write_table
+from sk_artifacts import publish
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
-# Project root
-script_dir = os.path.dirname(os.path.abspath(__file__))
-root_dir = os.path.dirname(script_dir)
-processed_root = os.path.normpath(os.path.join(root_dir, 'Audio_Processed'))
-
-if not os.path.exists(processed_root):
-    raise ValueError(f"Audio_Processed not found at {processed_root}")
-
-# Target dirs with .env (assume multi_ipa.csv exists)
-target_dirs = [
-    d for d in os.listdir(processed_root)
-    if os.path.isdir(os.path.join(processed_root, d))
-    and 'process' in d.lower()
-    and os.path.exists(os.path.join(processed_root, d, '.env'))
-]
-
-logging.info(f"Found target directories: {target_dirs}")
-
-def process_dataset_dir(dataset_dir: str) -> None:
-    load_dotenv(os.path.join(dataset_dir, '.env'))
-    
-    dataset_name_raw = os.getenv('DATASET_NAME', os.path.basename(dataset_dir))
-    dataset_name = dataset_name_raw.lower().replace(' ', '').replace('process', '').strip()
+def process_dataset_dir(config: DatasetConfig, root_dir: str) -> None:
+    dataset_dir = config.dataset_dir
+    dataset_name = config.dataset_name
     
     multi_ipa_csv = os.path.join(dataset_dir, f"{dataset_name}_multi_ipa.csv")
     if not os.path.exists(multi_ipa_csv):
         logging.warning(f"No _multi_ipa.csv in {dataset_dir}, skipping")
         return
     
-    df = pd.read_csv(multi_ipa_csv)
+    df = read_table(multi_ipa_csv, schema='multi_ipa')
     logging.info(f"Loaded {len(df)} rows from {multi_ipa_csv}")
     
     # IPA run columns
@@ -50,45 +32,60 @@ def process_dataset_dir(dataset_dir: str) -> None:
         logging.warning("No ipa_run columns, skipping")
         return
     
-    variation_threshold = int(os.getenv('VARIATION_THRESHOLD', 1))
+    variation_threshold = config.variation_threshold
+    
+    # Distinct non-empty hypotheses per segment (sorted), then all metrics in one vectorized pass
+    runs = df[ipa_cols].reset_index(drop=True)
+    counts, uniques = hypothesis_counts(runs)
+    metrics = variation_metrics(runs, (counts, uniques))
     
-    results = []
-    for idx, row in df.iterrows():
-        ipa_runs = row[ipa_cols].tolist()
-        unique_ipas = [ipa for ipa in ipa_runs if ipa]  # Ignore empty
-        unique_set = set(unique_ipas)
-        has_variation = len(unique_set) > variation_threshold
-        
-        if has_variation:
-            counter = Counter(unique_ipas)
-            details = '; '.join([f"'{ipa}': {count}x" for ipa, count in sorted(counter.items())])
-            logging.info(f"Variation in {row['lexeme_id']} ({row['english_word']}): {details}")
-        else:
-            details = ''
-        
-        results.append({
-            'lexeme_id': row['lexeme_id'],
-            'english_word': row['english_word'],
-            'has_variation': has_variation,
-            'unique_transcriptions': sorted(list(unique_set)),
-            'variation_details': details
-        })
+    has_variation = metrics['n_hypotheses'] > variation_threshold
+    hyps = counts.assign(ipa=uniques[counts['code'].to_numpy()])
+    unique_lists = hyps.groupby('row')['ipa'].agg(lambda s: str(list(s)))
+    varied = hyps[has_variation.to_numpy()[hyps['row'].to_numpy()]]
+    details = ("'" + varied['ipa'] + "': " + varied['count'].astype(str) + 'x').groupby(varied['row']).agg('; '.join)
+    
+    df_variations = pd.DataFrame({
+        'lexeme_id': df['lexeme_id'].to_numpy(),
+        'english_word': df['english_word'].to_numpy(),
+        'has_variation': has_variation.to_numpy(),
+        'unique_transcriptions': unique_lists.reindex(runs.index, fill_value='[]').to_numpy(),
+        'variation_details': details.reindex(runs.index, fill_value='').to_numpy(),
+    })
+    df_variations = pd.concat([df_variations, metrics], axis=1)
+    df_variations['unstable'] = df_variations['stability_score'] < config.stability_threshold
+    for row in df_variations[df_variations['has_variation']].itertuples():
+        logging.debug(f"Variation in {row.lexeme_id} ({row.english_word}): {row.variation_details}")
     
-    df_variations = pd.DataFrame(results)
     output_csv = os.path.join(dataset_dir, f"{dataset_name}_ipa_variations.csv")
-    df_variations.to_csv(output_csv, index=False)
+    written = write_table(df_variations, output_csv, 'ipa_variations')
+
+    # Publish to Python global outputs (hardlink/reflink, copy only as fallback)
+    global_output_csv = publish(written, root_dir, os.path.basename(dataset_dir))[0]
+    logging.info(f"Saved variations report to {output_csv} ({len(df_variations)} rows, {df_variations['has_variation'].sum()} variations, {df_variations['unstable'].sum()} below stability {config.stability_threshold}) and published to {global_output_csv}")
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    # Project root
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    root_dir = os.path.dirname(script_dir)
+    processed_root = os.path.normpath(os.path.join(root_dir, 'Audio_Processed'))
+
+    if not os.path.exists(processed_root):
+        raise ValueError(f"Audio_Processed not found at {processed_root}")
+
+    # Target dirs with .env (assume multi_ipa.csv exists), from the project catalog
+    catalog = open_catalog(root_dir, processed_root)
+    target_dirs = catalog.datasets(require_env=True)
+    configs = [load_dataset_config(os.path.join(processed_root, d), catalog.dataset_env(d)) for d in target_dirs]
+    catalog.close()
+    logging.info(f"Found target directories: {target_dirs}")
 
-    # Duplicate to Python global outputs
-    global_outputs_dir = os.path.join(root_dir, 'Python global outputs')
-    global_dataset_dir = os.path.join(global_outputs_dir, os.path.basename(dataset_dir))
-    os.makedirs(global_dataset_dir, exist_ok=True)
-    global_output_csv = os.path.join(global_dataset_dir, f"{dataset_name}_ipa_variations.csv")
-    df_variations.to_csv(global_output_csv, index=False)
-    logging.info(f"Saved variations report to {output_csv} ({len(df_variations)} rows, {df_variations['has_variation'].sum()} variations) and duplicated to {global_output_csv}")
+    # No module-level state: datasets can also run on a process pool (DATASET_EXECUTOR=process)
+    run_datasets(partial(process_dataset_dir, root_dir=root_dir), configs)
+    logging.info("Variation analysis complete.")
 
-# Process
-for target_dir in target_dirs:
-    dataset_dir = os.path.join(processed_root, target_dir)
-    process_dataset_dir(dataset_dir)
 
-logging.info("Variation analysis complete.")
+if __name__ == "__main__":
+    main()
@@ -1,58 +1,297 @@
 # sk_lingpy_cognate_detect.py
 # Standalone script for LingPy cognate detection on wordlist.tsv.
 # Loads Wordlist, runs LexStat clustering, outputs cognates.csv (ID, DOCULECT, CONCEPT, IPA, COGID).
+# IPA is segmented into TOKENS (with sound classes) by sk_ipa_tokenize.py, spaced or not.
+# The tokenized LexStat wordlist (with the permutation-based scorer when COG_METHOD=lexstat) is cached in
+# LEXSTAT_CACHE_DIR as a LingPy TSV, keyed by the wordlist content and the scorer parameters, so reruns that only
+# change COG_THRESHOLD reload it instead of recomputing. LEXSTAT_CACHE=0 disables the cache.
+# COG_WORKERS > 1 clusters concepts in parallel: concepts are independent, so worker processes share the LexStat
+# (scorer included; inherited when the platform can fork, else loaded from the cache file) and align/cluster whole
+# concepts; the COGIDs are merged in concept order exactly as LexStat.cluster numbers them, so the result does not
+# depend on the number of workers.
+# sca/lexstat distances come from the batched numpy aligner in sk_sca_align.py (same values as LingPy's alignment);
+# COG_ALIGN_ENGINE=lingpy uses LexStat's own pure-Python alignment instead.
+# COG_INCREMENTAL=1 keeps an existing cognates.csv and only assigns the entries added to the wordlist since
+# (sk_incremental_cognates.py); the assignments, with borderline ones flagged, go to cognates_update.csv. It needs
+# stable wordlist IDs (WORDLIST_INCREMENTAL=1 builds); if the IDs moved, a full run is done instead.
+# Compound forms can be marked with '+' between morphemes in the wordlist IPA (e.g. a numeral "tɛn+wʌn"); when any
+# are, LingPy's Partial clusters the morphemes with the same method and threshold and a COGIDS column holds one
+# space-separated partial cognate ID per morpheme (sk_nexus_export.py with NEXUS_COGID_COLUMN=COGIDS codes each as
+# its own character). COG_PARTIAL=0 skips it. It runs in this process on full runs only; incremental updates leave
+# COGIDS of kept rows as written and blank for new entries.
 
 import os
-import pandas as pd
+import json
+import hashlib
 import logging
+import tempfile
+import multiprocessing
+import lingpy
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from copy import copy
+from functools import partial
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 from lingpy import Wordlist, LexStat
+from lingpy.algorithm import clustering
+from lingpy.compare.partial import Partial
 from dotenv import load_dotenv
+from sk_catalog import file_sha256
+from sk_table_io import write_table
+from sk_artifacts import atomic_path, publish
+from sk_sca_align import METHODS as ENGINE_METHODS, distance_matrices
+from sk_incremental_cognates import assign_entries, incremental_enabled, load_cognates, moved_entries
+from sk_ipa_tokenize import default_tokenizer
+
+CLUSTER_METHOD = 'upgma'  # LexStat.cluster default
+
+_worker_lex: Optional[LexStat] = None  # LexStat of a clustering worker process
+
+
+def scorer_params() -> Dict[str, Any]:
+    """get_scorer() keywords from LEXSTAT_RUNS / LEXSTAT_RATIO ("3,2") / LEXSTAT_PREPROCESSING; unset = LingPy default."""
+    params: Dict[str, Any] = {'runs': int(os.getenv('LEXSTAT_RUNS', lingpy.rc('lexstat_runs')))}
+    if os.getenv('LEXSTAT_RATIO'):
+        params['ratio'] = tuple(int(x) for x in os.getenv('LEXSTAT_RATIO').split(','))
+    params['preprocessing'] = os.getenv('LEXSTAT_PREPROCESSING', '0').lower() in ('1', 'true', 'yes')
+    return params
+
+
+def cache_key(wordlist_path: str, params: Optional[Dict[str, Any]]) -> str:
+    """Hash of the wordlist content, the tokenizer, the LingPy version and the scorer parameters (None: no scorer)."""
+    key = {'wordlist': file_sha256(wordlist_path), 'tokenizer': default_tokenizer().signature, 'lingpy': lingpy.__version__,
+           'scorer': params}
+    return hashlib.sha256(json.dumps(key, sort_keys=True, default=list).encode('utf-8')).hexdigest()
+
+
+def cache_path(cache_dir: str, wordlist_path: str, params: Optional[Dict[str, Any]]) -> str:
+    return os.path.join(cache_dir, f"lexstat_{cache_key(wordlist_path, params)[:16]}.tsv")
+
+
+def build_lexstat(wordlist_path: str) -> LexStat:
+    """LexStat over the wordlist, with TOKENS and sound classes from sk_ipa_tokenize (no ipa2tokens)."""
+    wl = Wordlist(wordlist_path)
+    forms = pd.Series([wl[i, 'ipa'] for i in wl], dtype=object)
+    segmented = default_tokenizer().tokenize(forms)
+    for column in segmented.columns:
+        by_form = dict(zip(forms, segmented[column]))
+        wl.add_entries(column, 'IPA', lambda x, by_form=by_form: copy(by_form[x]))
+    logging.info(f"Processed {len(wl)} entries into TOKENS ({segmented['TOKENS'].map(len).sum()} phones).")
+    return LexStat(wl)
+
+
+def load_lexstat(wordlist_path: str, params: Optional[Dict[str, Any]], cache_dir: Optional[str]) -> LexStat:
+    """Tokenized LexStat (scored if params is given), from cache_dir when possible."""
+    path = cache_path(cache_dir, wordlist_path, params) if cache_dir else None
+    if path and os.path.exists(path):
+        logging.info(f"Loading cached LexStat{' scorer' if params else ''} from {path}")
+        return LexStat(path)
+
+    lex = build_lexstat(wordlist_path)
+    if params is not None:
+        logging.info(f"Computing scorer {params}...")
+        lex.get_scorer(**params)
+
+    # The file keeps scores to 2 decimals: every path clusters from a written file (the cache, else a temporary one),
+    # so the first run matches later ones and the result does not depend on the cache or the number of workers
+    if path:
+        write_lexstat(lex, path)
+        logging.info(f"Cached LexStat to {path}")
+        return LexStat(path)
+    if params is None:
+        return lex
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_path = os.path.join(tmp_dir, 'lexstat.tsv')
+        write_lexstat(lex, tmp_path)
+        return LexStat(tmp_path)
+
+
+def write_lexstat(lex: LexStat, path: str) -> None:
+    with atomic_path(path) as tmp_path:
+        # LingPy appends .tsv to the file name; ignore=[] keeps the scorer in the file
+        lex.output('tsv', filename=tmp_path, ignore=[], prettify=False)
+        os.replace(f"{tmp_path}.tsv", tmp_path)
+
+
+def shard_clusters(lex: LexStat, concepts: Sequence[str], method: str, thresholds: Sequence[float],
+                   engine: str = 'numpy') -> List[Tuple[List[int], List[List[int]]]]:
+    """Per concept: wordlist IDs and their cluster labels (1..n within the concept) at each threshold."""
+    if engine == 'numpy' and method in ENGINE_METHODS:
+        matrices = [(ids, m.tolist()) for ids, m in distance_matrices(lex, concepts, method)]
+    else:
+        matrices = [(lex.get_list(row=c, flat=True), next(lex._get_matrices(concept=c, method=method))) for c in concepts]
+    results = []
+    for indices, matrix in matrices:
+        labels = []
+        for threshold in thresholds:
+            c = clustering.flat_cluster(CLUSTER_METHOD, threshold, matrix, revert=True)
+            labels.append([c[i] for i in range(len(matrix))])
+        results.append((indices, labels))
+    return results
+
+
+def _init_worker(lexstat_path: str) -> None:
+    global _worker_lex
+    _worker_lex = LexStat(lexstat_path)
+
+
+def _worker_clusters(concepts: Sequence[str], method: str, thresholds: Sequence[float],
+                     engine: str) -> List[Tuple[List[int], List[List[int]]]]:
+    return shard_clusters(_worker_lex, concepts, method, thresholds, engine)
+
+
+def cluster_concepts(lex: LexStat, lexstat_path: Optional[str], method: str, thresholds: Sequence[float],
+                     workers: int = 1, engine: str = 'numpy') -> List[Dict[int, int]]:
+    """COGID per wordlist ID for each threshold, numbered like LexStat.cluster (concepts in order, ids continue).
+
+    With workers > 1 the concepts are split into shards of consecutive concepts for a process pool. Forked workers inherit lex; where fork is not
+    available, each worker loads lexstat_path (the cached LexStat) once.
+    """
+    global _worker_lex
+    concepts = sorted(lex.rows)
+    if workers > 1 and len(concepts) > 1:
+        if 'fork' in multiprocessing.get_all_start_methods():
+            _worker_lex = lex
+            ctx, initializer, initargs = multiprocessing.get_context('fork'), None, ()
+        elif lexstat_path:
+            ctx, initializer, initargs = multiprocessing.get_context('spawn'), _init_worker, (lexstat_path,)
+        else:
+            raise ValueError("Parallel clustering needs the LexStat file on this platform")
+        size = -(-len(concepts) // (workers * 4))  # a few shards per worker for balance
+        shards = [concepts[s:s + size] for s in range(0, len(concepts), size)]
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=initializer, initargs=initargs) as executor:
+            worker = partial(_worker_clusters, method=method, thresholds=thresholds, engine=engine)
+            results = [r for shard in executor.map(worker, shards) for r in shard]
+    else:
+        results = shard_clusters(lex, concepts, method, thresholds, engine)
+
+    cogids: List[Dict[int, int]] = [{} for _ in thresholds]
+    for t, merged in enumerate(cogids):
+        k = 0
+        for indices, labels in results:
+            clusters = [label + k for label in labels[t]]
+            k = max(clusters)
+            merged.update(zip(indices, clusters))
+    return cogids
+
+
+def partial_cogids(lex: LexStat, method: str, threshold: float, params: Optional[Dict[str, Any]]) -> Dict[int, str]:
+    """Space-separated partial cognate IDs per wordlist ID, one per '+'-separated morpheme (LingPy Partial)."""
+    part = Partial(lex)
+    if params is not None:
+        part.get_partial_scorer(**params)
+    part.partial_cluster(method=method, threshold=threshold, cluster_method=CLUSTER_METHOD, ref='cogids')
+    return {i: ' '.join(str(c) for c in part[i, 'cogids']) for i in part}
+
+
+def has_compounds(lex: LexStat) -> bool:
+    """Whether any entry is '+'-segmented into morphemes."""
+    return any('+' in lex[i, 'tokens'] for i in lex)
+
+
+def cog_align_engine() -> str:
+    """COG_ALIGN_ENGINE: numpy (default, sk_sca_align.py) or lingpy."""
+    engine = os.getenv('COG_ALIGN_ENGINE', 'numpy').lower()
+    if engine not in ('numpy', 'lingpy'):
+        raise ValueError(f"COG_ALIGN_ENGINE must be numpy or lingpy, not {engine!r}")
+    return engine
+
+
+def cog_workers() -> int:
+    """COG_WORKERS (default 1; 0 = all cores)."""
+    workers = int(os.getenv('COG_WORKERS', 1))
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+
+def lexstat_cache_dir(root_dir: str) -> Optional[str]:
+    """LEXSTAT_CACHE_DIR (default <root>/lexstat_cache), or None with LEXSTAT_CACHE=0."""
+    if os.getenv('LEXSTAT_CACHE', '1').lower() in ('0', 'false', 'no'):
+        return None
+    return os.getenv('LEXSTAT_CACHE_DIR', os.path.join(root_dir, 'lexstat_cache'))
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    # Project root
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    root_dir = os.path.dirname(script_dir)
 
-# Project root
-script_dir = os.path.dirname(os.path.abspath(__file__))
-root_dir = os.path.dirname(script_dir)
+    load_dotenv(os.path.join(root_dir, '.env'), override=True)
 
-load_dotenv(os.path.join(root_dir, '.env'), override=True)
+    wordlist_path = os.getenv('WORDLIST_PATH', os.path.join(root_dir, 'wordlist.tsv'))
+    cog_threshold = float(os.getenv('COG_THRESHOLD', 0.6))
+    cog_method = os.getenv('COG_METHOD', 'sca')
+    output_csv = os.getenv('OUTPUT_CSV', os.path.join(root_dir, 'cognates.csv'))
+    workers = cog_workers()
+    engine = cog_align_engine()
+    existing = load_cognates(output_csv) if incremental_enabled() else None
 
-wordlist_path = os.getenv('WORDLIST_PATH', os.path.join(root_dir, 'wordlist.tsv'))
-cog_threshold = float(os.getenv('COG_THRESHOLD', 0.6))
-output_csv = os.getenv('OUTPUT_CSV', os.path.join(root_dir, 'cognates.csv'))
+    if not os.path.exists(wordlist_path):
+        raise ValueError(f"Wordlist not found at {wordlist_path}")
 
-if not os.path.exists(wordlist_path):
-    raise ValueError(f"Wordlist not found at {wordlist_path}")
+    logging.info(f"Loading wordlist from {wordlist_path}")
 
-logging.info(f"Loading wordlist from {wordlist_path}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Spawned workers load the LexStat file; without the cache, a temporary one is written for this run
+        cache_dir = lexstat_cache_dir(root_dir) or (tmp_dir if workers > 1 else None)
+        # Only lexstat clustering uses the correspondence scorer (sca/edit-dist/turchin score the sounds directly)
+        params = scorer_params() if cog_method == 'lexstat' else None
+        lex = load_lexstat(wordlist_path, params, cache_dir)
 
-# Load LingPy Wordlist (standard columns: ID, DOCULECT, CONCEPT, IPA)
-wl = Wordlist(wordlist_path)
+        if existing is not None:
+            moved = moved_entries(lex, existing)
+            if moved:
+                # IDs renumbered (full wordlist build): old COGIDs would land on other forms
+                logging.warning(f"{len(moved)} rows of {output_csv} no longer match the wordlist entry with their ID "
+                                f"(e.g. ID {moved[0]}); build the wordlist with WORDLIST_INCREMENTAL=1 for incremental "
+                                f"cognates. Doing a full run")
+                existing = None
 
-# Convert spaced IPA to TOKENS column using add_entries (handles column creation)
-logging.info("Converting spaced IPA to TOKENS column...")
-wl.add_entries('TOKENS', 'IPA', lambda x: [seg.strip() for seg in str(x).split()] if x else [])
-logging.info(f"Processed {len(wl)} entries into TOKENS.")
+        if existing is None:
+            logging.info(f"Clustering ({cog_method}, threshold {cog_threshold}, {workers} worker(s))...")
+            lexstat_path = cache_path(cache_dir, wordlist_path, params) if cache_dir else None
+            cogids = cluster_concepts(lex, lexstat_path, cog_method, [cog_threshold], workers, engine)[0]
+            partial = os.getenv('COG_PARTIAL', '1').lower() not in ('0', 'false', 'no') and has_compounds(lex)
+            if partial:
+                logging.info("Compound ('+'-segmented) forms found: clustering partial cognates (COGIDS)...")
+                cogids_partial = partial_cogids(lex, cog_method, cog_threshold, params)
 
-# LexStat for cognate detection (uses TOKENS column, skips ipa2tokens)
-lex = LexStat(wl)
+    # Output to CSV (LexStat entries as DataFrame)
+    df = pd.DataFrame([lex[i] for i in lex], columns=[c.upper() for c in lex.columns])
+    df.insert(0, 'ID', list(lex))
+    # Same output whether LexStat came from the cache or not: ID order, tokens as spaced phones
+    df = df.sort_values('ID', ignore_index=True)
+    df['TOKENS'] = df['TOKENS'].map(' '.join)
+    if existing is None:
+        df['COGID'] = df['ID'].map(cogids)
+        if partial:
+            df['COGIDS'] = df['ID'].map(cogids_partial)
+    else:
+        # Existing rows stay as written (entries no longer in the wordlist are dropped); new entries are assigned
+        existing_ids = existing['ID'].astype(int)
+        new_ids = sorted(set(lex) - set(existing_ids))
+        margin = float(os.getenv('COG_REVIEW_MARGIN', 0.05))
+        logging.info(f"Incremental update of {output_csv}: {len(new_ids)} new entries ({cog_method}, threshold {cog_threshold})")
+        assigned = assign_entries(lex, existing, new_ids, cog_method, cog_threshold, margin, engine)
+        new_rows = df[df['ID'].isin(new_ids)]
+        new_rows = new_rows.assign(COGID=new_rows['ID'].map(dict(zip(assigned['ID'], assigned['COGID']))))
+        df = pd.concat([existing[existing_ids.isin(set(lex))], new_rows.reindex(columns=existing.columns)], ignore_index=True)
+        df = df.astype({'ID': 'int64', 'COGID': 'int64'}).sort_values('ID', ignore_index=True)
+        update_csv = f"{os.path.splitext(output_csv)[0]}_update.csv"
+        publish(write_table(assigned, update_csv, 'cognate_update'), root_dir)
+        logging.info(f"{(assigned['ASSIGNMENT'] == 'joined').sum()} joined existing sets, "
+                     f"{(assigned['ASSIGNMENT'] == 'new').sum()} opened new ones, {assigned['REVIEW'].sum()} flagged "
+                     f"for review; saved to {update_csv}")
+    written = write_table(df, output_csv)
 
-logging.info("Computing scorer and clustering...")
-lex.get_scorer()
-lex.cluster(method='sca', threshold=cog_threshold, ref='cogid')
+    # Publish to Python global outputs (hardlink/reflink, copy only as fallback)
+    global_output_csv = publish(written, root_dir)[0]
 
-# Output to CSV (LexStat entries as DataFrame)
-df = pd.DataFrame([lex[i] for i in lex])
-df.to_csv(output_csv, index=False)
+    valid_cognates = df[df['COGID'] > 0]
+    num_sets = valid_cognates['COGID'].nunique() if not valid_cognates.empty else 0
+    logging.info(f"Saved {output_csv}: {len(df)} rows, {num_sets} cognate sets (COGID > 0); published to {global_output_csv}")
 
-# Duplicate to Python global outputs
-global_outputs_dir = os.path.join(root_dir, 'Python global outputs')
-os.makedirs(global_outputs_dir, exist_ok=True)
-global_output_csv = os.path.join(global_outputs_dir, os.path.basename(output_csv))
-df.to_csv(global_output_csv, index=False)
 
-if 'cogid' in df.columns:
-    valid_cognates = df[df['cogid'] > 0]
-    num_sets = valid_cognates['cogid'].nunique() if not valid_cognates.empty else 0
-else:
-    num_sets = 0
-logging.info(f"Saved {output_csv}: {len(df)} rows, {num_sets} cognate sets (COGID > 0); duplicated to {global_output_csv}")
+if __name__ == "__main__":
+    main()
@@ -1,53 +1,53 @@
 # sk_lingpy_wordlist_prep.py
 # Standalone batch script to prepare LingPy wordlist from IPA CSVs + mapping.csv.
 # Outputs wordlist.tsv (tab-separated): ID, DOCULECT, CONCEPT, IPA.
+# WORDLIST_INCREMENTAL=1: only re-merge datasets whose CSVs changed, keeping existing IDs (sk_incremental_wordlist).
 
 import os
 import pandas as pd
 import logging
 import re
 from dotenv import load_dotenv
+from sk_catalog import open_catalog
+from sk_dataset_config import load_dataset_config
+from sk_table_io import read_table, write_table
+from sk_artifacts import publish
+from sk_incremental_wordlist import (SOURCE_COLUMN, incremental_enabled, load_wordlist_state, record_sources,
+                                     save_wordlist_state, update_wordlist)
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # Project root
 script_dir = os.path.dirname(os.path.abspath(__file__))
 root_dir = os.path.dirname(script_dir)
+load_dotenv(os.path.join(root_dir, '.env'))  # Root settings (OUTPUT_DIR); per-dataset values come from DatasetConfig
 processed_root = os.path.normpath(os.path.join(root_dir, 'Audio_Processed'))
 
 if not os.path.exists(processed_root):
     raise ValueError(f"Audio_Processed not found at {processed_root}")
 
-# Target dirs with .env and ipa CSV
-target_dirs = [
-    d for d in os.listdir(processed_root)
-    if os.path.isdir(os.path.join(processed_root, d))
-    and 'process' in d.lower()
-    and os.path.exists(os.path.join(processed_root, d, '.env'))
-]
+# Target dirs with .env and ipa CSV, from the project catalog
+catalog = open_catalog(root_dir, processed_root)
+target_dirs = catalog.datasets(require_env=True)
 
 logging.info(f"Found target directories: {target_dirs}")
 
-all_rows = []
-global_id = 1
+def clean_concept(name):
+    """Clean CONCEPT from mapping 'Name': remove id prefixes/parentheses/spaces."""
+    if pd.isna(name):
+        return ''
+    name = str(name)
+    cleaned = re.sub(r'^[$(]?\d+(?:\.\d+)?[$\)]?[- ]*|[$(][^)]*[$\)]|[- ]*$', '', name).strip().lower()
+    return cleaned
 
-for target_dir in target_dirs:
-    dataset_dir = os.path.join(processed_root, target_dir)
-    load_dotenv(os.path.join(dataset_dir, '.env'))
-    
-    dataset_name_raw = os.getenv('DATASET_NAME', os.path.basename(dataset_dir))
-    dataset_name = dataset_name_raw.lower().replace(' ', '').replace('process', '').strip()
-    
-    ipa_csv = os.path.join(dataset_dir, f"{dataset_name}_ipa_transcriptions.csv")
+def dataset_rows(dataset_dir, config):
+    """DOCULECT/CONCEPT/IPA rows of one dataset (IPA CSV merged with mapping.csv), without ID."""
+    ipa_csv = os.path.join(dataset_dir, f"{config.dataset_name}_ipa_transcriptions.csv")
     mapping_csv = os.path.join(dataset_dir, 'mapping.csv')
     
-    if not os.path.exists(ipa_csv) or not os.path.exists(mapping_csv):
-        logging.warning(f"Missing CSV in {dataset_dir}, skipping")
-        continue
-    
     # Load CSVs
-    ipa_df = pd.read_csv(ipa_csv)
-    mapping_df = pd.read_csv(mapping_csv)
+    ipa_df = read_table(ipa_csv, columns=['lexeme_id', 'ipa_transcription'], schema='ipa_transcriptions')
+    mapping_df = read_table(mapping_csv, columns=['audio_file', 'Name'], schema='mapping')
     
     # Clean mapping audio_file for merge
     mapping_df['audio_file_clean'] = mapping_df['audio_file'].astype(str).str.replace('.wav', '', regex=False).str.strip()
@@ -55,49 +55,69 @@ for target_dir in target_dirs:
     # Merge on lexeme_id == audio_file_clean
     merged = pd.merge(ipa_df, mapping_df, left_on='lexeme_id', right_on='audio_file_clean', how='inner')
     
-    # Clean CONCEPT from 'Name'
-    def clean_concept(name):
-        if pd.isna(name):
-            return ''
-        name = str(name)
-        # Remove id prefixes/parentheses/spaces
-        cleaned = re.sub(r'^[$(]?\d+(?:\.\d+)?[$\)]?[- ]*|[$(][^)]*[$\)]|[- ]*$', '', name).strip().lower()
-        return cleaned
-    
     merged['CONCEPT'] = merged['Name'].apply(clean_concept)
     
     # DOCULECT
-    dataset_code = os.getenv('DATASET_CODE', dataset_name)
-    kurdish_variety = os.getenv('KURDISH_VARIETY', 'CK')
-    doculect = f"{dataset_code}_{kurdish_variety}"
+    doculect = config.doculect
     
     # IPA
     merged['IPA'] = merged['ipa_transcription'].fillna('')
     
-    # Select/append
-    dataset_rows = merged[['CONCEPT', 'IPA']].copy()
-    dataset_rows['DOCULECT'] = doculect
-    dataset_rows['ID'] = range(global_id, global_id + len(dataset_rows))
-    global_id += len(dataset_rows)
-    
-    all_rows.append(dataset_rows[['ID', 'DOCULECT', 'CONCEPT', 'IPA']])
+    rows = merged[['CONCEPT', 'IPA']].copy()
+    rows['DOCULECT'] = doculect
+    return rows[['DOCULECT', 'CONCEPT', 'IPA']]
+
+# Sources: one per dataset with both CSVs; hash covers both files and the doculect name
+configs = {}
+source_hashes = {}
+for target_dir in target_dirs:
+    dataset_dir = os.path.join(processed_root, target_dir)
+    config = load_dataset_config(dataset_dir, catalog.dataset_env(target_dir))
+    ipa_csv = os.path.join(dataset_dir, f"{config.dataset_name}_ipa_transcriptions.csv")
+    mapping_csv = os.path.join(dataset_dir, 'mapping.csv')
     
-    logging.info(f"Added {len(dataset_rows)} rows from {dataset_dir} (doculect: {doculect})")
+    if not os.path.exists(ipa_csv) or not os.path.exists(mapping_csv):
+        logging.warning(f"Missing CSV in {dataset_dir}, skipping")
+        continue
+    configs[dataset_dir] = config
+    source_hashes[dataset_dir] = f"{catalog.artifact_hash(ipa_csv)}:{catalog.artifact_hash(mapping_csv)}:{config.doculect}"
+catalog.close()
 
-if not all_rows:
-    logging.warning("No data found")
+output_dir = os.getenv('OUTPUT_DIR', root_dir)
+os.makedirs(output_dir, exist_ok=True)
+output_path = os.path.join(output_dir, 'wordlist.tsv')
+builder = 'sk_lingpy_wordlist_prep'
+existing, state = load_wordlist_state(output_path, builder, '') if incremental_enabled() else (None, {})
+
+if existing is not None:
+    # Incremental: only changed datasets are re-merged; other rows keep their IDs
+    wordlist_df, state, touched = update_wordlist(existing, state, source_hashes, lambda d: dataset_rows(d, configs[d]))
+    if not touched:
+        logging.info("Incremental: no dataset changed")
+    wordlist_df = wordlist_df.sort_values('ID')
 else:
-    wordlist_df = pd.concat(all_rows, ignore_index=True).sort_values('ID')
+    all_rows = []
+    global_id = 1
     
-    output_dir = os.getenv('OUTPUT_DIR', root_dir)
-    os.makedirs(output_dir, exist_ok=True)
-    output_path = os.path.join(output_dir, 'wordlist.tsv')
+    for dataset_dir, config in configs.items():
+        rows = dataset_rows(dataset_dir, config)
+        rows.insert(0, 'ID', range(global_id, global_id + len(rows)))
+        rows[SOURCE_COLUMN] = dataset_dir
+        global_id += len(rows)
+        
+        all_rows.append(rows)
+        
+        logging.info(f"Added {len(rows)} rows from {dataset_dir} (doculect: {config.doculect})")
     
-    wordlist_df.to_csv(output_path, sep='\t', index=False)
+    wordlist_df = pd.concat(all_rows, ignore_index=True).sort_values('ID') if all_rows else pd.DataFrame(columns=['ID', 'DOCULECT', 'CONCEPT', 'IPA', SOURCE_COLUMN])
+    wordlist_df, state = record_sources(wordlist_df, builder, '', source_hashes)
+
+if wordlist_df.empty:
+    logging.warning("No data found")
+else:
+    written = write_table(wordlist_df, output_path, 'wordlist', sep='\t')
+    save_wordlist_state(output_path, state)
 
-    # Duplicate to Python global outputs
-    global_outputs_dir = os.path.join(root_dir, 'Python global outputs')
-    os.makedirs(global_outputs_dir, exist_ok=True)
-    global_output_path = os.path.join(global_outputs_dir, 'wordlist.tsv')
-    wordlist_df.to_csv(global_output_path, sep='\t', index=False)
-    logging.info(f"Saved LingPy wordlist to {output_path} ({len(wordlist_df)} rows) and duplicated to {global_output_path}")
+    # Publish to Python global outputs (hardlink/reflink, copy only as fallback)
+    global_output_path = publish(written, root_dir)[0]
+    logging.info(f"Saved LingPy wordlist to {output_path} ({len(wordlist_df)} rows) and published to {global_output_path}")
\ No newline at end of file
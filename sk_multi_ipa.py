@@ -1,16 +1,20 @@
 # Multi-Run IPA Transcription Script
 # Standalone script to run IPA pipeline multiple times on segments for variability analysis.
 # Outputs lean CSV: lexeme_id, #, english_word, ipa_run1 to ipa_runN (N=NUM_IPA_RUNS).
-# Mirrors discovery/logic from sk_ipa_transcription.py; batch_size=16 for efficiency.
+# Mirrors discovery/logic from sk_ipa_transcription.py; batch size/threads/replicas from sk_cpu_autotune.py (default batch_size=16).
 
 from transformers import pipeline
 import torch
 import os
 import pandas as pd
 import logging
-import json
-import subprocess
-from dotenv import load_dotenv
+from sk_cpu_autotune import load_tuned_settings, apply_thread_settings, build_replicas, run_replicas, set_interop_threads
+from sk_catalog import open_catalog
+from sk_dataset_config import DatasetConfig, load_dataset_config, run_datasets
+from sk_table_io import read_table
+from sk_artifacts import publish
+from sk_checkpoint import BatchCheckpoint
+from sk_audio_screening import apply_quality_policy
 import warnings
 warnings.filterwarnings("ignore", category=FutureWarning)
 
@@ -24,14 +28,9 @@ processed_root = os.path.normpath(os.path.join(root_dir, 'Audio_Processed'))
 if not os.path.exists(processed_root):
     raise ValueError(f"Audio_Processed not found at: {processed_root}")
 
-# Discover target dirs
-target_dirs = [
-    d for d in os.listdir(processed_root)
-    if os.path.isdir(os.path.join(processed_root, d))
-    and 'process' in d.lower()
-    and os.path.exists(os.path.join(processed_root, d, 'segments'))
-    and os.path.exists(os.path.join(processed_root, d, '.env'))
-]
+# Discover target dirs (project catalog)
+catalog = open_catalog(root_dir, processed_root)
+target_dirs = catalog.datasets(require_segments=True, require_env=True)
 
 logging.info(f"Found target directories: {target_dirs}")
 
@@ -39,38 +38,27 @@ ipa_model = 'facebook/wav2vec2-xlsr-53-espeak-cv-ft'
 device = 0 if torch.cuda.is_available() else -1
 logging.info(f"Device: {'cuda:0' if device == 0 else 'cpu'}")
 
-def get_metadata(file_path: str) -> dict:
-    file_path = os.path.normpath(file_path)
-    if not os.path.exists(file_path):
-        return {}
-    cmd = ['ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_entries', 'format_tags', file_path]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        return {}
-    try:
-        data = json.loads(result.stdout)
-        return data.get('format', {}).get('tags', {})
-    except json.JSONDecodeError:
-        return {}
-
-def process_dataset_dir(dataset_dir: str) -> None:
-    load_dotenv(os.path.join(dataset_dir, '.env'))
-    
-    dataset_name_raw = os.getenv('DATASET_NAME', os.path.basename(dataset_dir))
-    dataset_name = dataset_name_raw.lower().replace(' ', '').replace('process', '').strip()
+def process_dataset_dir(config: DatasetConfig) -> None:
+    dataset_dir = config.dataset_dir
+    dataset_name = config.dataset_name
     
-    segments_folder = os.path.normpath(os.path.join(dataset_dir, os.getenv('SEGMENTS_FOLDER', 'segments')))
-    metadata_csv_path = os.path.join(dataset_dir, os.getenv('METADATA_CSV', 'metadata.csv'))
+    segments_folder = config.segments_folder
+    metadata_csv_path = config.metadata_csv
     
-    # Load audio_files
+    # Load audio_files (catalog for the standard metadata.csv/segments layout)
     audio_files = []
-    if os.path.exists(metadata_csv_path):
-        metadata_df = pd.read_csv(metadata_csv_path)
+    standard_layout = (metadata_csv_path == os.path.join(dataset_dir, 'metadata.csv')
+                       and segments_folder == os.path.normpath(os.path.join(dataset_dir, 'segments')))
+    if standard_layout:
+        audio_files = catalog.segment_paths(os.path.basename(dataset_dir))
+        logging.info(f"Loaded {len(audio_files)} from catalog")
+    elif os.path.exists(metadata_csv_path):
+        metadata_df = read_table(metadata_csv_path)
         if 'audio_path' in metadata_df.columns:
             audio_files = [os.path.normpath(p) for p in metadata_df['audio_path'].tolist()]
         logging.info(f"Loaded {len(audio_files)} from {metadata_csv_path}")
     
-    if not audio_files and os.path.exists(segments_folder):
+    if not audio_files and not standard_layout and os.path.exists(segments_folder):
         audio_files = sorted([os.path.normpath(os.path.join(segments_folder, f)) for f in os.listdir(segments_folder) if f.endswith('.wav')])
         logging.info(f"Loaded {len(audio_files)} from {segments_folder}")
     
@@ -78,58 +66,71 @@ def process_dataset_dir(dataset_dir: str) -> None:
         logging.warning(f"No audio in {dataset_dir}")
         return
     
-    num_runs = int(os.getenv('NUM_IPA_RUNS', 10))
+    # Missing files are skipped (they would fail their whole ASR batch)
+    audio_files = [p for p in audio_files if os.path.exists(p)]
+    
+    # Low-quality segments (sk_audio_screening.py) are skipped or run last, per the dataset's QUALITY_POLICY
+    audio_files = apply_quality_policy(audio_files, dataset_dir, config.quality_policy)
+    
+    num_runs = config.num_ipa_runs
     logging.info(f"Running IPA {num_runs} times on {len(audio_files)} files")
     
-    all_runs = []
-    for run in range(1, num_runs + 1):
-        temperature = 0.0 if run == 1 else 0.5  # Deterministic first, variable others
-        ipa_pipe = pipeline("automatic-speech-recognition", model=ipa_model, device=device, 
-                            generate_kwargs={"temperature": temperature})
-        
-        try:
-            results = ipa_pipe(audio_files, batch_size=16)
-            run_texts = [r['text'].strip() if isinstance(r, dict) and 'text' in r and isinstance(r['text'], str) else '' for r in results]
-        except Exception as e:
-            logging.error(f"Run {run} error: {e}")
-            run_texts = [''] * len(audio_files)
-        
-        all_runs.append(run_texts)
+    settings = load_tuned_settings(ipa_model, root_dir, device)
+    apply_thread_settings(settings)
     
-    # Build df
-    data = {'lexeme_id': [], '#': [], 'english_word': []}
-    for i in range(num_runs):
-        data[f'ipa_run{i+1}'] = []
+    # Deterministic first run, variable others; one set of pipelines per temperature, built once
+    temperatures = [0.0 if run == 1 else 0.5 for run in range(1, num_runs + 1)]
+    pipes_by_temperature = {
+        t: build_replicas(lambda t=t: pipeline("automatic-speech-recognition", model=ipa_model, device=device,
+                                               generate_kwargs={"temperature": t}), settings)
+        for t in sorted(set(temperatures))
+    }
     
-    for audio_path in audio_files:
-        if not os.path.exists(audio_path):
-            continue
-        lexeme_id = os.path.basename(audio_path).replace('.wav', '')
-        num = lexeme_id.split('_')[-1] if '_' in lexeme_id else ''
-        metadata = get_metadata(audio_path)
-        english_word = metadata.get('title', '').title() if metadata.get('title') else ''
+    # Results are streamed to disk batch by batch; a rerun resumes after the last finished batch
+    output_csv = os.path.join(dataset_dir, f"{dataset_name}_multi_ipa.csv")
+    columns = ['lexeme_id', '#', 'english_word'] + [f'ipa_run{i+1}' for i in range(num_runs)]
+    checkpoint = BatchCheckpoint(output_csv, audio_files, {'ipa_model': ipa_model, 'temperatures': temperatures})
+    for index, batch_files in checkpoint.pending():
+        # Run texts joined by audio path
+        texts = {}
+        for run, temperature in enumerate(temperatures, start=1):
+            try:
+                results = run_replicas(pipes_by_temperature[temperature], batch_files, settings['batch_size'])
+                run_texts = [r['text'].strip() if isinstance(r, dict) and 'text' in r and isinstance(r['text'], str) else '' for r in results]
+            except Exception as e:
+                logging.error(f"Run {run} error: {e}")
+                run_texts = [''] * len(batch_files)
+            for audio_path, text in zip(batch_files, run_texts):
+                texts[(audio_path, run)] = text
         
-        data['lexeme_id'].append(lexeme_id)
-        data['#'].append(num)
-        data['english_word'].append(english_word)
-        for i in range(num_runs):
-            data[f'ipa_run{i+1}'].append(all_runs[i][audio_files.index(audio_path)])
+        rows = []
+        for audio_path, metadata in zip(batch_files, catalog.tags_for(os.path.basename(dataset_dir), batch_files)):
+            lexeme_id = os.path.basename(audio_path).replace('.wav', '')
+            rows.append({
+                'lexeme_id': lexeme_id,
+                '#': lexeme_id.split('_')[-1] if '_' in lexeme_id else '',
+                'english_word': metadata.get('title', '').title() if metadata.get('title') else '',
+                **{f'ipa_run{run}': texts[(audio_path, run)] for run in range(1, num_runs + 1)},
+            })
+        checkpoint.write_batch(index, pd.DataFrame(rows, columns=columns))
     
-    df = pd.DataFrame(data)
-    output_csv = os.path.join(dataset_dir, f"{dataset_name}_multi_ipa.csv")
-    df.to_csv(output_csv, index=False)
+    if not checkpoint.num_rows:
+        logging.warning(f"No results for {dataset_dir}")
+        checkpoint.discard()
+        return
+    
+    num_rows = checkpoint.num_rows
+    written = checkpoint.finish('multi_ipa')
 
-    # Duplicate to Python global outputs
-    global_outputs_dir = os.path.join(root_dir, 'Python global outputs')
-    global_dataset_dir = os.path.join(global_outputs_dir, os.path.basename(dataset_dir))
-    os.makedirs(global_dataset_dir, exist_ok=True)
-    global_output_csv = os.path.join(global_dataset_dir, f"{dataset_name}_multi_ipa.csv")
-    df.to_csv(global_output_csv, index=False)
-    logging.info(f"Saved {output_csv} ({len(df)} rows, {num_runs} runs) and duplicated to {global_output_csv}")
+    # Publish to Python global outputs (hardlink/reflink, copy only as fallback)
+    global_output_csv = publish(written, root_dir, os.path.basename(dataset_dir))[0]
+    logging.info(f"Saved {output_csv} ({num_rows} rows, {num_runs} runs) and published to {global_output_csv}")
 
 # Process targets
-for target_dir in target_dirs:
-    dataset_dir = os.path.join(processed_root, target_dir)
-    process_dataset_dir(dataset_dir)
+configs = [load_dataset_config(os.path.join(processed_root, d), catalog.dataset_env(d)) for d in target_dirs]
+# Inter-op threads are fixed per process: set once, before any pipeline loads
+set_interop_threads([load_tuned_settings(ipa_model, root_dir, device)])
+# Threads only: the datasets share this module's catalog connection and globals (no __main__ entry point to spawn)
+run_datasets(process_dataset_dir, configs, allow_process=False)
 
 logging.info("Multi-IPA complete.")
@@ -0,0 +1,196 @@
+# sk_nexus_export.py
+# Binary cognate character matrix from cognates.csv (sk_lingpy_cognate_detect.py) for BEAST 2 and other phylogenetic
+# tools. Every cognate set (CONCEPT, COGID) is one character; a doculect has '1' for the sets of its words, '0' for the
+# other sets of a concept it has a word for, and '?' (missing) for all sets of a concept it has no judged word for
+# (no entry, or blank / 0 COGID). A cell may hold several space-separated IDs (LingPy's partial-cognate COGIDS format),
+# one character each: with NEXUS_COGID_COLUMN=COGIDS (written by sk_lingpy_cognate_detect.py when the wordlist marks
+# compounds with '+', e.g. "tɛn+wʌn" for eleven) every morpheme of a compound numeral is its own character.
+# The matrix is kept sparse (CSR over doculects: the '1' cells, plus which concepts each doculect has); the Nexus
+# and PHYLIP files are streamed one doculect row at a time. NEXUS_COGID_COLUMN picks another column, e.g. a
+# COGID_<method>_<t> column of cognate_sweep.csv with COGNATES_CSV=cognate_sweep.csv.
+# Writes <name>.nex (and <name>.phy with NEXUS_FORMATS=nexus,phylip) plus <name>_characters.csv.
+
+import os
+import re
+import logging
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+from typing import IO, Iterator, List, Tuple
+from dotenv import load_dotenv
+from sk_table_io import read_table, write_table
+from sk_artifacts import atomic_path, publish
+
+FORMATS = ('nexus', 'phylip')
+ABSENT, PRESENT, MISSING = ord('0'), ord('1'), ord('?')
+
+
+@dataclass(frozen=True)
+class CharacterMatrix:
+    """Sparse doculect x cognate-set presence/absence matrix."""
+    taxa: List[str]
+    concepts: List[str]
+    characters: pd.DataFrame  # CONCEPT, COGID per character, in concept order
+    char_concept: np.ndarray  # concept index per character
+    observed: np.ndarray  # bool taxa x concepts: doculect has a judged word for the concept
+    indptr: np.ndarray  # CSR over taxa: indices[indptr[t]:indptr[t + 1]] are the '1' characters of taxon t
+    indices: np.ndarray
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return len(self.taxa), len(self.characters)
+
+    def present(self, t: int) -> np.ndarray:
+        return self.indices[self.indptr[t]:self.indptr[t + 1]]
+
+    def row(self, t: int) -> np.ndarray:
+        """States of taxon t as ASCII codes ('0', '1', '?')."""
+        states = np.where(self.observed[t][self.char_concept], ABSENT, MISSING).astype(np.uint8)
+        states[self.present(t)] = PRESENT
+        return states
+
+    def rows(self) -> Iterator[Tuple[str, str]]:
+        for t, taxon in enumerate(self.taxa):
+            yield taxon, self.row(t).tobytes().decode('ascii')
+
+
+def build_matrix(df: pd.DataFrame, cogid_column: str = 'COGID') -> CharacterMatrix:
+    """CharacterMatrix of DOCULECT/CONCEPT/cogid_column rows; blank or 0 cognate IDs count as not judged."""
+    data = pd.DataFrame({
+        'DOCULECT': df['DOCULECT'].astype(str),
+        'CONCEPT': df['CONCEPT'].astype(str),
+        'COGID': df[cogid_column].fillna('').astype(str).str.split(),
+    }).explode('COGID')
+    data = data[data['COGID'].notna() & ~data['COGID'].isin(['0', '0.0'])]
+    data['COGID'] = data['COGID'].str.replace(r'\.0$', '', regex=True)  # float-read integer IDs
+
+    taxa = sorted(df['DOCULECT'].astype(str).unique())
+    concepts = sorted(data['CONCEPT'].unique())
+    characters = data[['CONCEPT', 'COGID']].drop_duplicates()
+    numeric = pd.to_numeric(characters['COGID'], errors='coerce')
+    characters = characters.assign(_num=numeric).sort_values(['CONCEPT', '_num', 'COGID'], ignore_index=True)
+    characters = characters.drop(columns='_num')
+
+    taxon = pd.Index(taxa).get_indexer(data['DOCULECT'])
+    concept = pd.Index(concepts).get_indexer(data['CONCEPT'])
+    char = pd.MultiIndex.from_frame(characters).get_indexer(pd.MultiIndex.from_frame(data[['CONCEPT', 'COGID']]))
+    observed = np.zeros((len(taxa), len(concepts)), dtype=bool)
+    observed[taxon, concept] = True
+
+    # CSR of the '1' cells (synonyms of the same set counted once)
+    cells = np.unique(taxon.astype(np.int64) * max(len(characters), 1) + char)
+    cell_taxon, indices = np.divmod(cells, max(len(characters), 1))
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(cell_taxon, minlength=len(taxa)))])
+    return CharacterMatrix(taxa, concepts, characters, pd.Index(concepts).get_indexer(characters['CONCEPT']),
+                           observed, indptr, indices)
+
+
+def load_matrix(cognates_csv: str, cogid_column: str = 'COGID') -> CharacterMatrix:
+    if not os.path.exists(cognates_csv):
+        raise ValueError(f"Cognate table not found at {cognates_csv}")
+    return build_matrix(read_table(cognates_csv, columns=['DOCULECT', 'CONCEPT', cogid_column]), cogid_column)
+
+
+def output_stem(cognates_csv: str, cogid_column: str = 'COGID') -> str:
+    """Base name of the files derived from a cognate table column (cognates, cognate_sweep_COGID_sca_0.55, ...)."""
+    stem = os.path.splitext(os.path.basename(cognates_csv))[0]
+    return stem if cogid_column == 'COGID' else f"{stem}_{cogid_column}"
+
+
+def nexus_name(name: str) -> str:
+    """Nexus token: as is if it is a plain word, else single-quoted."""
+    return name if re.fullmatch(r'[A-Za-z0-9_.]+', name) else "'" + name.replace("'", "''") + "'"
+
+
+def phylip_name(name: str) -> str:
+    return re.sub(r'\s+', '_', name)
+
+
+def write_nexus(matrix: CharacterMatrix, f: IO[str]) -> None:
+    """TAXA and CHARACTERS blocks (0/1, missing '?') plus one ASSUMPTIONS charset per concept."""
+    n_taxa, n_chars = matrix.shape
+    labels = [nexus_name(l) for l in matrix.taxa]
+    f.write("#NEXUS\n\nBEGIN TAXA;\n")
+    f.write(f"    DIMENSIONS NTAX={n_taxa};\n    TAXLABELS {' '.join(labels)};\nEND;\n\n")
+    f.write("BEGIN CHARACTERS;\n")
+    f.write(f"    DIMENSIONS NCHAR={n_chars};\n")
+    f.write('    FORMAT DATATYPE=STANDARD MISSING=? GAP=- SYMBOLS="01";\n')
+    f.write("    CHARSTATELABELS\n")
+    for k, (concept, cogid) in enumerate(zip(matrix.characters['CONCEPT'], matrix.characters['COGID']), 1):
+        f.write(f"        {k} {nexus_name(f'{concept}_{cogid}')}{',' if k < n_chars else ''}\n")
+    f.write("    ;\n    MATRIX\n")
+    width = max((len(l) for l in labels), default=0) + 2
+    for label, (_, states) in zip(labels, matrix.rows()):
+        f.write(f"    {label.ljust(width)}{states}\n")
+    f.write("    ;\nEND;\n\nBEGIN ASSUMPTIONS;\n")
+    bounds = np.flatnonzero(np.diff(matrix.char_concept, prepend=-1, append=-1)) + 1
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        f.write(f"    CHARSET {nexus_name(matrix.concepts[matrix.char_concept[start - 1]])} = "
+                f"{start}{f'-{end - 1}' if end - 1 > start else ''};\n")
+    f.write("END;\n")
+
+
+def write_phylip(matrix: CharacterMatrix, f: IO[str]) -> None:
+    """Relaxed PHYLIP (name, whitespace, states)."""
+    n_taxa, n_chars = matrix.shape
+    f.write(f"{n_taxa} {n_chars}\n")
+    width = max((len(phylip_name(t)) for t in matrix.taxa), default=0) + 2
+    for taxon, states in matrix.rows():
+        f.write(f"{phylip_name(taxon).ljust(width)}{states}\n")
+
+
+def character_table(matrix: CharacterMatrix) -> pd.DataFrame:
+    """One row per character with its label and how many doculects have it present / absent / missing."""
+    n_present = np.bincount(matrix.indices, minlength=matrix.shape[1])
+    n_observed = matrix.observed.sum(axis=0)[matrix.char_concept]
+    return pd.DataFrame({
+        'CHARACTER': np.arange(1, matrix.shape[1] + 1),
+        'LABEL': matrix.characters['CONCEPT'] + '_' + matrix.characters['COGID'],
+        'CONCEPT': matrix.characters['CONCEPT'],
+        'COGID': matrix.characters['COGID'],
+        'n_present': n_present,
+        'n_absent': n_observed - n_present,
+        'n_missing': matrix.shape[0] - n_observed,
+    })
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    # Project root
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    root_dir = os.path.dirname(script_dir)
+
+    load_dotenv(os.path.join(root_dir, '.env'), override=True)
+
+    cognates_csv = os.getenv('COGNATES_CSV', os.path.join(root_dir, 'cognates.csv'))
+    cogid_column = os.getenv('NEXUS_COGID_COLUMN', 'COGID')
+    formats = [f.strip().lower() for f in os.getenv('NEXUS_FORMATS', 'nexus').split(',') if f.strip()]
+    output_dir = os.getenv('OUTPUT_DIR', root_dir)
+
+    unknown = [f for f in formats if f not in FORMATS]
+    if unknown:
+        raise ValueError(f"Unknown NEXUS_FORMATS {unknown}; choose from {list(FORMATS)}")
+
+    matrix = load_matrix(cognates_csv, cogid_column)
+    characters = character_table(matrix)
+    n_taxa, n_chars = matrix.shape
+    logging.info(f"{n_taxa} doculects x {n_chars} characters ({len(matrix.concepts)} concepts): "
+                 f"{characters['n_present'].sum()} present, {characters['n_missing'].sum()} missing cells")
+
+    stem = output_stem(cognates_csv, cogid_column)
+    written = []
+    for fmt in formats:
+        path = os.path.join(output_dir, f"{stem}.{'nex' if fmt == 'nexus' else 'phy'}")
+        with atomic_path(path) as tmp_path:
+            with open(tmp_path, 'w', encoding='utf-8', newline='\n') as f:
+                (write_nexus if fmt == 'nexus' else write_phylip)(matrix, f)
+        written.append(path)
+        logging.info(f"Saved {path}")
+    written += write_table(characters, os.path.join(output_dir, f"{stem}_characters.csv"),
+                           'cognate_characters')
+    publish(written, root_dir)
+
+
+if __name__ == "__main__":
+    main()
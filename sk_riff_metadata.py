@@ -0,0 +1,129 @@
+# sk_riff_metadata.py
+# Native RIFF LIST/INFO metadata reader for the segmented .wav files.
+# Parses the INFO chunk straight from the WAV header (only the chunk headers and the LIST payload are read)
+# and returns the same tag dictionary as `ffprobe -show_entries format_tags`, falling back to ffprobe
+# for anything it cannot parse. get_metadata_batch() reads many files from a thread pool.
+
+import os
+import json
+import struct
+import logging
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# libavformat ff_riff_info_conv: INFO ids ffmpeg renames; anything else (e.g. ISBJ, ISRC) keeps its four-letter id
+RIFF_INFO_CONV = {
+    'IART': 'artist',
+    'ICMT': 'comment',
+    'ICOP': 'copyright',
+    'ICRD': 'date',
+    'IGNR': 'genre',
+    'ILNG': 'language',
+    'INAM': 'title',
+    'IPRD': 'album',
+    'IPRT': 'track',
+    'ITRK': 'track',
+    'ISFT': 'encoder',
+    'ISMP': 'timecode',
+    'ITCH': 'encoded_by',
+}
+
+# Chunks ffmpeg turns into extra format tags; leave those files to ffprobe
+FFPROBE_ONLY_CHUNKS = {b'bext', b'id3 ', b'ID3 ', b'iXML', b'axml'}
+
+MAX_CHUNKS = 64
+
+
+def _parse_info(payload: bytes) -> Optional[Dict[str, str]]:
+    """Parse the subchunks of a LIST/INFO payload (without the 'INFO' type id)."""
+    tags: Dict[str, str] = {}
+    pos = 0
+    while pos + 8 <= len(payload):
+        key, size = struct.unpack_from('<4sI', payload, pos)
+        pos += 8
+        if pos + size > len(payload):
+            return None
+        if key.strip(b'\x00'):
+            try:
+                name = key.decode('ascii')
+                value = payload[pos:pos + size].split(b'\x00', 1)[0].decode('utf-8')
+            except UnicodeDecodeError:
+                return None
+            tags[RIFF_INFO_CONV.get(name, name)] = value
+        pos += size + (size & 1)
+    return tags
+
+
+def read_riff_info(file_path: str) -> Optional[Dict[str, str]]:
+    """Read INFO tags from a RIFF/WAVE header. Returns None if the file is not something this parser handles."""
+    try:
+        with open(file_path, 'rb') as f:
+            header = f.read(12)
+            if len(header) < 12 or header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+                return None
+            file_size = os.fstat(f.fileno()).st_size
+            offset = 12
+            tags: Dict[str, str] = {}
+            for _ in range(MAX_CHUNKS):
+                if offset + 8 > file_size:
+                    return tags
+                f.seek(offset)
+                chunk_id, size = struct.unpack('<4sI', f.read(8))
+                if chunk_id in FFPROBE_ONLY_CHUNKS:
+                    return None
+                if chunk_id == b'LIST':
+                    payload = f.read(size)
+                    if len(payload) < size:
+                        return None
+                    if payload[:4] == b'INFO':
+                        info = _parse_info(payload[4:])
+                        if info is None:
+                            return None
+                        tags.update(info)
+                offset += 8 + size + (size & 1)
+            return None
+    except (OSError, struct.error):
+        return None
+
+
+def _ffprobe_tags(file_path: str) -> Dict[str, str]:
+    """Extract metadata tags from an audio file using ffprobe."""
+    cmd = [
+        'ffprobe', '-v', 'quiet', '-print_format', 'json',
+        '-show_entries', 'format_tags', file_path
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        logger.error(f"Error extracting metadata from {file_path}: {result.stderr}")
+        return {}
+    try:
+        data = json.loads(result.stdout)
+        return data.get('format', {}).get('tags', {})
+    except json.JSONDecodeError:
+        logger.error(f"Error parsing metadata JSON from {file_path}")
+        return {}
+
+
+def get_metadata(file_path: str) -> dict:
+    """Extract metadata tags from an audio file: native RIFF INFO reader, ffprobe fallback."""
+    file_path = os.path.normpath(file_path)
+    if not os.path.exists(file_path):
+        logger.warning(f"File not found for metadata extraction: {file_path}")
+        return {}
+    tags = read_riff_info(file_path)
+    if tags is None:
+        logger.debug(f"Falling back to ffprobe for {file_path}")
+        return _ffprobe_tags(file_path)
+    return tags
+
+
+def get_metadata_batch(file_paths: List[str], max_workers: Optional[int] = None) -> List[dict]:
+    """get_metadata for many files from a thread pool; results are in input order."""
+    if not file_paths:
+        return []
+    max_workers = max_workers or int(os.getenv('METADATA_WORKERS', min(32, (os.cpu_count() or 1) * 4)))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(get_metadata, file_paths))
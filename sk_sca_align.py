@@ -0,0 +1,233 @@
+# sk_sca_align.py
+# Vectorized pairwise alignment for cognate detection (used by sk_lingpy_cognate_detect.py, COG_ALIGN_ENGINE=numpy).
+# Reimplements LingPy's semi-global ("overlap") SCA/LexStat alignment distances with numpy: every entry is encoded
+# once as integer arrays (sound-class + prosody scorer indices, prosodic string codes, gap penalties), and the
+# dynamic program runs for a whole batch of word pairs at once (one vector step per cell, pairs of all concepts
+# sorted by length so little is padded). Arithmetic follows LingPy's order of operations, so the distances (and the
+# clusters) are the same as LexStat._get_matrices; pairs with restricted prosodic characters (morpheme boundaries,
+# tones: LingPy's "secondary" alignment) are handed to LingPy itself.
+# Run as a script to benchmark it against LingPy on WORDLIST_PATH (speed, largest distance difference).
+
+import os
+import time
+import logging
+import numpy as np
+from typing import Dict, List, Sequence, Tuple
+from lingpy import LexStat
+from lingpy.util import charstring
+
+METHODS = ('sca', 'lexstat')  # the others (edit-dist, turchin) are cheap and stay with LingPy
+GOP = -2  # LexStat._get_matrices defaults
+SCALE = 0.5
+FACTOR = 0.3
+RESTRICTED_CHARS = '_T'
+UNKNOWN_SCORE = -22.5  # ScoreDict value for pairs it does not know
+DP_BATCH = 8192  # word pairs per dynamic-programming batch
+
+# (wordlist IDs, distance matrix) of one concept
+ConceptMatrix = Tuple[List[int], np.ndarray]
+
+
+def _scorer_matrix(scorer) -> Tuple[Dict[str, int], np.ndarray]:
+    """Index per character and the score matrix of a LingPy ScoreDict, plus an 'unknown' last row/column."""
+    index = dict(scorer.chars2int)
+    n = len(index)
+    matrix = np.full((n + 1, n + 1), UNKNOWN_SCORE)
+    matrix[:n, :n] = np.asarray(scorer.matrix, dtype=np.float64)
+    return index, matrix
+
+
+class EncodedWordlist:
+    """Per-entry arrays of a LexStat for one method, padded to the longest word."""
+
+    def __init__(self, lex: LexStat, ids: Sequence[int], method: str):
+        if method not in METHODS:
+            raise ValueError(f"Alignment method {method!r} not supported; choose from {list(METHODS)}")
+        self.method = method
+        self.row = {entry: k for k, entry in enumerate(ids)}
+        scorer = lex.rscorer if method == 'sca' else lex.cscorer
+        index, self.scores = _scorer_matrix(scorer)
+        unknown = len(index)
+
+        if method == 'sca':
+            seqs = [[n.split('.', 1)[1] for n in lex[i, 'numbers']] for i in ids]
+        else:
+            seqs = [list(lex[i, 'numbers']) for i in ids]
+        prostrings = [lex[i, 'prostrings'] for i in ids]
+        self.lengths = np.array([len(s) for s in seqs], dtype=np.int64)
+        width = int(self.lengths.max()) if len(ids) else 0
+        self.tokens = np.full((len(ids), width), unknown, dtype=np.int64)
+        self.prosody = np.zeros((len(ids), width), dtype=np.int64)
+        for k, (seq, pro) in enumerate(zip(seqs, prostrings)):
+            self.tokens[k, :len(seq)] = [index.get(t, unknown) for t in seq]
+            self.prosody[k, :len(seq)] = [ord(ch) for ch in pro]
+
+        if method == 'sca':
+            # Gap opening per position: gop * prosodic weight
+            self.gaps = np.zeros((len(ids), width))
+            for k, i in enumerate(ids):
+                self.gaps[k, :self.lengths[k]] = [GOP * w for w in lex[i, 'weights']]
+        else:
+            # LexStat gaps depend on the other word's language: cscorer[<langid>.X.-, segment]
+            self.langs = np.array([lex[i, 'langid'] for i in ids], dtype=np.int64)
+            lang_rows = [index.get(charstring(lang), unknown) for lang in range(int(self.langs.max()) + 1)]
+            self.lang_gaps = self.scores[lang_rows]  # (langid, token) -> gap score (gop is 1)
+
+        # Self-similarity per entry, summed as LingPy does, for the distance normalization
+        self.self_scores = np.array([sum([(1.0 + FACTOR) * self.scores[t, t] for t in self.tokens[k, :self.lengths[k]]])
+                                     for k in range(len(ids))])
+        self.secondary = np.array([bool(set(RESTRICTED_CHARS) & set(pro)) for pro in prostrings], dtype=bool)
+
+    def gap_penalties(self, a: np.ndarray, b: np.ndarray, width: int) -> np.ndarray:
+        """Gap opening penalties along the words a (aligned against the words b), for the first width positions."""
+        if self.method == 'sca':
+            return self.gaps[a, :width]
+        return self.lang_gaps[self.langs[b][:, None], self.tokens[a, :width]]
+
+
+def semi_global_scores(enc: EncodedWordlist, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Overlap-alignment similarity of entries a[k] and b[k] (rows of enc), for all k at once.
+
+    Same recursion as LingPy's semi_globalign: gap extension (scale) when the previous step was the same kind of gap,
+    free end gaps, matches boosted by factor for identical prosodic context (half for similar), LingPy's tie order.
+    """
+    la, lb = enc.lengths[a], enc.lengths[b]
+    width_a, width_b = int(la.max()), int(lb.max())
+    A, B = enc.tokens[a, :width_a], enc.tokens[b, :width_b]
+    pro_a, pro_b = enc.prosody[a, :width_a], enc.prosody[b, :width_b]
+    gap_a, gap_b = enc.gap_penalties(a, b, width_a), enc.gap_penalties(b, a, width_b)
+    gap_a_ext, gap_b_ext = gap_a * SCALE, gap_b * SCALE
+    n = len(a)
+
+    sim = np.zeros(n)
+    prev = np.zeros((n, width_a + 1))
+    prev_tb = np.full((n, width_a + 1), 2, dtype=np.int8)
+    prev_tb[:, 0] = 1
+    for i in range(1, width_b + 1):
+        cur = np.zeros((n, width_a + 1))
+        cur_tb = np.full((n, width_a + 1), 3, dtype=np.int8)
+        last_row = lb == i
+        for j in range(1, width_a + 1):
+            up = prev[:, j]
+            gap_up = np.where(prev_tb[:, j] == 3, up + gap_b_ext[:, i - 1], up + gap_b[:, i - 1])
+            gap_up = np.where(la == j, up, gap_up)
+            left = cur[:, j - 1]
+            gap_left = np.where(cur_tb[:, j - 1] == 2, left + gap_a_ext[:, j - 1], left + gap_a[:, j - 1])
+            gap_left = np.where(last_row, left, gap_left)
+
+            s = enc.scores[A[:, j - 1], B[:, i - 1]]
+            diag = prev[:, j - 1]
+            distance = np.abs(pro_a[:, j - 1] - pro_b[:, i - 1])
+            match = np.where(distance == 0, s + (diag + s * FACTOR),
+                             np.where(distance <= 2, s + (diag + s * FACTOR / 2), s + diag))
+
+            take_up = (gap_up > match) & (gap_up >= gap_left)
+            take_match = ~take_up & (match >= gap_left)
+            cur[:, j] = np.where(take_up, gap_up, np.where(take_match, match, gap_left))
+            cur_tb[:, j] = np.where(take_up, 3, np.where(take_match, 1, 2))
+        sim[last_row] = cur[last_row, la[last_row]]
+        prev, prev_tb = cur, cur_tb
+    return sim
+
+
+def pair_distances(enc: EncodedWordlist, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """LingPy's normalized distance 1 - 2 sim / (self A + self B) for pairs of rows (a < b pairs only need one side)."""
+    sim = np.zeros(len(a))
+    order = np.lexsort((enc.lengths[a], enc.lengths[b]))
+    for start in range(0, len(order), DP_BATCH):
+        batch = order[start:start + DP_BATCH]
+        sim[batch] = semi_global_scores(enc, a[batch], b[batch])
+    denominator = enc.self_scores[a] + enc.self_scores[b]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denominator != 0, 1 - ((2 * sim) / denominator), 100.0)  # LingPy scores 0/0 as 100
+
+
+def lingpy_distances(lex: LexStat, ids_a: Sequence[int], ids_b: Sequence[int], method: str) -> np.ndarray:
+    """Distances between wordlist entries ids_a[k] and ids_b[k] with LexStat's own (pure-Python) alignment."""
+    function = lex._distance_method(method, scale=SCALE, factor=FACTOR, restricted_chars=RESTRICTED_CHARS,
+                                    mode='overlap', gop=GOP, restriction='', external_scorer=False)
+    d = np.zeros(len(ids_a))
+    for k, (x, y) in enumerate(zip(ids_a, ids_b)):
+        try:
+            d[k] = function(x, y)
+        except ZeroDivisionError:
+            d[k] = 100  # as LexStat._get_matrices
+    return d
+
+
+def distances(lex: LexStat, ids_a: Sequence[int], ids_b: Sequence[int], method: str) -> np.ndarray:
+    """Distances between wordlist entries ids_a[k] and ids_b[k], all pairs in one batched pass."""
+    ids = sorted(set(ids_a) | set(ids_b))
+    enc = EncodedWordlist(lex, ids, method)
+    a = np.array([enc.row[i] for i in ids_a], dtype=np.int64)
+    b = np.array([enc.row[i] for i in ids_b], dtype=np.int64)
+    d = np.zeros(len(a))
+    # Pairs with secondary structures go to LingPy (its own alignment handles restricted characters)
+    secondary = enc.secondary[a] | enc.secondary[b] if len(a) else np.zeros(0, dtype=bool)
+    if (~secondary).any():
+        d[~secondary] = pair_distances(enc, a[~secondary], b[~secondary])
+    if secondary.any():
+        k = np.flatnonzero(secondary)
+        d[k] = lingpy_distances(lex, [ids_a[i] for i in k], [ids_b[i] for i in k], method)
+    return d
+
+
+def distance_matrices(lex: LexStat, concepts: Sequence[str], method: str) -> List[ConceptMatrix]:
+    """(IDs, distance matrix) per concept, as LexStat._get_matrices(concept=...) gives them; all pairs in one pass."""
+    indices = [lex.get_list(row=c, flat=True) for c in concepts]
+    ids_a, ids_b = [], []
+    for ids in indices:
+        ia, ib = np.triu_indices(len(ids), 1)  # combinations order, as LingPy
+        ids_a += [ids[i] for i in ia]
+        ids_b += [ids[i] for i in ib]
+    d = distances(lex, ids_a, ids_b, method)
+
+    matrices: List[ConceptMatrix] = []
+    start = 0
+    for ids in indices:
+        n = len(ids)
+        m = np.zeros((n, n))
+        ia, ib = np.triu_indices(n, 1)
+        m[ia, ib] = m[ib, ia] = d[start:start + len(ia)]
+        start += len(ia)
+        matrices.append((ids, m))
+    return matrices
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    from dotenv import load_dotenv
+    from sk_lingpy_cognate_detect import lexstat_cache_dir, load_lexstat, scorer_params
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    root_dir = os.path.dirname(script_dir)
+    load_dotenv(os.path.join(root_dir, '.env'), override=True)
+
+    wordlist_path = os.getenv('WORDLIST_PATH', os.path.join(root_dir, 'wordlist.tsv'))
+    methods = [m.strip() for m in os.getenv('ALIGN_BENCH_METHODS', 'sca,lexstat').split(',') if m.strip()]
+    max_concepts = int(os.getenv('ALIGN_BENCH_CONCEPTS', 0))  # 0 = all
+    if not os.path.exists(wordlist_path):
+        raise ValueError(f"Wordlist not found at {wordlist_path}")
+
+    lex = load_lexstat(wordlist_path, scorer_params() if 'lexstat' in methods else None, lexstat_cache_dir(root_dir))
+    concepts = sorted(lex.rows)[:max_concepts or None]
+    num_pairs = sum(n * (n - 1) // 2 for n in (len(lex.get_list(row=c, flat=True)) for c in concepts))
+    logging.info(f"Benchmark on {wordlist_path}: {len(concepts)} concepts, {num_pairs} word pairs")
+
+    for method in methods:
+        start = time.perf_counter()
+        reference = [np.asarray(next(lex._get_matrices(concept=c, method=method))) for c in concepts]
+        lingpy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        ours = distance_matrices(lex, concepts, method)
+        numpy_time = time.perf_counter() - start
+
+        max_diff = max((float(np.abs(ref - m).max()) for ref, (_, m) in zip(reference, ours) if m.size), default=0.0)
+        logging.info(f"{method}: LingPy {lingpy_time:.2f}s, numpy {numpy_time:.2f}s "
+                     f"({lingpy_time / max(numpy_time, 1e-9):.1f}x), largest distance difference {max_diff:.3g}")
+
+
+if __name__ == "__main__":
+    main()
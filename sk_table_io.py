@@ -0,0 +1,264 @@
+# sk_table_io.py
+# Table I/O for the pipeline artifacts (mapping.csv, metadata.csv, *_ipa_transcriptions.csv, *_multi_ipa.csv,
+# *_ipa_variations.csv, *_ipa_consensus.csv, wordlist.tsv). CSV/TSV is always written as the human-readable export; with
+# ARTIFACT_FORMAT=parquet (needs pyarrow) a <name>.parquet copy is written next to it, with constant columns
+# (speaker metadata, model names, packages) dictionary-encoded as categoricals. read_table() prefers the Parquet
+# copy when it is at least as new as the CSV and only loads the requested columns. Both paths are checked
+# against SCHEMAS, so a stage that drops or retypes a column fails at the boundary instead of downstream.
+
+import os
+import logging
+import pandas as pd
+from contextlib import ExitStack
+from fnmatch import fnmatch
+from typing import Dict, Iterable, List, Optional
+from sk_artifacts import atomic_path
+
+try:
+    import pyarrow  # noqa: F401  (pandas Parquet engine)
+    HAVE_PYARROW = True
+except ImportError:
+    HAVE_PYARROW = False
+
+logger = logging.getLogger(__name__)
+
+# Column -> type ('text', 'category', 'int64', 'float64', 'bool'); names may be fnmatch patterns (ipa_run*).
+# Every non-pattern column is required; extra columns are allowed but logged.
+SCHEMAS: Dict[str, Dict[str, str]] = {
+    'mapping': {
+        'id_num': 'float64', 'Name': 'text', 'Start': 'float64', 'Duration': 'float64',
+        'audio_file': 'text', 'source': 'category', 'gender': 'category',
+    },
+    'metadata': {
+        'lexeme_id': 'text', 'audio_path': 'text', 'quality*': 'category',
+    },
+    'audio_quality': {
+        'lexeme_id': 'text', 'audio_path': 'text', 'duration': 'float64', 'sample_rate': 'float64',
+        'rms_dbfs': 'float64', 'peak_dbfs': 'float64', 'clipping_ratio': 'float64', 'snr_db': 'float64',
+        'quality': 'category', 'quality_reasons': 'text',
+    },
+    'ipa_transcriptions': {
+        'lexical_item_survey': 'category', '#': 'text', 'orthographic_transcription': 'text',
+        'ipa_transcription': 'text', 'lexeme_id': 'text', 'kurdish_variety': 'category', 'gender': 'category',
+        'age': 'category', 'education': 'category', 'city_origin': 'category', 'researcher': 'category',
+        'record_date': 'category', 'dataset_code': 'category', 'audio_path': 'text',
+        'ortho_model': 'category', 'ipa_model': 'category', 'packages': 'category',
+    },
+    'multi_ipa': {
+        'lexeme_id': 'text', '#': 'text', 'english_word': 'text', 'ipa_run*': 'text',
+    },
+    'ipa_variations': {
+        'lexeme_id': 'text', 'english_word': 'text', 'has_variation': 'bool',
+        'unique_transcriptions': 'text', 'variation_details': 'text',
+        'n_runs': 'int64', 'n_hypotheses': 'int64', 'agreement_rate': 'float64', 'entropy': 'float64',
+        'mean_distance': 'float64', 'medoid': 'text', 'stability_score': 'float64', 'unstable': 'bool',
+    },
+    'ipa_consensus': {
+        'lexeme_id': 'text', '#': 'text', 'english_word': 'text', 'consensus_ipa': 'text', 'phone_confidence': 'text',
+        'mean_confidence': 'float64', 'min_confidence': 'float64', 'n_runs': 'int64', 'n_hypotheses': 'int64',
+        'stability_score': 'float64',
+    },
+    'concept_instability': {
+        'CONCEPT': 'text', 'LEXICAL_ITEM': 'text',
+        'instability_index': 'float64', 'n_doculects': 'int64', 'n_segments': 'int64', 'mean_stability': 'float64',
+        'median_stability': 'float64', 'min_stability': 'float64', 'unstable_share': 'float64',
+        'mean_agreement': 'float64', 'mean_entropy': 'float64', 'mean_distance': 'float64', 'max_hypotheses': 'int64',
+        'unstable': 'bool',
+        'unstable_varieties': 'text',
+    },
+    'concept_instability_by_variety': {
+        'CONCEPT': 'text', 'LEXICAL_ITEM': 'text', 'VARIETY': 'category',
+        'instability_index': 'float64', 'n_doculects': 'int64', 'n_segments': 'int64', 'mean_stability': 'float64',
+        'median_stability': 'float64', 'min_stability': 'float64', 'unstable_share': 'float64',
+        'mean_agreement': 'float64', 'mean_entropy': 'float64', 'mean_distance': 'float64', 'max_hypotheses': 'int64',
+        'unstable': 'bool',
+    },
+    'wordlist': {
+        'ID': 'int64', 'DOCULECT': 'category', 'CONCEPT': 'text', 'IPA': 'text',
+    },
+    'cognate_sweep': {
+        'ID': 'int64', 'DOCULECT': 'category', 'CONCEPT': 'text', 'IPA': 'text', 'EXPERT_COGID': 'text',
+        'COGID_*': 'int64',
+    },
+    'cognate_update': {
+        'ID': 'int64', 'DOCULECT': 'category', 'CONCEPT': 'text', 'IPA': 'text', 'COGID': 'int64',
+        'ASSIGNMENT': 'category', 'DISTANCE': 'float64', 'RUNNER_UP_COGID': 'Int64', 'RUNNER_UP_DISTANCE': 'float64',
+        'REVIEW': 'bool', 'REVIEW_REASON': 'text',
+    },
+    'cognate_sweep_scores': {
+        'method': 'category', 'threshold': 'float64', 'n_cognate_sets': 'int64',
+        'n_judged': 'int64', 'bcubed_precision': 'float64', 'bcubed_recall': 'float64', 'bcubed_f': 'float64',
+    },
+    'cognate_characters': {
+        'CHARACTER': 'int64', 'LABEL': 'text', 'CONCEPT': 'text', 'COGID': 'text',
+        'n_present': 'int64', 'n_absent': 'int64', 'n_missing': 'int64',
+    },
+    'bootstrap_splits': {
+        'split': 'text', 'n_taxa': 'int64', 'support': 'float64', 'in_reference': 'bool',
+    },
+    'beast_trace': {
+        'parameter': 'text', 'n_samples': 'int64', 'mean': 'float64', 'sd': 'float64', 'median': 'float64',
+        'hpd95_lower': 'float64', 'hpd95_upper': 'float64', 'min': 'float64', 'max': 'float64', 'ess': 'float64',
+        'act': 'float64',
+    },
+    'beast_marginal': {
+        'column': 'text', 'estimator': 'category', 'log_value': 'float64', 'n_samples': 'int64',
+    },
+    'beast_clades': {
+        'clade': 'text', 'n_taxa': 'int64', 'frequency': 'float64', 'mean_height': 'float64', 'in_mcc': 'bool',
+    },
+}
+
+
+class SchemaError(ValueError):
+    """An artifact does not match its declared schema."""
+
+
+def parquet_enabled() -> bool:
+    """ARTIFACT_FORMAT=parquet and pyarrow importable."""
+    if os.getenv('ARTIFACT_FORMAT', 'csv').lower() != 'parquet':
+        return False
+    if not HAVE_PYARROW:
+        logger.warning("ARTIFACT_FORMAT=parquet but pyarrow is not installed; writing CSV only")
+        return False
+    return True
+
+
+def parquet_path(csv_path: str) -> str:
+    return f"{os.path.splitext(csv_path)[0]}.parquet"
+
+
+def _column_type(schema: Dict[str, str], column: str) -> Optional[str]:
+    if column in schema:
+        return schema[column]
+    for pattern, col_type in schema.items():
+        if fnmatch(column, pattern):
+            return col_type
+    return None
+
+
+def apply_schema(df: pd.DataFrame, schema_name: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Check required columns (restricted to columns if given) and cast to the schema types."""
+    schema = SCHEMAS[schema_name]
+    required = [c for c in schema if not any(ch in c for ch in '*?[')]
+    if columns is not None:
+        required = [c for c in required if c in columns]
+    missing = [c for c in required if c not in df.columns]
+    if missing:
+        raise SchemaError(f"{schema_name}: missing columns {missing}")
+    extra = [c for c in df.columns if _column_type(schema, c) is None]
+    if extra:
+        logger.debug(f"{schema_name}: columns not in schema {extra}")
+
+    df = df.copy()
+    for column in df.columns:
+        col_type = _column_type(schema, column)
+        if col_type is None:
+            continue
+        try:
+            if col_type in ('text', 'category'):
+                # CSV type inference turns e.g. '#', age, record_date into numbers; keep them as strings like Parquet does
+                if not (df[column].dtype == object or isinstance(df[column].dtype, (pd.StringDtype, pd.CategoricalDtype))):
+                    df[column] = df[column].astype(object).where(df[column].isna(), df[column].astype(str))
+                if col_type == 'category':
+                    df[column] = df[column].astype('category')
+            elif col_type == 'bool':
+                df[column] = df[column].astype(bool)
+            else:
+                df[column] = df[column].astype(col_type)
+        except (TypeError, ValueError) as e:
+            raise SchemaError(f"{schema_name}: column {column!r} is not {col_type}: {e}") from e
+    return df
+
+
+def _csv_value(value):
+    """Value as the CSV round trip would return it: '' -> missing, non-strings (lists) -> their repr."""
+    if isinstance(value, str):
+        return value if value else None
+    return str(value)
+
+
+def _parquet_ready(df: pd.DataFrame) -> pd.DataFrame:
+    """Object columns as plain strings/nulls, so Arrow infers string types and readers see what the CSV gives."""
+    df = df.copy()
+    for column in df.columns:
+        if df[column].dtype == object or isinstance(df[column].dtype, pd.StringDtype):
+            df[column] = df[column].map(_csv_value, na_action='ignore').astype(object)
+    return df
+
+
+def _arrow_schema(table, schema: Optional[str]):
+    """Schema of table with its all-null columns (Arrow null type) typed from SCHEMAS, else as strings."""
+    import pyarrow as pa
+    types = {'text': pa.string(), 'category': pa.dictionary(pa.int32(), pa.string()), 'int64': pa.int64(),
+             'Int64': pa.int64(), 'float64': pa.float64(), 'bool': pa.bool_()}
+    fields = []
+    for field in table.schema:
+        value_type = field.type.value_type if pa.types.is_dictionary(field.type) else field.type
+        if pa.types.is_null(value_type):
+            col_type = _column_type(SCHEMAS[schema], field.name) if schema else None
+            field = field.with_type(types.get(col_type, pa.string()))
+        fields.append(field)
+    return pa.schema(fields, metadata=table.schema.metadata)
+
+
+def write_table(df: pd.DataFrame, csv_path: str, schema: Optional[str] = None, sep: str = ',') -> List[str]:
+    """Atomically write the CSV/TSV export and, if enabled, the typed Parquet copy. Returns the written paths."""
+    if schema:
+        df = apply_schema(df, schema)
+    with atomic_path(csv_path) as tmp_path:
+        df.to_csv(tmp_path, sep=sep, index=False)
+    written = [csv_path]
+    if parquet_enabled():
+        with atomic_path(parquet_path(csv_path)) as tmp_path:
+            _parquet_ready(df).to_parquet(tmp_path, index=False)
+        written.append(parquet_path(csv_path))
+    return written
+
+
+def write_table_chunks(chunks: Iterable[pd.DataFrame], csv_path: str, schema: Optional[str] = None, sep: str = ',') -> List[str]:
+    """write_table for frames arriving in pieces (same columns); only one chunk is held in memory at a time."""
+    use_parquet = parquet_enabled()
+    with ExitStack() as stack:
+        # Parquet temp is entered first so it is renamed last and ends up at least as new as the CSV
+        pq_tmp = stack.enter_context(atomic_path(parquet_path(csv_path))) if use_parquet else None
+        csv_tmp = stack.enter_context(atomic_path(csv_path))
+        writer = None
+        num_chunks = 0
+        with open(csv_tmp, 'w', encoding='utf-8', newline='') as f:
+            for df in chunks:
+                if schema:
+                    df = apply_schema(df, schema)
+                df.to_csv(f, sep=sep, index=False, header=num_chunks == 0)
+                if use_parquet:
+                    import pyarrow as pa
+                    import pyarrow.parquet as pq
+                    if writer is None:
+                        table = pa.Table.from_pandas(_parquet_ready(df), preserve_index=False)
+                        # The first chunk fixes the Parquet schema; a column that is empty in it would be null-typed
+                        # and reject the values of every later chunk
+                        table = table.cast(_arrow_schema(table, schema))
+                        writer = stack.enter_context(pq.ParquetWriter(pq_tmp, table.schema))
+                    else:
+                        table = pa.Table.from_pandas(_parquet_ready(df), schema=writer.schema, preserve_index=False)
+                    writer.write_table(table)
+                num_chunks += 1
+        if num_chunks == 0:
+            raise ValueError(f"No data to write to {csv_path}")
+    return [csv_path, parquet_path(csv_path)] if use_parquet else [csv_path]
+
+
+def read_table(csv_path: str, columns: Optional[List[str]] = None, schema: Optional[str] = None, sep: str = ',') -> pd.DataFrame:
+    """Read an artifact (Parquet copy if present and not older than the CSV), optionally only some columns."""
+    pq_path = parquet_path(csv_path)
+    if HAVE_PYARROW and os.path.exists(pq_path) and (
+            not os.path.exists(csv_path) or os.path.getmtime(pq_path) >= os.path.getmtime(csv_path)):
+        df = pd.read_parquet(pq_path, columns=columns)
+    else:
+        # Text columns are read as strings so e.g. '#' keeps its leading zeros ('007', not 7)
+        text_columns = {c: str for c, t in SCHEMAS[schema].items()
+                        if t in ('text', 'category') and not any(ch in c for ch in '*?[')} if schema else None
+        df = pd.read_csv(csv_path, sep=sep, usecols=columns, dtype=text_columns)
+        if columns is not None:
+            df = df[columns]
+    return apply_schema(df, schema, columns) if schema else df
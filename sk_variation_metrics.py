@@ -0,0 +1,166 @@
+# sk_variation_metrics.py
+# Vectorized run-variation metrics over the ipa_run* matrix of a *_multi_ipa.csv (used by sk_ipa_variation_analysis.py).
+# Per segment, over its non-empty runs: number of distinct hypotheses, agreement rate (share of runs giving the
+# most frequent hypothesis), Shannon entropy of the hypotheses (bits), mean pairwise normalized phone edit distance
+# over all run pairs, the medoid (hypothesis with the smallest count-weighted distance to all runs) and a stability
+# score in [0, 1]: (1 - mean distance) * share of runs that produced output.
+# Work is done on distinct hypotheses only: edit distances are computed once per distinct pair of strings, in
+# batches of pairs with a numpy dynamic program (one vector step per phone of the longer side), never per run pair.
+
+import unicodedata
+import numpy as np
+import pandas as pd
+from typing import List, Optional, Tuple
+
+METRIC_COLUMNS = ['n_runs', 'n_hypotheses', 'agreement_rate', 'entropy', 'mean_distance', 'medoid', 'stability_score']
+
+PAIR_BLOCK = 2_000_000  # distinct-hypothesis pairs per block (bounds memory of the pair tables)
+DP_BATCH = 8192  # string pairs per edit-distance batch
+
+
+def split_phones(text: str) -> List[str]:
+    """Phones of an IPA string: a base symbol plus any following combining marks / modifier letters; spaces dropped."""
+    phones: List[str] = []
+    for ch in text:
+        if ch.isspace():
+            continue
+        if phones and (unicodedata.combining(ch) or unicodedata.category(ch) in ('Lm', 'Sk')):
+            phones[-1] += ch
+        else:
+            phones.append(ch)
+    return phones
+
+
+def encode_phones(strings: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Ragged phone encoding: (flat phone ids, offsets, lengths) for each string."""
+    inventory: dict = {}
+    seqs = [[inventory.setdefault(p, len(inventory)) for p in split_phones(s)] for s in strings]
+    lengths = np.fromiter((len(s) for s in seqs), dtype=np.int64, count=len(seqs))
+    offsets = np.zeros(len(seqs), dtype=np.int64)
+    np.cumsum(lengths[:-1], out=offsets[1:])
+    flat = np.fromiter((p for s in seqs for p in s), dtype=np.int32, count=int(lengths.sum()))
+    return flat, offsets, lengths
+
+
+def _padded(flat: np.ndarray, offsets: np.ndarray, lengths: np.ndarray, idx: np.ndarray, pad: int) -> np.ndarray:
+    width = int(lengths[idx].max()) if len(idx) else 0
+    if width == 0:
+        return np.empty((len(idx), 0), dtype=np.int32)
+    cols = np.arange(width)
+    valid = cols < lengths[idx][:, None]
+    return np.where(valid, flat[np.where(valid, offsets[idx][:, None] + cols, 0)], pad)
+
+
+def batched_edit_distance(flat: np.ndarray, offsets: np.ndarray, lengths: np.ndarray,
+                          a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Levenshtein distances between encoded strings a[k] and b[k], for all k at once.
+
+    Row i of the DP table is computed for every pair in one step: substitution/deletion are elementwise, and the
+    insertion chain cur[j] = min(cur[j-1] + 1, x[j]) is a running minimum of x[j] - j (np.minimum.accumulate).
+    """
+    la, lb = lengths[a], lengths[b]
+    A = _padded(flat, offsets, lengths, a, -1)
+    B = _padded(flat, offsets, lengths, b, -2)  # different pads never match
+    n, width_b = len(a), B.shape[1]
+    j = np.arange(width_b + 1)
+    prev = np.broadcast_to(j, (n, width_b + 1)).copy()
+    result = lb.astype(np.int64)  # la == 0
+    for i in range(1, A.shape[1] + 1):
+        x = np.empty_like(prev)
+        x[:, 0] = i
+        np.minimum(prev[:, :-1] + (A[:, i - 1:i] != B), prev[:, 1:] + 1, out=x[:, 1:])
+        prev = np.minimum.accumulate(x - j, axis=1) + j
+        done = la == i
+        result[done] = prev[done, lb[done]]
+    return result
+
+
+def normalized_distances(encoded: Tuple[np.ndarray, np.ndarray, np.ndarray], a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Edit distance / longer length for pairs of encoded strings (encode_phones), batched by length to limit padding."""
+    flat, offsets, lengths = encoded
+    out = np.zeros(len(a), dtype=np.float64)
+    order = np.lexsort((lengths[b], lengths[a]))
+    for start in range(0, len(order), DP_BATCH):
+        batch = order[start:start + DP_BATCH]
+        out[batch] = batched_edit_distance(flat, offsets, lengths, a[batch], b[batch])
+    longest = np.maximum(lengths[a], lengths[b])
+    return np.divide(out, longest, out=np.zeros_like(out), where=longest > 0)
+
+
+def hypothesis_counts(runs: pd.DataFrame) -> Tuple[pd.DataFrame, np.ndarray]:
+    """Distinct non-empty hypotheses per segment: (table row/code/count, sorted distinct strings)."""
+    values = runs.to_numpy(dtype=object).ravel()
+    present = pd.notna(values) & (values != '')
+    codes, uniques = pd.factorize(pd.Series(values[present], dtype=object), sort=True)
+    table = pd.DataFrame({
+        'row': np.repeat(np.arange(len(runs)), runs.shape[1])[present],
+        'code': codes,
+    })
+    counts = table.groupby(['row', 'code'], sort=True).size().rename('count').reset_index()
+    return counts, np.asarray(uniques, dtype=object)
+
+
+def _pair_blocks(counts: pd.DataFrame) -> np.ndarray:
+    """Block number per segment so each block has at most PAIR_BLOCK hypothesis pairs."""
+    k = counts.groupby('row').size()
+    pairs = k * (k - 1) // 2
+    block = (pairs.cumsum() - pairs) // PAIR_BLOCK
+    return counts['row'].map(block).to_numpy()
+
+
+def variation_metrics(runs: pd.DataFrame, hypotheses: Optional[Tuple[pd.DataFrame, np.ndarray]] = None) -> pd.DataFrame:
+    """Per-segment metrics (METRIC_COLUMNS) for a frame whose columns are the runs; index preserved.
+
+    hypotheses: hypothesis_counts(runs), if the caller already has it.
+    """
+    n = len(runs)
+    counts, uniques = hypotheses if hypotheses is not None else hypothesis_counts(runs)
+    rows = counts['row'].to_numpy()
+
+    n_runs = np.bincount(rows, weights=counts['count'], minlength=n)
+    n_hyp = np.bincount(rows, minlength=n)
+    top = np.zeros(n)
+    np.maximum.at(top, rows, counts['count'].to_numpy())
+    p = counts['count'].to_numpy() / n_runs[rows]
+    entropy = np.bincount(rows, weights=-p * np.log2(p), minlength=n)
+
+    # Pairwise distances between the distinct hypotheses of each segment, block by block
+    pair_sum = np.zeros(n)
+    cost = np.zeros(len(counts))  # per (row, code): sum over other hypotheses of count * distance
+    blocks = _pair_blocks(counts) if len(counts) else np.array([], dtype=np.int64)
+    counts = counts.assign(_pos=np.arange(len(counts)), _block=blocks)
+    multi = counts[counts.groupby('row')['code'].transform('size') > 1]
+    used = np.unique(multi['code'].to_numpy())
+    encoded = encode_phones(list(uniques[used]))  # only hypotheses that take part in a pair
+    for _, block in multi.groupby('_block', sort=False):
+        pairs = block.merge(block, on='row', suffixes=('_a', '_b'))
+        pairs = pairs[pairs['code_a'] < pairs['code_b']]
+        a, b = pairs['code_a'].to_numpy(), pairs['code_b'].to_numpy()
+        key, distinct = pd.factorize(a.astype(np.int64) * len(uniques) + b, sort=False)
+        ia, ib = np.searchsorted(used, distinct // len(uniques)), np.searchsorted(used, distinct % len(uniques))
+        d = normalized_distances(encoded, ia, ib)[key]
+        ca, cb = pairs['count_a'].to_numpy(), pairs['count_b'].to_numpy()
+        pair_sum += np.bincount(pairs['row'].to_numpy(), weights=ca * cb * d, minlength=n)
+        cost += np.bincount(pairs['_pos_a'].to_numpy(), weights=cb * d, minlength=len(cost))
+        cost += np.bincount(pairs['_pos_b'].to_numpy(), weights=ca * d, minlength=len(cost))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        agreement = np.where(n_runs > 0, top / n_runs, 0.0)
+        mean_distance = np.where(n_runs > 1, 2 * pair_sum / (n_runs * (n_runs - 1)), 0.0)
+
+    # Medoid: lowest cost, then most frequent, then alphabetical (codes are in sorted string order)
+    ranked = counts.assign(_cost=cost.round(9)).sort_values(['row', '_cost', 'count', 'code'], ascending=[True, True, False, True])
+    best = ranked.drop_duplicates('row')
+    medoid = np.full(n, '', dtype=object)
+    medoid[best['row'].to_numpy()] = uniques[best['code'].to_numpy()]
+
+    stability = (1 - mean_distance) * n_runs / runs.shape[1] if runs.shape[1] else np.zeros(n)
+    return pd.DataFrame({
+        'n_runs': n_runs.astype(np.int64),
+        'n_hypotheses': n_hyp.astype(np.int64),
+        'agreement_rate': agreement,
+        'entropy': entropy + 0.0,  # no -0.0
+        'mean_distance': mean_distance,
+        'medoid': medoid,
+        'stability_score': stability,
+    }, index=runs.index)
@@ -0,0 +1,42 @@
+# test_sk_asr_metadata_check.py
+# Segment tag validation against the tags sk_asr_segmentation.py writes.
+
+import pandas as pd
+from sk_asr_metadata_check import load_mapping_genders, validate_tags
+
+STEM = 'KLQ_001_hand_khan_01'
+ENV = {'SK_GENDER': 'M', 'SK_EDUCATION': 'MA', 'SK_VARIETY': 'SK', 'SK_RECORD_DATE': '1990-01-01',
+       'SK_SUBJECT': 'Spoken word', 'SK_RESEARCHER': 'Researcher Name'}
+
+
+def tags(**overrides):
+    base = {'TITLE': STEM, 'ALBUM': 'SK', 'ARTIST': 'M_1990', 'COMMENT': 'MA_khan_01', 'DATE': '1990-01-01',
+            'ISBJ': 'Spoken word', 'ISRC': 'Researcher Name'}
+    return {**base, **overrides}
+
+
+def test_segmentation_tags_pass():
+    # Dataset names with underscores end up in the comment ('<education>_<dataset>')
+    assert validate_tags(f"{STEM}.wav", tags(), ENV, None) == []
+
+
+def test_education_checked_against_segmentation_env():
+    issues = validate_tags(f"{STEM}.wav", tags(COMMENT='BA_khan_01'), ENV, None)
+    assert issues == ['mismatch:comment_education!=env']
+    assert validate_tags(f"{STEM}.wav", tags(COMMENT='MA'), ENV, None) == ['bad_format:comment']
+
+
+def test_gender_checked_against_mapping_not_env(tmp_path):
+    # Segments cut from an '_F_' source WAV are tagged F whatever SK_GENDER says
+    pd.DataFrame({'audio_file': [f"{STEM}.wav", 'KLQ_002_eye_khan_01.wav'], 'gender': ['F', 'M']}).to_csv(
+        tmp_path / 'mapping.csv', index=False)
+    mapping = load_mapping_genders(str(tmp_path / 'mapping.csv'))
+    assert validate_tags(f"{STEM}.wav", tags(ARTIST='F_1990'), ENV, mapping) == []
+    assert validate_tags(f"{STEM}.wav", tags(ARTIST='M_1990'), ENV, mapping) == ['mismatch:artist_gender!=mapping']
+    assert validate_tags('KLQ_003_ear_khan_01.wav', tags(TITLE='KLQ_003_ear_khan_01'), ENV, mapping) == ['not_in_mapping']
+
+    # mapping.csv written before the gender column: no gender check
+    pd.DataFrame({'audio_file': [f"{STEM}.wav"]}).to_csv(tmp_path / 'mapping.csv', index=False)
+    mapping = load_mapping_genders(str(tmp_path / 'mapping.csv'))
+    assert mapping == {f"{STEM}.wav": None}
+    assert validate_tags(f"{STEM}.wav", tags(ARTIST='F_1990'), ENV, mapping) == []
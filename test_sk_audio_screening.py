@@ -0,0 +1,38 @@
+# test_sk_audio_screening.py
+# WAV decoding and clipping detection at every PCM bit depth.
+
+import wave
+import numpy as np
+import pytest
+from sk_audio_screening import read_wav, signal_metrics
+
+RATE = 16000
+
+
+def write_pcm(path, x, bits):
+    """x in [-1, 1] as integer PCM; values at +-1 are written as the format's full-scale codes."""
+    top = 2 ** (bits - 1)
+    codes = np.clip(np.round(x * top), -top, top - 1).astype(np.int64)
+    if bits == 8:
+        data = (codes + 128).astype(np.uint8).tobytes()
+    else:
+        data = b''.join(int(c).to_bytes(bits // 8, 'little', signed=True) for c in codes)
+    with wave.open(str(path), 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(bits // 8)
+        w.setframerate(RATE)
+        w.writeframes(data)
+
+
+@pytest.mark.parametrize('bits', [8, 16, 24, 32])
+def test_full_scale_samples_count_as_clipped(tmp_path, bits):
+    t = np.arange(RATE // 2) / RATE
+    x = 0.5 * np.sin(2 * np.pi * 220 * t)
+    x[:100] = 1.0  # positive full scale (largest positive code)
+    x[100:150] = -1.0
+    write_pcm(tmp_path / 'seg.wav', x, bits)
+    samples, rate, level = read_wav(str(tmp_path / 'seg.wav'))
+    assert rate == RATE and len(samples) == len(x)
+    np.testing.assert_allclose(samples, x, atol=2.0 ** (1 - bits))
+    metrics = signal_metrics([samples], [rate], [level])
+    assert metrics['clipping_ratio'][0] == pytest.approx(150 / len(x))
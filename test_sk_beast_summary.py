@@ -0,0 +1,104 @@
+# test_sk_beast_summary.py
+# ESS against Tracer's direct autocovariance loop, HPD and MCC selection against brute force.
+
+import numpy as np
+import pytest
+from collections import Counter
+from sk_beast_summary import MAX_LAG, ThinnedSamples, autocorrelation, hpd, read_trees, tree_summary
+
+TAXA = ['A', 'K x', 'C', 'D', 'E', 'F']
+
+
+def tracer_ess(x):
+    """Tracer's ESS: autocovariances lag by lag, summed in pairs while the pair sum is positive."""
+    n = len(x)
+    d = x - x.mean()
+    max_lag = min(n - 1, MAX_LAG)
+    gamma = np.array([np.dot(d[:n - lag], d[lag:]) / (n - lag) for lag in range(max_lag)])
+    var = gamma[0]
+    for lag in range(2, max_lag, 2):
+        if gamma[lag - 1] + gamma[lag] <= 0:
+            break
+        var += 2 * (gamma[lag - 1] + gamma[lag])
+    return n * gamma[0] / var
+
+
+def ar1(rng, n, rho):
+    x = np.zeros(n)
+    noise = rng.normal(size=n)
+    for k in range(1, n):
+        x[k] = rho * x[k - 1] + noise[k]
+    return x
+
+
+@pytest.mark.parametrize('n', [500, 5000])
+def test_ess_matches_tracer_loop(n):
+    rng = np.random.default_rng(0)
+    values = np.column_stack([ar1(rng, n, rho) for rho in (0.95, 0.5, 0.0, -0.4)])
+    ess, act = autocorrelation(values)
+    np.testing.assert_allclose(ess, [tracer_ess(values[:, k]) for k in range(values.shape[1])], rtol=1e-9)
+    np.testing.assert_allclose(act, n / ess)
+
+
+def test_hpd_is_shortest_interval():
+    rng = np.random.default_rng(1)
+    values = np.sort(np.column_stack([rng.gamma(2.0, size=1001), rng.normal(size=1001)]), axis=0)
+    lower, upper = hpd(values)
+    k = int(np.floor(0.95 * len(values)))
+    for c in range(values.shape[1]):
+        widths = [values[i + k, c] - values[i, c] for i in range(len(values) - k)]
+        i = int(np.argmin(widths))
+        assert (lower[c], upper[c]) == (values[i, c], values[i + k, c])
+
+
+def test_thinning_keeps_every_stride_th_sample():
+    thinned = ThinnedSamples(100)
+    for k in range(1000):
+        thinned.append(k)
+    assert thinned.stride == 16 and thinned.items == list(range(0, 1000, 16))
+
+
+def test_kept_log_rows_do_not_hold_their_chunk():
+    thinned = ThinnedSamples(100)
+    for start in range(0, 1000, 250):
+        thinned.extend_rows(np.arange(start, start + 250, dtype=float)[:, None] * [1, 2])
+    assert [row[0] for row in thinned.items] == list(range(0, 1000, 16))
+    assert all(row.base is None for row in thinned.items)
+
+
+def random_tree(rng, names):
+    """Random rooted binary Newick with BEAST-style comments; returns (newick, set of clades as frozensets)."""
+    nodes = [(f"{names[k]}[&rate={rng.random():.3f}]", frozenset([TAXA[k]])) for k in range(len(TAXA))]
+    clades = set()
+    while len(nodes) > 1:
+        i, j = sorted(rng.choice(len(nodes), 2, replace=False))
+        (a, ca), (b, cb) = nodes[i], nodes[j]
+        merged = (f"({a}:{rng.random():.4f},{b}:{rng.random():.4f})[&posterior=1.0]", ca | cb)
+        clades.add(merged[1])
+        nodes = [n for k, n in enumerate(nodes) if k not in (i, j)] + [merged]
+    return nodes[0][0], clades
+
+
+def test_mcc_tree_matches_brute_force(tmp_path):
+    rng = np.random.default_rng(2)
+    names = [str(k + 1) for k in range(len(TAXA))]
+    # A few topologies drawn repeatedly, so clade frequencies differ
+    topologies = [random_tree(rng, names) for _ in range(6)]
+    picks = rng.choice(len(topologies), 200, p=[0.3, 0.25, 0.2, 0.1, 0.1, 0.05])
+    translate = ',\n'.join(f"\t\t{k} {name if ' ' not in name else repr(name)}" for k, name in zip(names, TAXA))
+    with open(tmp_path / 'run.trees', 'w', encoding='utf-8') as f:
+        f.write(f"#NEXUS\n\nBegin trees;\n\tTranslate\n{translate}\n;\n")
+        for state, pick in enumerate(picks):
+            f.write(f"tree STATE_{state * 1000} = [&R] {topologies[pick][0]};\n")
+        f.write("End;\n")
+
+    taxa, _, clade_ids, trees, seen = read_trees(str(tmp_path / 'run.trees'), 10 ** 6)
+    assert taxa == TAXA and seen == 200 and [t[0] for t in trees] == [s * 1000 for s in range(200)]
+    clades, (frequency, _), best = tree_summary(taxa, clade_ids, trees)
+
+    counts = Counter(c for pick in picks for c in topologies[pick][1])
+    scores = [sum(np.log(counts[c] / len(picks)) for c in topologies[pick][1]) for pick in picks]
+    assert scores[best] == pytest.approx(max(scores))
+    assert picks[best] == picks[int(np.argmax(scores))]
+    by_name = dict(zip(clades['clade'], clades['frequency']))
+    assert by_name == pytest.approx({' '.join(t for t in TAXA if t in c): n / len(picks) for c, n in counts.items()})
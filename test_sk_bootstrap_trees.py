@@ -0,0 +1,38 @@
+# test_sk_bootstrap_trees.py
+# Bootstrap split counts, independent of the number of workers, and split/consensus bookkeeping.
+
+import pytest
+from sk_bootstrap_trees import bootstrap, consensus_tree, split_members, tree_splits
+from sk_distance_trees import dense_bits, distance_matrix, newick, pack_bits
+from sk_nexus_export import build_matrix
+from test_sk_nexus_export import random_cognates
+
+
+@pytest.fixture(scope='module')
+def data():
+    present, observed = dense_bits(build_matrix(random_cognates(2, n_taxa=8, n_concepts=30)))
+    reference = distance_matrix(pack_bits(present), pack_bits(observed), 'jaccard')
+    return present, observed, reference
+
+
+@pytest.mark.parametrize('method', ['nj', 'upgma'])
+def test_split_counts_do_not_depend_on_workers(data, method):
+    present, observed, reference = data
+    one = bootstrap(present, observed, reference, 40, 7, 'jaccard', method, workers=1)
+    two = bootstrap(present, observed, reference, 40, 7, 'jaccard', method, workers=2)
+    assert one == two
+    assert sum(one.values()) == 40 * (len(present) - 3)  # resolved trees have n - 3 non-trivial splits
+
+
+def test_tree_splits_read_rooted_trees_as_unrooted():
+    rooted = ((((0, 1.0), (1, 1.0)), 1.0), (((2, 1.0), (((3, 1.0), (4, 1.0)), 1.0)), 1.0))
+    unrooted = ((0, 1.0), (1, 1.0), (((((3, 1.0), (4, 1.0)), 1.0), (2, 1.0)), 1.0))
+    assert tree_splits(rooted, 5) == tree_splits(unrooted, 5) == sorted([0b11100, 0b11000])
+    assert split_members(0b11000, 5) == [3, 4]
+
+
+def test_consensus_keeps_majority_splits():
+    support = {0b11000: 0.9, 0b11100: 0.6, 0b00110: 0.3}
+    tree = consensus_tree(support, 5)
+    assert newick(tree, list('abcde')) == '(a,b,(c,(d,e)));'
+    assert tree_splits(tree, 5) == [0b11000, 0b11100]
@@ -0,0 +1,19 @@
+# test_sk_catalog.py
+# Segment tag queries of the project catalog.
+
+import json
+from sk_catalog import QUERY_CHUNK, Catalog
+
+
+def test_tags_for_reads_only_the_batch(tmp_path):
+    catalog = Catalog(str(tmp_path), str(tmp_path))
+    n = 2 * QUERY_CHUNK + 10
+    catalog.conn.executemany("INSERT INTO segments VALUES (?, ?, ?, ?, ?, ?)",
+                             [('khan01', f"s{i:04d}.wav", f"/seg/s{i:04d}.wav", 1, 1, json.dumps({'comment': str(i)}))
+                              for i in range(n)])
+    assert len(catalog.segment_tags('khan01')) == n
+    files = [f"s{i:04d}.wav" for i in range(n - 1, -1, -3)]
+    assert catalog.segment_tags('khan01', files) == {f: {'comment': str(int(f[1:5]))} for f in files}
+    paths = ['/elsewhere/s0007.wav', '/elsewhere/s0003.wav']
+    assert catalog.tags_for('khan01', paths) == [{'comment': '7'}, {'comment': '3'}]
+    catalog.close()
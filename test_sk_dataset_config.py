@@ -0,0 +1,32 @@
+# test_sk_dataset_config.py
+# Per-dataset configs and run_datasets() failure handling.
+
+import pytest
+from sk_dataset_config import load_dataset_config, run_datasets
+
+
+def _fail_on_bad(config):
+    if config.dataset_name == 'bad02':
+        raise ValueError('broken dataset')
+    return config.kurdish_variety
+
+
+@pytest.fixture
+def configs(tmp_path):
+    out = []
+    for name, variety in (('Khan01 process', 'CK'), ('Bad02 process', 'CK'), ('Sine03 process', 'SK')):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / '.env').write_text(f"KURDISH_VARIETY={variety}\n")
+        out.append(load_dataset_config(str(tmp_path / name)))
+    return out
+
+
+@pytest.mark.parametrize('workers, executor', [(1, 'thread'), (2, 'thread'), (2, 'process')])
+def test_failing_dataset_yields_none(configs, workers, executor):
+    assert run_datasets(_fail_on_bad, configs, workers, executor) == ['CK', None, 'SK']
+
+
+def test_process_executor_can_be_refused(configs, monkeypatch):
+    monkeypatch.setenv('DATASET_EXECUTOR', 'process')
+    # A closure cannot be sent to a process pool, so this only passes on threads
+    assert run_datasets(lambda c: c.dataset_name, configs, 2, allow_process=False) == ['khan01', 'bad02', 'sine03']
@@ -0,0 +1,56 @@
+# test_sk_distance_trees.py
+# Packed-bit distances against a per-character loop, and NJ/UPGMA on matrices with known trees.
+
+import numpy as np
+import pytest
+from sk_distance_trees import (dense_bits, distance_matrix, neighbor_joining, newick, newick_name, pack_bits,
+                               upgma)
+from sk_nexus_export import build_matrix
+from test_sk_nexus_export import random_cognates
+
+
+def direct_distance(present, observed, a, b, metric):
+    both = observed[a] & observed[b]
+    pa, pb = present[a] & both, present[b] & both
+    if metric == 'jaccard':
+        union = (pa | pb).sum()
+        return 1 - (pa & pb).sum() / union if union else np.nan
+    return (pa != pb).sum() / both.sum() if both.sum() else np.nan
+
+
+@pytest.mark.parametrize('metric', ['jaccard', 'hamming'])
+def test_distances_match_per_character_loop(metric):
+    # More doculects than ROW_BLOCK and more characters than one 64-bit word
+    rng = np.random.default_rng(0)
+    observed = rng.random((70, 150)) < 0.8
+    present = observed & (rng.random((70, 150)) < 0.4)
+    dist = distance_matrix(pack_bits(present), pack_bits(observed), metric)
+    expected = np.array([[0.0 if a == b else direct_distance(present, observed, a, b, metric) for b in range(70)]
+                         for a in range(70)])
+    np.testing.assert_allclose(dist, expected, equal_nan=True)
+
+
+def test_dense_bits_follow_the_character_matrix():
+    matrix = build_matrix(random_cognates(1))
+    present, observed = dense_bits(matrix)
+    states = np.array([list(s) for _, s in matrix.rows()])
+    assert (present == (states == '1')).all() and (observed == (states != '?')).all()
+
+
+def test_neighbor_joining_recovers_additive_tree():
+    # Additive distances of ((a:2,b:3):3,c:4,(d:2,e:1):2) (Saitou & Nei's textbook example)
+    dist = np.array([[0, 5, 9, 9, 8], [5, 0, 10, 10, 9], [9, 10, 0, 8, 7], [9, 10, 8, 0, 3], [8, 9, 7, 3, 0]])
+    tree = neighbor_joining(dist)
+    assert newick(tree, list('abcde')) == '(d:2.000000,e:1.000000,(c:4.000000,(a:2.000000,b:3.000000):3.000000):2.000000);'
+
+
+def test_upgma_on_ultrametric_matrix():
+    dist = np.array([[0, 2, 6, 6], [2, 0, 6, 6], [6, 6, 0, 4], [6, 6, 4, 0]])
+    tree = upgma(dist)
+    assert newick(tree, ['a', 'b', 'c', 'd x']) == "((a:1.000000,b:1.000000):2.000000,(c:2.000000,'d x':2.000000):1.000000);"
+
+
+def test_newick_names_and_labels():
+    assert newick_name('Khan_01') == 'Khan_01' and newick_name("it's") == "'it''s'"
+    tree = ((0, 1.0), (((1, 0.5), (2, 0.5)), None))
+    assert newick(tree, list('abc'), {frozenset([1, 2]): '90'}) == '(a:1.000000,(b:0.500000,c:0.500000)90);'
@@ -0,0 +1,37 @@
+# test_sk_incremental_cognates.py
+# Online cognate assignment against an existing cognates.csv.
+
+import pandas as pd
+from sk_incremental_cognates import assign_entries, moved_entries
+from sk_lingpy_cognate_detect import build_lexstat
+
+ENTRIES = [('K00', 'hand', 'd a s t'), ('K01', 'hand', 'd a s'), ('K00', 'bread', 'n a n'), ('K01', 'bread', 'n a n ə'),
+           ('K02', 'hand', 'd e s t'), ('K02', 'bread', 'm a s t')]
+
+
+def lexstat(entries, path):
+    pd.DataFrame([(i, *e) for i, e in enumerate(entries, 1)], columns=['ID', 'DOCULECT', 'CONCEPT', 'IPA']).to_csv(
+        path, sep='\t', index=False)
+    return build_lexstat(str(path))
+
+
+def existing_rows(entries, cogids):
+    return pd.DataFrame([{'ID': str(i), 'DOCULECT': d, 'CONCEPT': c, 'IPA': ipa, 'COGID': str(cogid)}
+                         for i, ((d, c, ipa), cogid) in enumerate(zip(entries, cogids), 1)])
+
+
+def test_new_entries_join_or_open_sets(tmp_path):
+    lex = lexstat(ENTRIES, tmp_path / 'wordlist.tsv')
+    existing = existing_rows(ENTRIES[:4], [1, 1, 2, 2])
+    assert moved_entries(lex, existing) == []
+    assigned = assign_entries(lex, existing, [5, 6], 'sca', 0.45, 0.05)
+    assert assigned['ID'].tolist() == [5, 6]
+    assert assigned['ASSIGNMENT'].tolist() == ['joined', 'new']
+    assert assigned['COGID'].tolist() == [1, 3]
+
+
+def test_renumbered_wordlist_is_detected(tmp_path):
+    # A full build sorted by concept renumbers the IDs, so the kept rows point at other forms
+    renumbered = sorted(ENTRIES, key=lambda e: e[1])
+    existing = existing_rows(ENTRIES[:4], [1, 1, 2, 2])
+    assert moved_entries(lexstat(renumbered, tmp_path / 'wordlist.tsv'), existing) == [1, 2, 3, 4]
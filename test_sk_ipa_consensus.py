@@ -0,0 +1,54 @@
+# test_sk_ipa_consensus.py
+# Confusion-network consensus: insertions, substitutions and deletions by vote, and the per-segment table.
+
+import pandas as pd
+import pytest
+from sk_ipa_consensus import align_to_network, consensus, consensus_table
+
+
+def runs_frame(rows, index=None):
+    return pd.DataFrame(rows, columns=[f"ipa_run{i + 1}" for i in range(len(rows[0]))], index=index)
+
+
+def test_inserted_phone_loses_the_vote():
+    phones, confidences = consensus([('tak', 3.0), ('tauk', 1.0)])
+    assert phones == ['t', 'a', 'k'] and confidences == [1.0, 1.0, 1.0]
+
+
+def test_inserted_phone_opens_a_slot():
+    slots = align_to_network([{'t': 1.0}, {'a': 1.0}, {'k': 1.0}], 1.0, ['t', 'a', 'u', 'k'], 2.0)
+    assert slots == [{'t': 3.0}, {'a': 3.0}, {'': 1.0, 'u': 2.0}, {'k': 3.0}]
+
+
+def test_substitution_is_voted_by_count():
+    phones, confidences = consensus([('kʰat', 2.0), ('kʰet', 3.0)])
+    assert phones == ['kʰ', 'e', 't'] and confidences == pytest.approx([1.0, 0.6, 1.0])
+    # Ties go to the backbone
+    assert consensus([('kʰat', 2.0), ('kʰet', 2.0)])[0] == ['kʰ', 'a', 't']
+
+
+def test_deleted_phone_is_kept_by_the_majority():
+    phones, confidences = consensus([('ʃima', 2.0), ('ʃma', 1.0)])
+    assert phones == ['ʃ', 'i', 'm', 'a'] and confidences == pytest.approx([1.0, 2 / 3, 1.0, 1.0])
+
+
+def test_consensus_table():
+    runs = runs_frame([
+        ['tak', 'tak', 'tauk', 'tak'],  # insertion outvoted
+        ['kʰɛː', 'kʰɛː', 'kʰɛː', None],  # one distinct hypothesis: the shortcut
+        ['', None, '', None],  # all empty
+        ['bet', 'bat', 'bat', ''],  # substitution
+    ], index=[10, 20, 30, 40])
+    table = consensus_table(runs)
+    assert table.index.tolist() == [10, 20, 30, 40]
+    assert table['consensus_ipa'].tolist() == ['tak', 'kʰɛː', '', 'bat']
+    assert table['phone_confidence'].tolist() == ['1.00 1.00 1.00', '1.00 1.00', '', '1.00 0.67 1.00']
+    assert table['min_confidence'].tolist() == pytest.approx([1.0, 1.0, 0.0, 2 / 3])
+    assert table['n_runs'].tolist() == [4, 3, 0, 3]
+    assert table['n_hypotheses'].tolist() == [2, 1, 0, 2]
+
+
+def test_consensus_table_of_empty_rows_only():
+    table = consensus_table(runs_frame([[None, ''], ['', '']], index=['a', 'b']))
+    assert table.index.tolist() == ['a', 'b']
+    assert table['consensus_ipa'].tolist() == ['', ''] and table['mean_confidence'].tolist() == [0.0, 0.0]
@@ -0,0 +1,32 @@
+# test_sk_lingpy_cognate_detect.py
+# The scorer LexStat clusters from is the same with and without the cache, for any number of workers.
+
+import random
+import numpy as np
+import pandas as pd
+from sk_lingpy_cognate_detect import cluster_concepts, load_lexstat
+
+ENTRIES = [('K00', 'hand', 'd a s t'), ('K01', 'hand', 'd a s'), ('K02', 'hand', 'd e s t'), ('K03', 'hand', 'h a n t'),
+           ('K00', 'bread', 'n a n'), ('K01', 'bread', 'n a n ə'), ('K02', 'bread', 'm a s t'), ('K03', 'bread', 'b r o t'),
+           ('K00', 'water', 'p a n i'), ('K01', 'water', 'a w'), ('K02', 'water', 'p a n i'), ('K03', 'water', 'v a s ə r')]
+
+
+def scorer(lex):
+    chars = sorted(lex.cscorer.chars2int)
+    return np.array([[lex.cscorer[a, b] for b in chars] for a in chars])
+
+
+def test_scorer_is_rounded_on_every_path(tmp_path):
+    path = tmp_path / 'wordlist.tsv'
+    pd.DataFrame([(i, *e) for i, e in enumerate(ENTRIES, 1)], columns=['ID', 'DOCULECT', 'CONCEPT', 'IPA']).to_csv(
+        path, sep='\t', index=False)
+    params = {'runs': 20, 'preprocessing': False}
+    random.seed(0)
+    uncached = load_lexstat(str(path), params, None)
+    random.seed(0)
+    cached = load_lexstat(str(path), params, str(tmp_path))
+    assert np.array_equal(scorer(uncached), scorer(cached))
+    assert np.array_equal(scorer(cached), np.round(scorer(cached), 2))
+    one = cluster_concepts(uncached, None, 'lexstat', [0.55], workers=1)
+    two = cluster_concepts(cached, None, 'lexstat', [0.55], workers=2)
+    assert one == two
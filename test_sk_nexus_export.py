@@ -0,0 +1,97 @@
+# test_sk_nexus_export.py
+# The sparse character matrix against a dense per-cell construction, and the Nexus/PHYLIP writers.
+
+import io
+import numpy as np
+import pandas as pd
+import pytest
+from sk_lingpy_cognate_detect import build_lexstat, has_compounds, partial_cogids
+from sk_nexus_export import build_matrix, character_table, write_nexus, write_phylip
+
+
+def random_cognates(seed=0, n_taxa=9, n_concepts=12):
+    """Cognate table with synonyms, missing entries, unjudged (blank / 0) words and partial-cognate cells."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for t in range(n_taxa):
+        for c in range(n_concepts):
+            for _ in range(rng.choice([0, 1, 1, 1, 2])):
+                cogid = str(rng.integers(1, 5))
+                roll = rng.random()
+                if roll < 0.05:
+                    cogid = ''
+                elif roll < 0.1:
+                    cogid = '0'
+                elif roll < 0.15:
+                    cogid = f"{cogid} {rng.integers(5, 7)}"
+                rows.append({'DOCULECT': f"Doc {t}", 'CONCEPT': f"c{c:02d}", 'COGID': cogid})
+    return pd.DataFrame(rows)
+
+
+def dense_states(df):
+    """Per taxon, the state string over sorted (CONCEPT, numeric COGID) characters, cell by cell."""
+    judged = [(d, c, i) for d, c, cell in df.itertuples(index=False) for i in cell.split() if i != '0']
+    characters = sorted({(c, i) for _, c, i in judged}, key=lambda ci: (ci[0], int(ci[1])))
+    states = {}
+    for taxon in sorted(df['DOCULECT'].unique()):
+        mine = {(c, i) for d, c, i in judged if d == taxon}
+        observed = {c for c, _ in mine}
+        states[taxon] = ''.join('1' if ch in mine else '0' if ch[0] in observed else '?' for ch in characters)
+    return characters, states
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_matrix_matches_dense_construction(seed):
+    df = random_cognates(seed)
+    matrix = build_matrix(df)
+    characters, states = dense_states(df)
+    assert list(zip(matrix.characters['CONCEPT'], matrix.characters['COGID'])) == characters
+    assert dict(matrix.rows()) == states
+
+    table = character_table(matrix)
+    columns = np.array([list(s) for s in states.values()])
+    assert table['n_present'].tolist() == (columns == '1').sum(axis=0).tolist()
+    assert table['n_absent'].tolist() == (columns == '0').sum(axis=0).tolist()
+    assert table['n_missing'].tolist() == (columns == '?').sum(axis=0).tolist()
+
+
+def test_compound_numeral_splits_into_morpheme_characters(tmp_path):
+    # "eleven" as ten+one in A and B, an opaque word in C
+    words = [('A', 'ten', 'tɛn'), ('A', 'one', 'wʌn'), ('A', 'eleven', 'tɛn+wʌn'),
+             ('B', 'ten', 'tɛːn'), ('B', 'one', 'wan'), ('B', 'eleven', 'tɛːn+wan'),
+             ('C', 'ten', 'dɛs'), ('C', 'one', 'ʊno'), ('C', 'eleven', 'ɔnzə')]
+    path = tmp_path / 'wordlist.tsv'
+    path.write_text('ID\tDOCULECT\tCONCEPT\tIPA\n' + ''.join(f"{i}\t{d}\t{c}\t{w}\n" for i, (d, c, w) in
+                                                             enumerate(words, 1)), encoding='utf-8')
+    lex = build_lexstat(str(path))
+    assert has_compounds(lex)
+    cogids = partial_cogids(lex, 'sca', 0.45, None)
+    assert [len(cogids[i].split()) for i in (3, 6, 9)] == [2, 2, 1]
+    assert cogids[3] == cogids[6] and cogids[3] != cogids[9]
+
+    df = pd.DataFrame({'DOCULECT': [d for d, _, _ in words], 'CONCEPT': [c for _, c, _ in words],
+                       'COGIDS': [cogids[i] for i in range(1, len(words) + 1)]})
+    matrix = build_matrix(df, 'COGIDS')
+    eleven = matrix.characters.index[matrix.characters['CONCEPT'] == 'eleven'].tolist()
+    assert len(eleven) == 3  # the two morphemes of ten+one, and C's word
+    rows = {taxon: ''.join(states[k] for k in eleven) for taxon, states in matrix.rows()}
+    assert sorted(rows.values()) == ['001', '110', '110'] and rows['A'] == rows['B']
+
+
+def test_float_read_ids_and_writers():
+    df = pd.DataFrame({'DOCULECT': ['A', 'A', 'B', "C'x"], 'CONCEPT': ['hand', 'eye', 'hand', 'eye'],
+                       'COGID': [1.0, 2.0, 3.0, np.nan]})
+    matrix = build_matrix(df)
+    assert matrix.characters['COGID'].tolist() == ['2', '1', '3']
+    assert dict(matrix.rows()) == {'A': '110', 'B': '?01', "C'x": '???'}
+
+    nexus = io.StringIO()
+    write_nexus(matrix, nexus)
+    text = nexus.getvalue()
+    assert 'DIMENSIONS NTAX=3;' in text and 'DIMENSIONS NCHAR=3;' in text
+    assert "TAXLABELS A B 'C''x';" in text
+    assert 'CHARSET eye = 1;' in text and 'CHARSET hand = 2-3;' in text
+
+    phylip = io.StringIO()
+    write_phylip(matrix, phylip)
+    assert phylip.getvalue().splitlines() == ['3 3', 'A    110', 'B    ?01', "C'x  ???"]
@@ -0,0 +1,53 @@
+# test_sk_sca_align.py
+# The numpy aligner against LingPy's own LexStat._get_matrices on a small random wordlist.
+
+import numpy as np
+import pandas as pd
+import pytest
+from sk_lingpy_cognate_detect import build_lexstat
+from sk_sca_align import distance_matrices, distances, lingpy_distances
+
+PHONES = ['p', 't', 'k', 'b', 'd', 'g', 's', 'ʃ', 'm', 'n', 'r', 'l', 'tʃ', 'a', 'e', 'i', 'o', 'u', 'ə', 'iː']
+
+
+def random_wordlist(path, n_doculects=8, n_concepts=6, seed=3):
+    """Words derived from one proto-form per concept by random substitutions, deletions and insertions; some are
+    compounds ('+', aligned by LingPy's secondary alignment)."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for c in range(n_concepts):
+        proto = list(rng.choice(PHONES, rng.integers(2, 7)))
+        for d in range(n_doculects):
+            word = [p if rng.random() > 0.3 else str(rng.choice(PHONES)) for p in proto if rng.random() > 0.1]
+            if rng.random() < 0.2:
+                word.insert(int(rng.integers(0, len(word) + 1)), str(rng.choice(PHONES)))
+            if rng.random() < 0.1:
+                word += ['+'] + list(rng.choice(PHONES, 2))
+            rows.append((len(rows) + 1, f"L{d:02d}", f"c{c}", ' '.join(word or proto)))
+    pd.DataFrame(rows, columns=['ID', 'DOCULECT', 'CONCEPT', 'IPA']).to_csv(path, sep='\t', index=False)
+
+
+@pytest.fixture(scope='module')
+def lex(tmp_path_factory):
+    path = tmp_path_factory.mktemp('align') / 'wordlist.tsv'
+    random_wordlist(path)
+    lex = build_lexstat(str(path))
+    lex.get_scorer(runs=20, preprocessing=False)
+    return lex
+
+
+@pytest.mark.parametrize('method', ['sca', 'lexstat'])
+def test_matrices_match_lingpy(lex, method):
+    concepts = sorted(lex.rows)
+    for concept, (ids, matrix) in zip(concepts, distance_matrices(lex, concepts, method)):
+        assert ids == lex.get_list(row=concept, flat=True)
+        reference = np.asarray(next(lex._get_matrices(concept=concept, method=method)))
+        np.testing.assert_allclose(matrix, reference, rtol=0, atol=1e-12)
+
+
+def test_pairs_across_concepts_match_lingpy(lex):
+    rng = np.random.default_rng(0)
+    ids = list(lex)
+    ids_a, ids_b = list(rng.choice(ids, 200)), list(rng.choice(ids, 200))
+    np.testing.assert_allclose(distances(lex, ids_a, ids_b, 'sca'), lingpy_distances(lex, ids_a, ids_b, 'sca'),
+                               rtol=0, atol=1e-12)
@@ -0,0 +1,56 @@
+# test_sk_table_io.py
+# Round trips of the artifact tables through the CSV and Parquet paths.
+
+import pandas as pd
+import pytest
+from sk_checkpoint import BatchCheckpoint
+from sk_table_io import read_table, write_table, write_table_chunks
+
+pytest.importorskip('pyarrow')
+
+
+def test_chunks_with_empty_first_column_write_parquet(tmp_path, monkeypatch):
+    monkeypatch.setenv('ARTIFACT_FORMAT', 'parquet')
+    out = str(tmp_path / 'out.csv')
+    chunks = [pd.DataFrame({'ipa_transcription': ['']}), pd.DataFrame({'ipa_transcription': ['dast']})]
+    assert write_table_chunks(chunks, out) == [out, str(tmp_path / 'out.parquet')]
+    values = pd.read_parquet(tmp_path / 'out.parquet')['ipa_transcription']
+    assert values.isna().tolist() == [True, False] and values[1] == 'dast'
+
+
+def test_checkpoint_failed_first_batch_finishes(tmp_path, monkeypatch):
+    # transcribe() returns '' for a failed batch; the part file reads it back as missing
+    monkeypatch.setenv('ARTIFACT_FORMAT', 'parquet')
+    out = str(tmp_path / 'khan01_multi_ipa.csv')
+    checkpoint = BatchCheckpoint(out, ['a.wav', 'b.wav'], {}, batch_size=1)
+    checkpoint.write_batch(0, pd.DataFrame({'lexeme_id': ['1'], '#': ['001'], 'english_word': ['hand'],
+                                            'ipa_run1': ['']}))
+    checkpoint.write_batch(1, pd.DataFrame({'lexeme_id': ['2'], '#': ['002'], 'english_word': ['bread'],
+                                            'ipa_run1': ['dast']}))
+    checkpoint.finish('multi_ipa')
+    df = read_table(out, schema='multi_ipa')
+    assert df['ipa_run1'].isna().tolist() == [True, False] and df['ipa_run1'][1] == 'dast'
+    assert df['#'].tolist() == ['001', '002']
+
+
+def test_empty_category_column_in_first_chunk(tmp_path, monkeypatch):
+    monkeypatch.setenv('ARTIFACT_FORMAT', 'parquet')
+    out = str(tmp_path / 'wordlist.tsv')
+    chunks = [pd.DataFrame({'ID': [1], 'DOCULECT': [None], 'CONCEPT': ['hand'], 'IPA': ['dast']}),
+              pd.DataFrame({'ID': [2], 'DOCULECT': ['khan01'], 'CONCEPT': ['bread'], 'IPA': ['nan']})]
+    write_table_chunks(chunks, out, 'wordlist', sep='\t')
+    assert read_table(out, schema='wordlist', sep='\t')['DOCULECT'].tolist()[1] == 'khan01'
+
+
+def test_csv_and_parquet_read_the_same(tmp_path, monkeypatch):
+    df = pd.DataFrame({'lexeme_id': ['1', '2'], '#': ['007', '010'], 'english_word': ['hand', 'bread'],
+                       'ipa_run1': ['dast', None], 'ipa_run2': ['dast', 'nan']})
+    out = str(tmp_path / 'khan01_multi_ipa.csv')
+    monkeypatch.setenv('ARTIFACT_FORMAT', 'csv')
+    write_table(df, out, 'multi_ipa')
+    from_csv = read_table(out, schema='multi_ipa')
+    monkeypatch.setenv('ARTIFACT_FORMAT', 'parquet')
+    write_table(df, out, 'multi_ipa')
+    from_parquet = read_table(out, schema='multi_ipa')
+    assert from_csv['#'].tolist() == from_parquet['#'].tolist() == ['007', '010']
+    assert from_csv['ipa_run1'].isna().tolist() == from_parquet['ipa_run1'].isna().tolist() == [False, True]
@@ -0,0 +1,77 @@
+# test_sk_variation_metrics.py
+# Batched edit distances and per-segment run-variation metrics against direct per-row computations.
+
+import itertools
+import math
+import random
+from collections import Counter
+import numpy as np
+import pandas as pd
+from sk_variation_metrics import (batched_edit_distance, encode_phones, normalized_distances, split_phones,
+                                  variation_metrics)
+
+ALPHABET = ['a', 'b', 'ə', 'tʃ', 'kʰ', 'ɛː', 'ẽ', 'i', 'ʁ']
+
+
+def levenshtein(a, b):
+    d = list(range(len(b) + 1))
+    for i, x in enumerate(a, 1):
+        prev, d[0] = d[0], i
+        for j, y in enumerate(b, 1):
+            prev, d[j] = d[j], min(d[j] + 1, d[j - 1] + 1, prev + (x != y))
+    return d[-1]
+
+
+def random_word(rng):
+    return ''.join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 7)))
+
+
+def test_split_phones_keeps_marks_with_their_base():
+    assert split_phones('kʰɛː tʃẽ') == ['kʰ', 'ɛː', 't', 'ʃ', 'ẽ']
+
+
+def test_batched_edit_distance_matches_levenshtein():
+    rng = random.Random(0)
+    words = [random_word(rng) for _ in range(300)]
+    encoded = encode_phones(words)
+    a = np.array([rng.randrange(len(words)) for _ in range(2000)])
+    b = np.array([rng.randrange(len(words)) for _ in range(2000)])
+    expected = [levenshtein(split_phones(words[i]), split_phones(words[j])) for i, j in zip(a, b)]
+    assert batched_edit_distance(*encoded, a, b).tolist() == expected
+    longest = [max(len(split_phones(words[i])), len(split_phones(words[j]))) for i, j in zip(a, b)]
+    np.testing.assert_allclose(normalized_distances(encoded, a, b),
+                               [e / m if m else 0.0 for e, m in zip(expected, longest)])
+
+
+def reference_metrics(row):
+    hyps = [x for x in row if isinstance(x, str) and x]
+    n, counts = len(hyps), Counter(hyps)
+    if not n:
+        return dict(n_runs=0, n_hypotheses=0, agreement_rate=0.0, entropy=0.0, mean_distance=0.0, medoid='',
+                    stability_score=0.0)
+    phones = {s: split_phones(s) for s in counts}
+
+    def distance(a, b):
+        longest = max(len(phones[a]), len(phones[b]))
+        return levenshtein(phones[a], phones[b]) / longest if longest else 0.0
+
+    mean = sum(distance(a, b) for a, b in itertools.permutations(hyps, 2)) / (n * (n - 1)) if n > 1 else 0.0
+    cost = {a: sum(counts[b] * distance(a, b) for b in counts) for a in counts}
+    medoid = min(counts, key=lambda a: (round(cost[a], 9), -counts[a], a))
+    return dict(n_runs=n, n_hypotheses=len(counts), agreement_rate=max(counts.values()) / n,
+                entropy=-sum(v / n * math.log2(v / n) for v in counts.values()), mean_distance=mean, medoid=medoid,
+                stability_score=(1 - mean) * n / len(row))
+
+
+def test_variation_metrics_match_per_row_loop():
+    rng = random.Random(1)
+    rows = []
+    for _ in range(300):
+        base = [random_word(rng) for _ in range(rng.randint(1, 4))]
+        rows.append([rng.choice(base + ['', None]) for _ in range(10)])
+    rows += [[None] * 10, ['x'] * 10]
+    got = variation_metrics(pd.DataFrame(rows, columns=[f"ipa_run{i + 1}" for i in range(10)]))
+    expected = pd.DataFrame([reference_metrics(r) for r in rows])
+    assert got['medoid'].tolist() == expected['medoid'].tolist()
+    for column in ['n_runs', 'n_hypotheses', 'agreement_rate', 'entropy', 'mean_distance', 'stability_score']:
+        np.testing.assert_allclose(got[column].astype(float), expected[column].astype(float), err_msg=column)